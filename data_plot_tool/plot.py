@@ -1,3 +1,4 @@
+import codecs
 import matplotlib.pyplot as plt
 import numpy as np
 import re
@@ -6,61 +7,209 @@ import re
 plt.rcParams['font.sans-serif'] = ['SimHei', 'DejaVu Sans']
 plt.rcParams['axes.unicode_minus'] = False
 
-def read_phase_data(filename, variable_name):
+ENCODINGS = ['utf-8', 'gbk', 'gb2312', 'ascii', 'latin-1', 'cp1252']
+BLOCK_SIZE = 1 << 23         # 每次读取的字符数，内存占用与文件大小无关
+ENVELOPE_BUCKETS = 4000      # 包络最多保留的桶数，约为图片的横向像素数
+
+def detect_encoding(filename, sample_size=1 << 20):
     """
-    读取数据文件，自动检测编码
-    支持格式: [变量名]:-79.70° 或 -79.70°
+    用文件开头的一段数据检测编码
     """
-    phases = []
-    
-    # 尝试不同的编码格式
-    encodings = ['utf-8', 'gbk', 'gb2312', 'ascii', 'latin-1', 'cp1252']
-    
-    for encoding in encodings:
+    with open(filename, 'rb') as file:
+        sample = file.read(sample_size)
+    for encoding in ENCODINGS:
         try:
-            with open(filename, 'r', encoding=encoding) as file:
-                print(f"使用 {encoding} 编码成功读取文件")
-                for line in file:
-                    line = line.strip()
-                    if line:
-                        # 使用正则表达式提取数值
-                        patterns = [
-                            rf'{variable_name}:\s*(-?\d+\.?\d*)°?',  # 变量名:-79.70°
-                            rf'{variable_name}:\s*(-?\d+\.?\d*)',    # 变量名:-79.70
-                            r'(-?\d+\.?\d*)°',                       # -79.70°
-                            r'(-?\d+\.?\d*)'                         # -79.70
-                        ]
-                        
-                        for pattern in patterns:
-                            match = re.search(pattern, line)
-                            if match:
-                                phase_value = float(match.group(1))
-                                phases.append(phase_value)
-                                break
-                break
+            # 样本末尾可能截断多字节字符，按增量方式解码
+            codecs.getincrementaldecoder(encoding)().decode(sample, final=False)
+            return encoding
         except UnicodeDecodeError:
             continue
-        except Exception as e:
-            print(f"使用 {encoding} 编码时出现错误: {e}")
-            continue
+    return 'latin-1'
+
+def value_pattern(variable_name):
+    """
+    每行提取一个数值的正则，优先级与逐个尝试以下格式相同:
+    变量名:-79.70° / 变量名:-79.70 / -79.70° / -79.70
+    """
+    number = r'(-?\d+\.?\d*)'
+    return re.compile(
+        rf'^(?:.*?{variable_name}:\s*{number}|.*?{number}°|.*?{number})',
+        re.MULTILINE
+    )
+
+def iter_phase_chunks(filename, variable_name, block_size=BLOCK_SIZE):
+    """
+    分块读取数据文件，每块返回一个 float64 数组
+    支持格式: [变量名]:-79.70° 或 -79.70°
+    """
+    encoding = detect_encoding(filename)
+    print(f"使用 {encoding} 编码成功读取文件")
+    pattern = value_pattern(variable_name)
+    
+    # 检测样本之后仍有无法解码的字节时替换掉，不中断读取
+    with open(filename, 'r', encoding=encoding, errors='replace') as file:
+        rest = ''
+        while True:
+            block = file.read(block_size)
+            if not block:
+                text, rest = rest, ''
+            else:
+                # 最后一个不完整的行留到下一块
+                text = rest + block
+                cut = text.rfind('\n') + 1
+                text, rest = text[:cut], text[cut:]
+            if text:
+                values = [a or b or c for a, b, c in pattern.findall(text)]
+                if values:
+                    yield np.array(values, dtype=np.float64)
+            if not block:
+                break
+
+def read_phase_data(filename, variable_name):
+    """
+    读取数据文件，自动检测编码，返回全部数值
+    数据量很大时请使用 summarize_phase_data，内存占用与文件大小无关
+    """
+    chunks = list(iter_phase_chunks(filename, variable_name))
+    return np.concatenate(chunks).tolist() if chunks else []
+
+class StreamingStats:
+    """
+    分块累计的统计量：点数、最小/最大值，均值和标准差用 Welford/Chan 合并公式计算
+    """
+    def __init__(self):
+        self.count = 0
+        self.min = float('inf')
+        self.max = float('-inf')
+        self.mean = 0.0
+        self.m2 = 0.0  # 与均值之差的平方和
+
+    def update(self, values):
+        n = len(values)
+        if n == 0:
+            return
+        mean = float(values.mean())
+        m2 = float(((values - mean) ** 2).sum())
+        total = self.count + n
+        delta = mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += m2 + delta * delta * self.count * n / total
+        self.count = total
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+    @property
+    def std(self):
+        """总体标准差，与 np.std 相同"""
+        return (self.m2 / self.count) ** 0.5 if self.count else 0.0
+
+class EnvelopeBuilder:
+    """
+    分块生成绘图用的最小/最大值包络
     
-    return phases
+    每个桶保存 bucket 个连续数据点的最小值和最大值；桶数超过 2 * max_buckets 时
+    相邻两桶合并、bucket 加倍，所以内存占用有上限。数据较少时 bucket 为 1，即原始数据
+    """
+    def __init__(self, max_buckets=ENVELOPE_BUCKETS):
+        self.max_buckets = max_buckets
+        self.bucket = 1
+        self.mins = np.empty(0)
+        self.maxs = np.empty(0)
+        # 未满的最后一个桶
+        self.partial_count = 0
+        self.partial_min = float('inf')
+        self.partial_max = float('-inf')
+
+    def update(self, values):
+        # 先补满上一块留下的不完整桶
+        need = self.bucket - self.partial_count
+        head, values = values[:need], values[need:]
+        if len(head):
+            self.partial_count += len(head)
+            self.partial_min = min(self.partial_min, float(head.min()))
+            self.partial_max = max(self.partial_max, float(head.max()))
+        if self.partial_count == self.bucket:
+            self.mins = np.append(self.mins, self.partial_min)
+            self.maxs = np.append(self.maxs, self.partial_max)
+            self._reset_partial()
+        
+        full = len(values) // self.bucket * self.bucket
+        if full:
+            blocks = values[:full].reshape(-1, self.bucket)
+            self.mins = np.concatenate([self.mins, blocks.min(axis=1)])
+            self.maxs = np.concatenate([self.maxs, blocks.max(axis=1)])
+        tail = values[full:]
+        if len(tail):
+            self.partial_count = len(tail)
+            self.partial_min = float(tail.min())
+            self.partial_max = float(tail.max())
+        
+        while len(self.mins) > 2 * self.max_buckets:
+            self._merge()
+
+    def _reset_partial(self):
+        self.partial_count = 0
+        self.partial_min = float('inf')
+        self.partial_max = float('-inf')
+
+    def _merge(self):
+        """相邻两桶合并；桶数为奇数时最后一桶并入不完整桶"""
+        if len(self.mins) % 2:
+            self.partial_count += self.bucket
+            self.partial_min = min(self.partial_min, self.mins[-1])
+            self.partial_max = max(self.partial_max, self.maxs[-1])
+            self.mins, self.maxs = self.mins[:-1], self.maxs[:-1]
+        self.mins = self.mins.reshape(-1, 2).min(axis=1)
+        self.maxs = self.maxs.reshape(-1, 2).max(axis=1)
+        self.bucket *= 2
+
+    def result(self):
+        """
+        返回 (x, mins, maxs)，x 为各桶中心的数据点序号（从1开始）
+        """
+        mins, maxs = self.mins, self.maxs
+        centers = np.arange(len(mins)) * self.bucket + (self.bucket + 1) / 2
+        if self.partial_count:
+            mins = np.append(mins, self.partial_min)
+            maxs = np.append(maxs, self.partial_max)
+            centers = np.append(centers, len(self.mins) * self.bucket + (self.partial_count + 1) / 2)
+        return centers, mins, maxs
+
+def summarize_phase_data(filename, variable_name):
+    """
+    逐块读取文件，一次遍历同时得到统计量和绘图包络，峰值内存与文件大小无关
+    """
+    stats = StreamingStats()
+    envelope = EnvelopeBuilder()
+    for values in iter_phase_chunks(filename, variable_name):
+        stats.update(values)
+        envelope.update(values)
+    return stats, envelope
 
-def create_trend_plot(phases, filename, height, width):
+def create_trend_plot(envelope, stats, filename, height, width):
     """
     创建美观的折线图显示相位变化趋势
+    数据较多时绘制每个桶的最小/最大值包络
     """
     # 创建图表
     plt.figure(figsize=(width, height))
     
     # 数据点序号
-    x = np.arange(1, len(phases) + 1)
+    x, mins, maxs = envelope.result()
     
-    # 绘制主折线图
-    plt.plot(x, phases, linewidth=2.5, marker='o', markersize=6, 
-             color='#1f77b4', markerfacecolor='#ff7f0e', 
-             markeredgewidth=1, markeredgecolor='white', alpha=0.9,
-             label='相位数据')
+    if envelope.bucket == 1:
+        # 绘制主折线图
+        plt.plot(x, mins, linewidth=2.5, marker='o', markersize=6, 
+                 color='#1f77b4', markerfacecolor='#ff7f0e', 
+                 markeredgewidth=1, markeredgecolor='white', alpha=0.9,
+                 label='相位数据')
+    else:
+        # 最小/最大值交替连线，保留每个桶内的波动范围
+        y = np.empty(len(mins) * 2)
+        y[0::2] = mins
+        y[1::2] = maxs
+        plt.plot(np.repeat(x, 2), y, linewidth=0.8, color='#1f77b4', alpha=0.9,
+                 label=f'相位数据 (每{envelope.bucket}点的最小/最大值)')
     
     # 添加趋势线
     # if len(phases) > 1:
@@ -114,9 +263,9 @@ def create_trend_plot(phases, filename, height, width):
     plt.gca().spines['bottom'].set_linewidth(0.5)
     
     # 设置坐标轴范围，留出适当边距
-    y_margin = (max(phases) - min(phases)) * 0.1
-    plt.ylim(min(phases) - y_margin, max(phases) + y_margin)
-    plt.xlim(0.5, len(phases) + 0.5)
+    y_margin = (stats.max - stats.min) * 0.1
+    plt.ylim(stats.min - y_margin, stats.max + y_margin)
+    plt.xlim(0.5, stats.count + 0.5)
     
     # 调整布局
     plt.tight_layout()
@@ -128,10 +277,10 @@ def main(filename, height, width):
         # 获取变量名
         variable_name = input("请输入变量名(如Phase): ")
         
-        # 读取数据
-        phases = read_phase_data(filename, variable_name)
+        # 分块读取数据，同时累计统计量和绘图包络
+        stats, envelope = summarize_phase_data(filename, variable_name)
         
-        if not phases:
+        if not stats.count:
             print(f"未找到有效的{variable_name}数据，请检查文件格式")
             print("支持的格式示例:")
             print(f"  {variable_name}:-79.70°")
@@ -140,12 +289,12 @@ def main(filename, height, width):
             print("  -79.70")
             return
             
-        print(f"成功读取 {len(phases)} 个{variable_name}数据点")
-        print(f"数据范围: {min(phases):.2f}° 到 {max(phases):.2f}°")
-        print(f"平均值: {np.mean(phases):.2f}°, 标准差: {np.std(phases):.2f}°")
+        print(f"成功读取 {stats.count} 个{variable_name}数据点")
+        print(f"数据范围: {stats.min:.2f}° 到 {stats.max:.2f}°")
+        print(f"平均值: {stats.mean:.2f}°, 标准差: {stats.std:.2f}°")
         
         # 创建折线图
-        fig = create_trend_plot(phases, filename, height, width)
+        fig = create_trend_plot(envelope, stats, filename, height, width)
         
         # 保存图片
         plt.savefig(f'{filename}_plot.png', dpi=300, bbox_inches='tight', 
@@ -22,6 +22,34 @@ LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
 OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
+import argparse
+import ast
+import base64
+import bisect
+import contextlib
+import gc
+import hashlib
+import json
+import http.server
+import io
+import multiprocessing
+import queue
+import operator
+import os
+import re
+import statistics
+import subprocess
+import sys
+import shutil
+import socket
+import struct
+import tempfile
+import tracemalloc
+import zipfile
+from abc import ABC, abstractmethod
+from array import array
+from itertools import accumulate, groupby, islice
+from multiprocessing import shared_memory
 import serial
 import serial.tools.list_ports
 import threading
@@ -29,10 +57,2860 @@ import time
 import traceback
 import tkinter as tk
 import numpy as np
-from tkinter import ttk, messagebox
-from matplotlib.animation import FuncAnimation
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import matplotlib.pyplot as plt
+from collections import deque
+from tkinter import ttk, messagebox, filedialog
+from tkinter import font as tkfont
+
+# Matplotlib 导入较慢，首次绘图时由 load_matplotlib() 导入，窗口可以立即显示
+plt = None
+FuncAnimation = None
+FigureCanvasTkAgg = None
+GridSpec = None
+
+def load_matplotlib():
+    """导入 Matplotlib 绘图相关模块（只在第一次调用时导入）"""
+    global plt, FuncAnimation, FigureCanvasTkAgg, GridSpec
+    if plt is None:
+        from matplotlib.animation import FuncAnimation
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        from matplotlib.gridspec import GridSpec
+        import matplotlib.pyplot as plt
+
+class FrameScheduler:
+    """
+    自适应帧率调度器
+    
+    根据实测的单帧耗时和数据输入速率动态调整刷新间隔：
+    - 单帧耗时 / UI线程CPU预算 决定可承受的最高帧率
+    - 输入速率低于该帧率时按输入速率刷新，没有新数据时降到最低帧率
+    - 最终帧率限制在 [min_fps, max_fps] 范围内
+    """
+    def __init__(self, min_fps=5, max_fps=60, cpu_budget=0.5, smoothing=0.2):
+        self.min_fps = min_fps
+        self.max_fps = max_fps
+        self.cpu_budget = cpu_budget  # UI线程用于绘图的时间占比上限(0~1)
+        self.smoothing = smoothing    # 指数平滑系数
+        self.reset()
+
+    def reset(self):
+        """重置测量状态"""
+        self.frame_time = 0.0   # 平滑后的单帧耗时(秒)
+        self.input_rate = 0.0   # 平滑后的数据输入速率(点/秒)
+        self.fps = 0.0          # 实际帧率
+        self.last_cost = 0.0    # 最近一帧的耗时(秒)
+        self.interval = 1.0 / self.max_fps
+        self._last_frame_start = None
+        self._last_count = None
+        self._last_count_time = None
+
+    def configure(self, min_fps, max_fps, cpu_budget):
+        """更新帧率范围和CPU预算，非法值保持原设置"""
+        if 0 < min_fps <= max_fps:
+            self.min_fps = min_fps
+            self.max_fps = max_fps
+        if 0 < cpu_budget <= 1:
+            self.cpu_budget = cpu_budget
+
+    def begin_frame(self):
+        """帧开始时调用，返回帧起始时间"""
+        now = time.perf_counter()
+        if self._last_frame_start is not None:
+            dt = now - self._last_frame_start
+            if dt > 0:
+                self.fps += self.smoothing * (1.0 / dt - self.fps)
+        self._last_frame_start = now
+        return now
+
+    def end_frame(self, start, sample_count):
+        """
+        帧结束时调用，根据本帧耗时和累计数据点数计算下一帧的间隔(秒)
+        """
+        now = time.perf_counter()
+        cost = now - start
+        self.last_cost = cost
+        if self.frame_time == 0.0:
+            self.frame_time = cost
+        else:
+            self.frame_time += self.smoothing * (cost - self.frame_time)
+        
+        if self._last_count_time is not None:
+            elapsed = now - self._last_count_time
+            if elapsed > 0:
+                # 计数被重置(刷新数据)时不计入负速率
+                rate = max(0, sample_count - self._last_count) / elapsed
+                self.input_rate += self.smoothing * (rate - self.input_rate)
+        self._last_count = sample_count
+        self._last_count_time = now
+        
+        # CPU预算允许的最高帧率
+        if self.frame_time > 0:
+            target = min(self.max_fps, self.cpu_budget / self.frame_time)
+        else:
+            target = self.max_fps
+        # 不必比数据到达得更快地重绘
+        target = min(target, self.input_rate)
+        target = max(self.min_fps, min(self.max_fps, target))
+        
+        self.interval = 1.0 / target
+        return self.interval
+
+SERIAL_ENCODINGS = ['utf-8', 'gbk', 'ascii', 'latin1']
+
+def decode_serial_data(raw_data):
+    """依次尝试多种编码解码串口数据，全部失败时使用替换策略"""
+    for encoding in SERIAL_ENCODINGS:
+        try:
+            data = raw_data.decode(encoding)
+            print(f"使用 {encoding} 解码成功")
+            return data
+        except UnicodeDecodeError:
+            continue
+    print("警告: 使用替换策略解码数据")
+    return raw_data.decode('utf-8', errors='replace')
+
+def clean_line(line):
+    """去除首尾空白并过滤非可打印字符"""
+    line = line.strip()
+    return ''.join(c for c in line if c.isprintable() or c in '\t\r\n')
+
+def parse_line(line, params):
+    """
+    从一行数据中提取各参数的数值，格式为 参数名:数值[单位]
+    
+    返回 ([(参数名, 数值), ...], 解析失败的个数)
+    """
+    values = []
+    errors = 0
+    for param in params:
+        if f"{param}:" in line:
+            try:
+                # 提取数值部分
+                value_part = line.split(f"{param}:")[1]
+                # 去除单位符号并提取数值
+                value_str = ''.join(c for c in value_part.split()[0]
+                                    if c.isdigit() or c in '.-')
+                values.append((param, float(value_str)))
+            except (ValueError, IndexError, AttributeError) as e:
+                print(f"数据解析错误: {line} - {e}")
+                errors += 1
+    return values, errors
+
+# 自动发现模式下的 名称:数值 对，名称不能以数字开头（排除时间戳等）
+AUTO_CHANNEL_PATTERN = re.compile(r'([^\W\d][\w.]*)\s*:\s*([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)')
+
+class ChannelRegistry:
+    """
+    自动发现模式的通道表：通道名 -> 通道编号
+    
+    新名称经 sys.intern 驻留后登记，已登记的通道每次查找只需一次字典命中。
+    通道数达到上限后，新名称的数值直接丢弃并计入 rejected，防止乱码数据生成大量通道；
+    reserved 中的名称（派生通道）不会被登记
+    """
+    def __init__(self, max_channels=32, initial=(), reserved=()):
+        self.max_channels = max_channels
+        self.reserved = frozenset(reserved)
+        self.ids = {}
+        self.names = []
+        self.rejected = 0
+        for name in initial:
+            self.lookup(name)
+
+    def lookup(self, name):
+        """返回通道编号，名称无法登记时返回 None"""
+        channel = self.ids.get(name)
+        if channel is not None:
+            return channel
+        if len(self.names) >= self.max_channels or name in self.reserved:
+            self.rejected += 1
+            return None
+        # 先写名称表再写字典，其他线程查到编号时名称一定已经存在
+        self.names.append(sys.intern(name))
+        channel = self.ids[self.names[-1]] = len(self.names) - 1
+        return channel
+
+def parse_auto_line(line, registry):
+    """
+    自动发现模式：提取一行中全部 名称:数值 对
+    
+    返回 [(通道编号, 数值), ...]，通道名为 registry.names[通道编号]
+    """
+    values = []
+    for name, number in AUTO_CHANNEL_PATTERN.findall(line):
+        channel = registry.lookup(name)
+        if channel is not None:
+            values.append((channel, float(number)))
+    return values
+
+class BoundedQueue:
+    """
+    线程间的有界队列，满时按溢出策略处理而不是阻塞生产者
+    
+    - drop_oldest: 丢弃最旧的数据
+    - drop_newest: 丢弃新到的数据
+    - decimate: 把队列中已有的数据隔一取一，保留时间跨度
+    丢弃的条数累计在 dropped 中
+    """
+    policies = ('drop_oldest', 'drop_newest', 'decimate')
+
+    def __init__(self, maxsize, policy='drop_oldest'):
+        if policy not in self.policies:
+            raise ValueError(f"未知的溢出策略: {policy}")
+        self.maxsize = maxsize
+        self.policy = policy
+        self.items = deque()
+        self.dropped = 0
+        self.cond = threading.Condition()
+
+    def __len__(self):
+        return len(self.items)
+
+    def put_many(self, items):
+        """放入多条数据，返回本次丢弃的条数"""
+        dropped = 0
+        with self.cond:
+            for item in items:
+                if len(self.items) >= self.maxsize:
+                    if self.policy == 'drop_newest':
+                        dropped += 1
+                        continue
+                    if self.policy == 'drop_oldest':
+                        self.items.popleft()
+                        dropped += 1
+                    else:
+                        kept = list(self.items)[::2]
+                        dropped += len(self.items) - len(kept)
+                        self.items = deque(kept)
+                self.items.append(item)
+            self.dropped += dropped
+            self.cond.notify()
+        return dropped
+
+    def put(self, item):
+        return self.put_many((item,))
+
+    def get_batch(self, max_items=None, timeout=None):
+        """取出最多 max_items 条数据，队列为空时最多等待 timeout 秒"""
+        with self.cond:
+            if not self.items and timeout:
+                self.cond.wait(timeout)
+            count = len(self.items) if max_items is None else min(max_items, len(self.items))
+            return [self.items.popleft() for _ in range(count)]
+
+    def clear(self):
+        with self.cond:
+            self.items.clear()
+
+def raw_queue_policy(policy):
+    """
+    原始数据队列实际使用的溢出策略
+    
+    原始数据块按字节切分，隔一取一会把不相邻数据块中的半行拼在一起，
+    所以抽取策略只用于显示行，原始数据队列改为丢弃最旧
+    """
+    return 'drop_oldest' if policy == 'decimate' else policy
+
+class LineAssembler:
+    """
+    把带序号的原始数据块拼接为完整的行
+    
+    读取线程按顺序给每个数据块编号，序号不连续说明中间的数据块被队列丢弃：
+    间隙之前残留的半行和间隙之后第一个换行符之前的内容都不完整，在间隙处一并丢弃（重同步），
+    不会把间隙两侧的半行拼成一行。超长且没有换行的数据也视为垃圾丢弃
+    """
+    def __init__(self, max_line_length=4096):
+        self.max_line_length = max_line_length
+        self.buffer = ""
+        self.resyncing = False
+        self.next_seq = 0
+        self.resyncs = 0  # 因丢块或超长而重同步的次数
+
+    def feed(self, chunks):
+        """chunks 为 [(序号, 原始字节), ...]，返回拼接出的完整行"""
+        lines = []
+        segment = []
+        for seq, data in chunks:
+            if seq != self.next_seq:
+                self._split(segment, lines)
+                segment = []
+                self.discard_partial()
+                self.resyncs += 1
+            segment.append(data)
+            self.next_seq = seq + 1
+        self._split(segment, lines)
+        return lines
+
+    def discard_partial(self):
+        """丢弃残留的半行，并丢弃到下一个换行符为止"""
+        self.buffer = ""
+        self.resyncing = True
+
+    def _split(self, segment, lines):
+        if not segment:
+            return
+        self.buffer += decode_serial_data(b''.join(segment))
+        *new_lines, self.buffer = self.buffer.split('\n')
+        if self.resyncing and new_lines:
+            new_lines = new_lines[1:]
+            self.resyncing = False
+        lines.extend(new_lines)
+        if len(self.buffer) > self.max_line_length:
+            self.discard_partial()
+            self.resyncs += 1
+
+class PipelineCounters:
+    """采集管线的丢失/错误计数，用于判断采集是否无损"""
+    fields = ('dropped_lines', 'dropped_bytes', 'dropped_samples', 'parse_errors', 'resyncs', 'overruns',
+              'rejected_channels')
+
+    def __init__(self):
+        for field in self.fields:
+            setattr(self, field, 0)
+
+    def snapshot(self):
+        return {field: getattr(self, field) for field in self.fields}
+
+    def lossless(self):
+        return not any(self.snapshot().values())
+
+class Histogram:
+    """固定分桶的直方图，格式与 Prometheus 的 histogram 一致"""
+    def __init__(self, buckets):
+        self.buckets = sorted(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # 最后一个为 +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self):
+        with self.lock:
+            return list(self.counts), self.sum, self.count
+
+    def quantile(self, q):
+        """按分桶上界估计分位数，没有数据时返回 None"""
+        counts, _, total = self.snapshot()
+        if total == 0:
+            return None
+        target = q * total
+        seen = 0
+        for bound, count in zip(self.buckets + [float('inf')], counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return float('inf')
+
+class MetricsRegistry:
+    """
+    采集和绘图各阶段的运行指标：累计计数、即时量（队列深度等）和耗时直方图
+    
+    可渲染为 Prometheus 文本格式，供本机 HTTP 端点抓取
+    """
+    prefix = 'serial_plotter_'
+    latency_buckets = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                       0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+    def __init__(self):
+        self.counters = {}    # 名称 -> [说明, 值]
+        self.gauges = {}      # 名称 -> (说明, 取值函数)
+        self.histograms = {}  # 名称 -> (说明, Histogram)
+        self.lock = threading.Lock()
+
+    def counter(self, name, help_text):
+        self.counters.setdefault(name, [help_text, 0])
+
+    def inc(self, name, amount=1):
+        with self.lock:
+            self.counters[name][1] += amount
+
+    def gauge(self, name, help_text, func):
+        self.gauges[name] = (help_text, func)
+
+    def histogram(self, name, help_text, buckets=None):
+        if name not in self.histograms:
+            self.histograms[name] = (help_text, Histogram(buckets or self.latency_buckets))
+        return self.histograms[name][1]
+
+    def observe(self, name, value):
+        self.histograms[name][1].observe(value)
+
+    def counter_values(self):
+        with self.lock:
+            return {name: value for name, (_, value) in self.counters.items()}
+
+    def gauge_values(self):
+        values = {}
+        for name, (_, func) in self.gauges.items():
+            try:
+                values[name] = func()
+            except Exception:
+                values[name] = float('nan')
+        return values
+
+    def render_prometheus(self):
+        """生成 Prometheus 文本格式（0.0.4）"""
+        lines = []
+        for name, value in self.counter_values().items():
+            full = f"{self.prefix}{name}_total"
+            lines.append(f"# HELP {full} {self.counters[name][0]}")
+            lines.append(f"# TYPE {full} counter")
+            lines.append(f"{full} {value}")
+        for name, value in self.gauge_values().items():
+            full = self.prefix + name
+            lines.append(f"# HELP {full} {self.gauges[name][0]}")
+            lines.append(f"# TYPE {full} gauge")
+            lines.append(f"{full} {value}")
+        for name, (help_text, hist) in self.histograms.items():
+            full = self.prefix + name
+            counts, total_sum, total = hist.snapshot()
+            lines.append(f"# HELP {full} {help_text}")
+            lines.append(f"# TYPE {full} histogram")
+            cumulative = 0
+            for bound, count in zip(hist.buckets, counts):
+                cumulative += count
+                lines.append(f'{full}_bucket{{le="{bound:g}"}} {cumulative}')
+            lines.append(f'{full}_bucket{{le="+Inf"}} {total}')
+            lines.append(f"{full}_sum {total_sum}")
+            lines.append(f"{full}_count {total}")
+        return '\n'.join(lines) + '\n'
+
+class MetricsServer:
+    """在本机 HTTP 端点 /metrics 上提供 Prometheus 文本格式的指标"""
+    def __init__(self, registry, port, host='127.0.0.1'):
+        registry_ref = registry
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = registry_ref.render_prometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = http.server.ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    @property
+    def port(self):
+        return self.httpd.server_address[1]
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+class SamplingProfiler:
+    """
+    线程调用栈采样器，用于现场查找耗时所在
+    
+    后台线程每隔 interval 秒通过 sys._current_frames() 读取目标线程的调用栈并累计次数，
+    不插桩、不改变被采样线程的执行；结果可写出为火焰图工具使用的折叠栈格式和热点函数汇总
+    """
+    def __init__(self, threads, interval=0.005):
+        self.threads = list(threads)
+        self.interval = interval
+        self.stacks = {}   # (线程名, 最外层函数, ..., 最内层函数) -> 采样次数
+        self.samples = 0
+        self.elapsed = 0.0
+        self.labels = {}   # 代码对象 -> 函数名称，避免每次采样重新格式化
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, name='profiler', daemon=True)
+
+    def start(self):
+        self.started = time.perf_counter()
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        self.thread.join()
+        self.elapsed = time.perf_counter() - self.started
+
+    def _label(self, code):
+        label = self.labels.get(code)
+        if label is None:
+            name = getattr(code, 'co_qualname', code.co_name)
+            label = f"{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+            self.labels[code] = label
+        return label
+
+    def _run(self):
+        targets = {thread.ident: thread.name for thread in self.threads}
+        while not self.stop_event.wait(self.interval):
+            frames = sys._current_frames()
+            for ident, name in targets.items():
+                frame = frames.get(ident)
+                if frame is None:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(self._label(frame.f_code))
+                    frame = frame.f_back
+                stack.append(name)
+                key = tuple(reversed(stack))
+                self.stacks[key] = self.stacks.get(key, 0) + 1
+            self.samples += 1
+            del frames
+
+    def collapsed(self):
+        """折叠栈格式：每行 "线程;外层函数;...;内层函数 次数"，可直接用 flamegraph.pl 或 speedscope 打开"""
+        return [f"{';'.join(stack)} {count}" for stack, count in sorted(self.stacks.items())]
+
+    def summary(self, top=20):
+        """按线程列出热点函数：总计为调用栈中出现的比例（含调用的函数），自身为位于栈顶的比例"""
+        lines = [f"采样 {self.elapsed:.1f} 秒，间隔 {self.interval * 1000:g} ms，共 {self.samples} 次"]
+        for thread in self.threads:
+            stacks = {stack[1:]: count for stack, count in self.stacks.items() if stack[0] == thread.name}
+            total = sum(stacks.values())
+            if not total:
+                continue
+            inclusive, own = {}, {}
+            for stack, count in stacks.items():
+                for label in set(stack):
+                    inclusive[label] = inclusive.get(label, 0) + count
+                own[stack[-1]] = own.get(stack[-1], 0) + count
+            lines.append("")
+            lines.append(f"线程 {thread.name}: {total} 次采样")
+            lines.append(f"{'总计':>8}{'自身':>8}  函数")
+            for label, count in sorted(inclusive.items(), key=lambda item: -item[1])[:top]:
+                lines.append(f"{count / total:8.1%}{own.get(label, 0) / total:8.1%}  {label}")
+        return lines
+
+    def write(self, path):
+        """写出折叠栈文件 path 和同名的 .txt 汇总，返回汇总文件路径"""
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(self.collapsed()) + '\n')
+        summary_path = os.path.splitext(path)[0] + '.txt'
+        with open(summary_path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(self.summary()) + '\n')
+        return summary_path
+
+def encode_sample_batch(seq, batch, starts, fmt):
+    """
+    把一批数据编码为转发格式
+    
+    - ndjson: 一行 JSON，{"seq", "time", "channels": {参数: {"start", "values"}}}
+    - binary: b'SPB1' + seq(u32) + 时间(f64) + 通道数(u16)，
+      每个通道为 名称长度(u16) + UTF-8名称 + 起始序号(u64) + 点数(u32) + float64 小端数据
+    """
+    if fmt == 'ndjson':
+        message = {
+            'seq': seq,
+            'time': time.time(),
+            'channels': {param: {'start': starts[param], 'values': values.tolist()}
+                         for param, values in batch.items()},
+        }
+        return (json.dumps(message, ensure_ascii=False) + '\n').encode('utf-8')
+    parts = [struct.pack('<4sIdH', b'SPB1', seq & 0xFFFFFFFF, time.time(), len(batch))]
+    for param, values in batch.items():
+        name = param.encode('utf-8')
+        parts.append(struct.pack('<H', len(name)))
+        parts.append(name)
+        parts.append(struct.pack('<QI', starts[param], len(values)))
+        parts.append(np.asarray(values, dtype='<f8').tobytes())
+    return b''.join(parts)
+
+def websocket_frame(payload, binary):
+    """生成服务端到客户端的 WebSocket 数据帧（不加掩码）"""
+    opcode = 0x82 if binary else 0x81
+    length = len(payload)
+    if length < 126:
+        header = struct.pack('!BB', opcode, length)
+    elif length < 1 << 16:
+        header = struct.pack('!BBH', opcode, 126, length)
+    else:
+        header = struct.pack('!BBQ', opcode, 127, length)
+    return header + payload
+
+class StreamSubscriber:
+    """
+    转发服务的一个订阅者，拥有独立的有界发送队列和发送线程
+    
+    发送跟不上时按策略丢弃旧数据、抽取或直接断开，不会阻塞采集
+    """
+    send_timeout = 5.0
+
+    def __init__(self, conn, address, maxsize, policy, websocket, on_close):
+        self.conn = conn
+        self.address = address
+        self.websocket = websocket
+        self.disconnect_slow = policy == 'disconnect'
+        queue_policy = 'drop_newest' if self.disconnect_slow else policy
+        self.queue = BoundedQueue(maxsize, queue_policy)
+        self.on_close = on_close
+        self.sent = 0
+        self.closed = False
+        self.conn.settimeout(self.send_timeout)
+        self.thread = threading.Thread(target=self._send_loop, daemon=True)
+        self.thread.start()
+
+    def offer(self, payload):
+        """放入一批待发送的数据，订阅者过慢时返回 False"""
+        if self.closed:
+            return False
+        if self.queue.put(payload) and self.disconnect_slow:
+            print(f"订阅者 {self.address} 发送过慢，已断开")
+            self.close()
+            return False
+        return True
+
+    def _send_loop(self):
+        while not self.closed:
+            payloads = self.queue.get_batch(timeout=0.5)
+            if not payloads:
+                continue
+            try:
+                self.conn.sendall(b''.join(payloads))
+                self.sent += len(payloads)
+            except OSError:
+                self.close()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self.conn.close()
+        except OSError:
+            pass
+        self.on_close(self)
+
+class SampleBroadcaster:
+    """
+    本机数据转发服务：把解析好的数据按批广播给任意数量的订阅者
+    
+    只监听 127.0.0.1。普通 TCP 连接直接接收数据流，
+    以 HTTP Upgrade 请求连接的客户端按 WebSocket 协议接收（每批一个数据帧）。
+    每批数据只编码一次，订阅者之间互不影响
+    """
+    formats = ('binary', 'ndjson')
+    policies = ('drop_oldest', 'decimate', 'disconnect')
+    websocket_guid = b'258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+    def __init__(self, port, fmt='binary', policy='drop_oldest', queue_size=256, host='127.0.0.1'):
+        if fmt not in self.formats:
+            raise ValueError(f"未知的转发格式: {fmt}")
+        if policy not in self.policies:
+            raise ValueError(f"未知的慢速订阅者策略: {policy}")
+        self.fmt = fmt
+        self.policy = policy
+        self.queue_size = queue_size
+        self.subscribers = []
+        self.subscribers_lock = threading.Lock()
+        self.seq = 0
+        self.dropped_batches = 0
+        self.running = True
+        self.server = socket.create_server((host, port))
+        self.server.settimeout(0.5)
+        self.thread = threading.Thread(target=self._accept_loop, daemon=True)
+        self.thread.start()
+
+    @property
+    def port(self):
+        return self.server.getsockname()[1]
+
+    def subscriber_count(self):
+        with self.subscribers_lock:
+            return len(self.subscribers)
+
+    def _accept_loop(self):
+        while self.running:
+            try:
+                conn, address = self.server.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            # 握手可能较慢，放到单独线程中，不阻塞其他连接
+            threading.Thread(target=self._handshake, args=(conn, address), daemon=True).start()
+
+    def _handshake(self, conn, address):
+        """区分普通 TCP 与 WebSocket 客户端，完成握手后加入订阅者列表"""
+        websocket = False
+        try:
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            conn.settimeout(0.3)
+            try:
+                head = conn.recv(4096, socket.MSG_PEEK)
+            except socket.timeout:
+                head = b''
+            if head.startswith(b'GET '):
+                conn.settimeout(2.0)
+                request = b''
+                while b'\r\n\r\n' not in request and len(request) < 16384:
+                    chunk = conn.recv(4096)
+                    if not chunk:
+                        raise OSError("握手未完成")
+                    request += chunk
+                key = None
+                for line in request.decode('latin-1').split('\r\n')[1:]:
+                    name, _, value = line.partition(':')
+                    if name.strip().lower() == 'sec-websocket-key':
+                        key = value.strip()
+                if key is None:
+                    raise OSError("缺少 Sec-WebSocket-Key")
+                accept = base64.b64encode(hashlib.sha1(key.encode('ascii') + self.websocket_guid).digest())
+                conn.sendall(b'HTTP/1.1 101 Switching Protocols\r\n'
+                             b'Upgrade: websocket\r\nConnection: Upgrade\r\n'
+                             b'Sec-WebSocket-Accept: ' + accept + b'\r\n\r\n')
+                websocket = True
+        except OSError as e:
+            print(f"订阅者 {address} 握手失败: {e}")
+            conn.close()
+            return
+        
+        subscriber = StreamSubscriber(conn, address, self.queue_size, self.policy,
+                                      websocket, self._remove)
+        with self.subscribers_lock:
+            accepted = self.running
+            if accepted:
+                self.subscribers.append(subscriber)
+        if not accepted:
+            subscriber.close()
+            return
+        print(f"订阅者已连接: {address} ({'WebSocket' if websocket else 'TCP'})")
+
+    def _remove(self, subscriber):
+        with self.subscribers_lock:
+            if subscriber in self.subscribers:
+                self.subscribers.remove(subscriber)
+                print(f"订阅者已断开: {subscriber.address}")
+
+    def publish(self, batch, starts):
+        """广播一批数据；没有订阅者时不做编码"""
+        with self.subscribers_lock:
+            subscribers = list(self.subscribers)
+        if not subscribers or not batch:
+            return
+        self.seq += 1
+        payload = encode_sample_batch(self.seq, batch, starts, self.fmt)
+        framed = None
+        for subscriber in subscribers:
+            if subscriber.websocket:
+                if framed is None:
+                    framed = websocket_frame(payload, self.fmt == 'binary')
+                data = framed
+            else:
+                data = payload
+            before = subscriber.queue.dropped
+            subscriber.offer(data)
+            self.dropped_batches += subscriber.queue.dropped - before
+
+    def close(self):
+        self.running = False
+        try:
+            self.server.close()
+        except OSError:
+            pass
+        with self.subscribers_lock:
+            subscribers = list(self.subscribers)
+        for subscriber in subscribers:
+            subscriber.close()
+
+class DriverOverrunMonitor:
+    """
+    读取串口驱动层的接收溢出计数
+    
+    - Windows: 用 ClearCommError 代替 in_waiting 查询可读字节数，同时取得
+      CE_OVERRUN/CE_RXOVER 标志（pyserial 的 in_waiting 会把这些标志清掉）
+    - Linux: 用 TIOCGICOUNT 读取驱动累计的 overrun/buf_overrun
+    - 其他平台或设备不支持时计数保持为0
+    """
+    CE_RXOVER = 0x0001
+    CE_OVERRUN = 0x0002
+    TIOCGICOUNT = 0x545D
+
+    def __init__(self, ser):
+        self.ser = ser
+        self.count = 0
+        self._baseline = None
+        if os.name == 'posix':
+            self._baseline = self._read_icount()
+
+    def in_waiting(self):
+        """返回可读字节数（Windows 下顺带累计溢出次数）"""
+        if os.name == 'nt' and hasattr(self.ser, '_port_handle'):
+            try:
+                import ctypes
+                from serial import win32
+                flags = win32.DWORD()
+                comstat = win32.COMSTAT()
+                if win32.ClearCommError(self.ser._port_handle, ctypes.byref(flags), ctypes.byref(comstat)):
+                    if flags.value & (self.CE_OVERRUN | self.CE_RXOVER):
+                        self.count += 1
+                    return comstat.cbInQue
+            except Exception:
+                pass
+        return self.ser.in_waiting
+
+    def _read_icount(self):
+        try:
+            import fcntl
+            import struct
+            buf = fcntl.ioctl(self.ser.fileno(), self.TIOCGICOUNT, b'\0' * 80)
+            fields = struct.unpack('20i', buf)
+            return fields[7] + fields[10]  # overrun + buf_overrun
+        except Exception:
+            return None
+
+    def update(self):
+        """刷新 Linux 驱动的累计溢出计数，返回当前计数"""
+        if self._baseline is not None:
+            current = self._read_icount()
+            if current is not None:
+                self.count = current - self._baseline
+        return self.count
+
+class SharedSampleRing:
+    """
+    跨进程共享内存中的单生产者/单消费者数据环
+    
+    布局：int64 头部 [head, tail, capacity, dropped, 采集进程计数...]，随后是
+    float64 数值数组和 int32 通道编号数组。生产者写完数据后才推进 head，消费者处理完后推进 tail，
+    两个索引各只由一方写入（对齐的 int64 写入是原子的），因此不需要锁。
+    环满时生产者丢弃新数据并累计到 dropped。
+    """
+    counter_slots = {'dropped_lines': 4, 'parse_errors': 5, 'resyncs': 6, 'overruns': 7, 'rejected_channels': 8}
+    header_size = 9
+
+    def __init__(self, capacity=1 << 20, name=None):
+        self.owner = name is None
+        if self.owner:
+            size = self.header_size * 8 + capacity * (8 + 4)
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        
+        self.header = np.ndarray((self.header_size,), dtype=np.int64, buffer=self.shm.buf)
+        if self.owner:
+            self.header[:] = 0
+            self.header[2] = capacity
+        self.capacity = int(self.header[2])
+        offset = self.header_size * 8
+        self.values = np.ndarray((self.capacity,), dtype=np.float64, buffer=self.shm.buf, offset=offset)
+        offset += self.capacity * 8
+        self.ids = np.ndarray((self.capacity,), dtype=np.int32, buffer=self.shm.buf, offset=offset)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    @property
+    def dropped(self):
+        return int(self.header[3])
+
+    @property
+    def backlog(self):
+        """已写入但尚未取走的数据点数"""
+        return int(self.header[0] - self.header[1])
+
+    @property
+    def head(self):
+        """生产者已写入的数据点总数"""
+        return int(self.header[0])
+
+    @property
+    def tail(self):
+        """消费者已处理的数据点总数"""
+        return int(self.header[1])
+
+    def add_counter(self, name, count):
+        """生产者：累加采集进程的丢失/错误计数"""
+        self.header[self.counter_slots[name]] += count
+
+    def set_counter(self, name, value):
+        self.header[self.counter_slots[name]] = value
+
+    def counter(self, name):
+        return int(self.header[self.counter_slots[name]])
+
+    def write(self, ids, values):
+        """生产者：写入一批 (通道编号, 数值)"""
+        head = int(self.header[0])
+        free = self.capacity - (head - int(self.header[1]))
+        n = len(values)
+        if n > free:
+            self.header[3] += n - free
+            ids, values, n = ids[:free], values[:free], free
+        if n == 0:
+            return
+        pos = head % self.capacity
+        first = min(n, self.capacity - pos)
+        self.values[pos:pos + first] = values[:first]
+        self.ids[pos:pos + first] = ids[:first]
+        self.values[:n - first] = values[first:]
+        self.ids[:n - first] = ids[first:]
+        # 数据写完后再发布新的 head
+        self.header[0] = head + n
+
+    def peek(self, limit=None):
+        """
+        消费者：返回尚未读取的数据 (ids, values, head)，没有新数据时返回 None
+        
+        limit 不为 None 时只返回到数据点总数 limit 为止的数据。
+        数据不跨越环尾时直接返回共享内存上的视图（零拷贝），
+        使用完毕后调用 release(head)
+        """
+        head = int(self.header[0])
+        if limit is not None:
+            head = min(head, limit)
+        tail = int(self.header[1])
+        if head == tail:
+            return None
+        pos = tail % self.capacity
+        n = head - tail
+        if pos + n <= self.capacity:
+            return self.ids[pos:pos + n], self.values[pos:pos + n], head
+        first = self.capacity - pos
+        ids = np.concatenate((self.ids[pos:], self.ids[:n - first]))
+        values = np.concatenate((self.values[pos:], self.values[:n - first]))
+        return ids, values, head
+
+    def release(self, head):
+        """消费者：标记 head 之前的数据已处理"""
+        self.header[1] = head
+
+    def close(self):
+        """解除映射，创建方同时删除共享内存"""
+        # 先释放指向共享内存的数组，否则无法关闭
+        self.header = self.values = self.ids = None
+        try:
+            self.shm.close()
+            if self.owner:
+                self.shm.unlink()
+        except Exception as e:
+            print(f"关闭共享内存错误: {e}")
+
+def open_serial_port(port, baud):
+    """按程序统一的参数打开串口并清空输入缓冲区"""
+    ser = serial.Serial(
+        port=port,
+        baudrate=baud,
+        timeout=0.5,
+        bytesize=serial.EIGHTBITS,
+        parity=serial.PARITY_NONE,
+        stopbits=serial.STOPBITS_ONE
+    )
+    ser.reset_input_buffer()
+    return ser
+
+CAPTURE_MAGIC = b'SPCAP1\n'  # 原始数据录制文件的文件头
+
+class CaptureWriter:
+    """
+    把串口收到的原始字节连同到达时间写入录制文件，供 ReplaySource 按原时序回放
+    
+    格式：文件头 CAPTURE_MAGIC，随后每个数据块为 相对时间(f64) + 长度(u32) + 原始字节，均为小端
+    """
+    record = struct.Struct('<dI')
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.file = open(filename, 'wb')
+        self.file.write(CAPTURE_MAGIC)
+        self.start = time.perf_counter()
+
+    def write(self, data):
+        self.file.write(self.record.pack(time.perf_counter() - self.start, len(data)))
+        self.file.write(data)
+
+    def close(self):
+        self.file.close()
+
+class ReplaySource:
+    """
+    回放数据源：读取接口与 serial.Serial 相同，可以代替串口交给读取线程，
+    数据经过与实时采集相同的 解码 -> 解析 -> 存储 -> 绘图 流程
+    
+    支持三种文件：
+    - CaptureWriter 录制的原始数据，按录制时的到达时间回放
+    - 文本日志，每行为 [HH:MM:SS] 参数:数值（界面显示的格式）或 参数:数值；
+      按行首时间回放，同一秒内的行均匀分布，没有时间的行按波特率计算
+    - 其他文件视为原始字节流，按波特率（每字节10位）计算时间
+    
+    文件边读边回放，内存中只保留一个数据块（文本日志为同一秒内的行）和
+    已到时间、尚未读取的不超过 max_chunk 字节，与文件大小无关
+    
+    speed 为回放倍速，0 表示不等待、以最快速度回放
+    """
+    max_chunk = 65536
+    raw_block = 4096
+
+    def __init__(self, filename, speed=1.0, baud=115200):
+        self.filename = filename
+        self.speed = speed
+        self.byte_time = 10.0 / baud
+        self.file = open(filename, 'rb')
+        self.size = os.fstat(self.file.fileno()).st_size
+        head = self.file.read(4096)
+        self.file.seek(0)
+        if head.startswith(CAPTURE_MAGIC):
+            self.kind = "录制文件"
+            self.file.seek(len(CAPTURE_MAGIC))
+            self.chunks = self._capture_chunks()
+        elif b'\0' in head or not head.strip():
+            self.kind = "原始数据"
+            self.chunks = self._raw_chunks()
+        else:
+            self.kind = "文本日志"
+            self.chunks = self._text_chunks()
+        self.pending = None       # 下一个尚未到时间的 (时间, 数据)
+        self.ready = bytearray()  # 已到时间、尚未读取的数据
+        self.is_open = True
+        self.paused_at = None
+        self.started = time.perf_counter()
+
+    def _capture_chunks(self):
+        record = CaptureWriter.record
+        while True:
+            header = self.file.read(record.size)
+            if len(header) < record.size:
+                return
+            timestamp, length = record.unpack(header)
+            chunk = self.file.read(length)
+            if chunk:
+                yield timestamp, chunk
+            if len(chunk) < length:
+                return
+
+    def _raw_chunks(self):
+        total = 0
+        while True:
+            chunk = self.file.read(self.raw_block)
+            if not chunk:
+                return
+            total += len(chunk)
+            yield total * self.byte_time, chunk
+
+    def _text_chunks(self):
+        """
+        逐行读取文本日志；同一秒的行要知道行数才能均匀分布，所以每次缓存一秒内的行，
+        跨午夜时按加一天处理
+        """
+        elapsed = 0.0
+        first = previous = None
+        for second, group in groupby(self._text_lines(), key=operator.itemgetter(0)):
+            if second is None:
+                for _, payload in group:
+                    elapsed += len(payload) * self.byte_time
+                    yield elapsed, payload
+                continue
+            payloads = [payload for _, payload in group]
+            if first is None:
+                first = second
+            elif second < previous:
+                first -= 24 * 3600
+            count = len(payloads)
+            for i, payload in enumerate(payloads):
+                yield second - first + (i + 1) / count, payload
+            elapsed = second - first + 1
+            previous = second
+
+    def _text_lines(self):
+        """逐行返回 (行首时间的秒数或 None, 去掉时间后的原始字节行)"""
+        # 相邻的行时间通常相同，沿用上一行的解析结果
+        last_stamp, last_second = None, None
+        for line in self.file:
+            line = line.strip()
+            if not line:
+                continue
+            second = None
+            stamp = line[:10]
+            if stamp == last_stamp:
+                second = last_second
+            elif len(stamp) == 10 and stamp[:1] == b'[' and stamp[9:] == b']':
+                try:
+                    h, m, sec = (int(part) for part in stamp[1:9].split(b':'))
+                    second = h * 3600 + m * 60 + sec
+                    last_stamp, last_second = stamp, second
+                except ValueError:
+                    pass
+            if second is not None:
+                line = line[10:].lstrip()
+            yield second, line + b'\n'
+
+    @property
+    def finished(self):
+        return self.chunks is None and self.pending is None and not self.ready
+
+    @property
+    def progress(self):
+        if self.finished or not self.size or self.file.closed:
+            return 1.0
+        return min(1.0, self.file.tell() / self.size)
+
+    def _fill(self):
+        """把回放时钟已经到达的数据移入 ready，最多约 max_chunk 字节"""
+        if self.speed <= 0:
+            elapsed = float('inf')
+        else:
+            now = self.paused_at if self.paused_at is not None else time.perf_counter()
+            elapsed = (now - self.started) * self.speed
+        while len(self.ready) < self.max_chunk:
+            if self.pending is None:
+                if self.chunks is None:
+                    return
+                self.pending = next(self.chunks, None)
+                if self.pending is None:
+                    self.chunks = None
+                    return
+            due, data = self.pending
+            if due > elapsed:
+                return
+            self.ready += data
+            self.pending = None
+
+    @property
+    def in_waiting(self):
+        self._fill()
+        return min(len(self.ready), self.max_chunk)
+
+    def read(self, size=1):
+        self._fill()
+        data = bytes(self.ready[:size])
+        del self.ready[:size]
+        return data
+
+    def reset_input_buffer(self):
+        pass
+
+    def pause(self):
+        if self.paused_at is None:
+            self.paused_at = time.perf_counter()
+
+    def resume(self):
+        """继续回放，暂停期间不计入回放时钟"""
+        if self.paused_at is not None:
+            self.started += time.perf_counter() - self.paused_at
+            self.paused_at = None
+
+    def close(self):
+        self.is_open = False
+        self.file.close()
+
+class PortWatcher:
+    """
+    串口热插拔监视：后台线程定期检查设备是否存在
+    
+    Linux/macOS 只检查设备节点是否存在（由 udev/devd 创建和删除，开销很小），
+    每 interval 秒检查一次；Windows 的 COM 口没有文件节点，需要枚举串口列表，
+    枚举较慢，状态不变时检查间隔逐次加倍，最长 max_interval 秒，状态变化后恢复
+    """
+    def __init__(self, port, interval=0.5, max_interval=4.0):
+        self.port = port
+        self.interval = interval
+        self.max_interval = interval if os.name == 'posix' else max_interval
+        self.present_event = threading.Event()
+        self.stop_event = threading.Event()
+        if self._check():
+            self.present_event.set()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    @property
+    def present(self):
+        return self.present_event.is_set()
+
+    def _check(self):
+        try:
+            if os.name == 'posix':
+                return os.path.exists(self.port)
+            return any(info.device == self.port for info in serial.tools.list_ports.comports())
+        except Exception:
+            return False
+
+    def _run(self):
+        delay = self.interval
+        while not self.stop_event.wait(delay):
+            present = self._check()
+            if present == self.present:
+                delay = min(delay * 2, self.max_interval)
+                continue
+            delay = self.interval
+            if present:
+                self.present_event.set()
+            else:
+                self.present_event.clear()
+
+    def wait_present(self, timeout):
+        return self.present_event.wait(timeout)
+
+    def stop(self):
+        self.stop_event.set()
+
+def reconnect_serial(port, baud, watcher, should_stop):
+    """
+    等待设备重新出现并以相同设置打开串口
+    
+    设备刚出现时驱动可能尚未就绪，打开失败会继续重试；should_stop() 为真时返回 None
+    """
+    while not should_stop():
+        if not watcher.wait_present(0.5):
+            continue
+        try:
+            return open_serial_port(port, baud)
+        except (serial.SerialException, OSError) as e:
+            print(f"重新打开串口 {port} 失败，稍后重试: {e}")
+            time.sleep(watcher.interval)
+    return None
+
+def acquisition_process(port, baud, params, ring_name, line_queue, stop_event, pause_event, max_channels=0,
+                        reserved=()):
+    """
+    独立进程中的串口读取和解析
+    
+    解析出的数据写入共享内存数据环，原始行按批放入有界队列供界面显示，
+    界面来不及取时丢弃显示行，不影响数据采集
+    
+    max_channels 大于0时自动发现通道：新通道的名称先以 {'channel': 名称} 通知界面，
+    再写入它的数据，通道编号按出现顺序排在 params 之后；reserved 中的名称（派生通道）不会被发现为新通道
+    """
+    ring = SharedSampleRing(name=ring_name)
+    channel_ids = {param: i for i, param in enumerate(params)}
+    registry = ChannelRegistry(max_channels, params, reserved) if max_channels else None
+    max_line_length = 4096
+    try:
+        ser = open_serial_port(port, baud)
+    except Exception as e:
+        line_queue.put([f"错误: 采集进程无法打开串口 {port}: {e}"])
+        ring.close()
+        return
+    
+    buffer = ""
+    resync = False
+    watcher = PortWatcher(port)
+    overrun_monitor = DriverOverrunMonitor(ser)
+    overruns_before = 0  # 重连前各次连接累计的驱动溢出
+    last_overrun_check = time.time()
+    try:
+        while not stop_event.is_set():
+            if pause_event.is_set():
+                time.sleep(0.1)
+                continue
+            try:
+                if not watcher.present:
+                    raise serial.SerialException("设备已拔出")
+                now = time.time()
+                if now - last_overrun_check >= 1.0:
+                    overrun_monitor.update()
+                    last_overrun_check = now
+                bytes_to_read = overrun_monitor.in_waiting()
+                ring.set_counter('overruns', overruns_before + overrun_monitor.count)
+                if bytes_to_read == 0:
+                    time.sleep(0.005)
+                    continue
+                raw_data = ser.read(bytes_to_read)
+            except (serial.SerialException, OSError) as e:
+                # 断线：通知界面记录间隙（附带断线时数据环的写入位置），等待设备重新出现后继续写入同一数据环
+                line_queue.put([f"串口断开，等待重新连接: {e}"])
+                line_queue.put({'gap_start': time.time(), 'head': ring.head})
+                ser.close()
+                buffer = ""
+                ser = reconnect_serial(port, baud, watcher, stop_event.is_set)
+                if ser is None:
+                    break
+                overruns_before += overrun_monitor.count
+                overrun_monitor = DriverOverrunMonitor(ser)
+                line_queue.put({'gap_end': time.time()})
+                line_queue.put([f"串口 {port} 已重新连接"])
+                # 重连后的第一行可能不完整，丢弃到下一个换行符
+                resync = True
+                continue
+            
+            buffer += decode_serial_data(raw_data)
+            *lines, buffer = buffer.split('\n')
+            if resync and lines:
+                lines = lines[1:]
+                resync = False
+            if len(buffer) > max_line_length:
+                buffer = ""
+                ring.add_counter('resyncs', 1)
+            
+            timestamp = time.strftime('%H:%M:%S', time.localtime())
+            shown, ids, values = [], [], []
+            for line in lines:
+                line = clean_line(line)
+                if not line:
+                    continue
+                shown.append(f"[{timestamp}] {line}")
+                if registry is not None:
+                    known = len(registry.names)
+                    for channel, value in parse_auto_line(line, registry):
+                        ids.append(channel)
+                        values.append(value)
+                    for name in registry.names[known:]:
+                        line_queue.put({'channel': name})
+                    continue
+                parsed, errors = parse_line(line, params)
+                if errors:
+                    ring.add_counter('parse_errors', errors)
+                for param, value in parsed:
+                    ids.append(channel_ids[param])
+                    values.append(value)
+            
+            if registry is not None:
+                ring.set_counter('rejected_channels', registry.rejected)
+            if values:
+                ring.write(np.array(ids, dtype=np.int32), np.array(values, dtype=np.float64))
+            if shown:
+                try:
+                    line_queue.put_nowait(shown)
+                except queue.Full:
+                    ring.add_counter('dropped_lines', len(shown))
+    finally:
+        watcher.stop()
+        if ser is not None:
+            ser.close()
+        ring.close()
+
+def interleave(mins, maxs):
+    """把 min/max 交错排列为包络线的 y 序列"""
+    y = np.empty(len(mins) * 2)
+    y[0::2] = mins
+    y[1::2] = maxs
+    return y
+
+def min_max_buckets(values, x0, size):
+    """
+    把原始数据按 size 个一组聚合为 min/max
+    
+    返回 (x, mins, maxs)，x 为各组中心对应的索引（x0 为 values[0] 的索引）
+    """
+    full = len(values) // size * size
+    mins = values[:full].reshape(-1, size).min(axis=1)
+    maxs = values[:full].reshape(-1, size).max(axis=1)
+    x = x0 + np.arange(len(mins)) * size + size / 2.0
+    if full < len(values):
+        mins = np.append(mins, values[full:].min())
+        maxs = np.append(maxs, values[full:].max())
+        x = np.append(x, x0 + (full + len(values)) / 2.0)
+    return x, mins, maxs
+
+class ChannelStore:
+    """
+    单通道原始数据存储：内存环形缓冲 + 磁盘分段
+    
+    - 最近的数据保存在预分配的内存环形缓冲中，容量固定
+    - 每凑满一个数据块就追加写入磁盘文件，磁盘上保留全部历史
+    - 读取内存中已不存在的旧数据时通过内存映射按需载入
+    
+    单生产者/单消费者：写入方先推进 reserved 再写环，写完后才推进 count；
+    数据块落盘并 flush 后才推进 spilled。因此绘图线程读取 count 以内的数据不需要加锁，
+    读取期间被环形覆盖的部分（一定已经落盘）由 read 检测后改从磁盘读取
+    """
+    def __init__(self, path, ram_capacity, block_size=65536):
+        self.path = path
+        self.block_size = block_size
+        # 容量取块大小的整数倍，且至少两块，保证未落盘的数据都在内存中
+        self.capacity = max(2 * block_size, ram_capacity // block_size * block_size)
+        self.ring = np.empty(self.capacity)
+        self.count = 0    # 数据点总数
+        self.reserved = 0 # 正在写入的数据之后的索引，环中小于 reserved - capacity 的位置可能已被覆盖
+        self.spilled = 0  # 已写入磁盘的数据点数
+        self._file = None
+        self._map = None
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def ram_start(self):
+        """内存中最早数据点的索引"""
+        return max(0, self.count - self.capacity)
+
+    @property
+    def ram_bytes(self):
+        return self.ring.nbytes
+
+    def extend(self, values):
+        """追加一批数据，凑满的数据块随即落盘"""
+        values = np.asarray(values, dtype=np.float64)
+        for i in range(0, len(values), self.block_size):
+            chunk = values[i:i + self.block_size]
+            n = len(chunk)
+            pos = self.count % self.capacity
+            first = min(n, self.capacity - pos)
+            self.reserved = self.count + n
+            self.ring[pos:pos + first] = chunk[:first]
+            self.ring[:n - first] = chunk[first:]
+            self.count += n
+            self._spill()
+
+    def _spill(self):
+        """把已凑满的数据块写入磁盘，写入文件后才推进 spilled，读取方据此内存映射"""
+        while self.count - self.spilled >= self.block_size:
+            if self._file is None:
+                self._file = open(self.path, 'wb')
+            pos = self.spilled % self.capacity
+            self._file.write(self.ring[pos:pos + self.block_size].tobytes())
+            self._file.flush()
+            self.spilled += self.block_size
+
+    def _disk(self):
+        """返回覆盖全部已落盘数据的内存映射，文件增长后重新映射"""
+        if self._map is None or len(self._map) < self.spilled:
+            self._map = np.memmap(self.path, dtype=np.float64, mode='r', shape=(self.spilled,))
+        return self._map
+
+    def read(self, start, stop):
+        """读取索引 [start, stop) 的数据，返回独立的数组副本"""
+        start = max(0, start)
+        stop = min(stop, self.count)
+        if start >= stop:
+            return np.empty(0)
+        
+        parts = []
+        ram_start = self.ram_start
+        if start < ram_start:
+            disk_stop = min(stop, ram_start)
+            parts.append(np.array(self._disk()[start:disk_stop]))
+            start = disk_stop
+        if start < stop:
+            i0 = start % self.capacity
+            i1 = i0 + (stop - start)
+            if i1 <= self.capacity:
+                ram = self.ring[i0:i1].copy()
+            else:
+                ram = np.concatenate((self.ring[i0:], self.ring[:i1 - self.capacity]))
+            # 复制期间写入方可能覆盖了最旧的一段（已落盘），改从磁盘读取
+            clobbered = min(stop, self.reserved - self.capacity)
+            if clobbered > start:
+                ram[:clobbered - start] = self._disk()[start:clobbered]
+            parts.append(ram)
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+    def export_view(self):
+        """
+        返回当前数据的只读视图 (path, spilled, tail)，供后台导出使用
+        
+        已落盘部分不会再修改，可在锁外读取；尚未落盘的尾部复制一份，
+        调用方需持锁调用
+        """
+        return self.path, self.spilled, self.read(self.spilled, self.count)
+
+    def close(self):
+        """关闭磁盘文件和内存映射"""
+        self._map = None
+        if self._file is not None:
+            try:
+                self._file.close()
+            except Exception:
+                pass
+            self._file = None
+
+def view_series(store, pyramid, start, stop, target_points, max_decimate_span):
+    """
+    生成索引 [start, stop) 范围的绘图序列
+    
+    跨度较小时直接读取原始数据（旧数据从磁盘按需载入），否则从历史
+    金字塔中选择合适的级别，以 min/max 交错的包络线显示。
+    只读取 stop 以内已发布的数据，可在写入的同时无锁调用。
+    返回 (x, y, level)
+    """
+    span = stop - start
+    level = pyramid.choose_level(span, target_points)
+    
+    if level == 0:
+        y = store.read(start, stop)
+        return np.arange(start, start + len(y)), y, 0
+    
+    if not pyramid.covers(level, start):
+        if span <= max_decimate_span:
+            # 金字塔该级已不含这段数据，从原始存储读取后现场聚合
+            size = pyramid.factor ** level
+            x, mins, maxs = min_max_buckets(store.read(start, stop), start, size)
+            return np.repeat(x, 2), interleave(mins, maxs), level
+        while level < len(pyramid.levels) and not pyramid.covers(level, start):
+            level += 1
+    
+    x, mins, maxs, _ = pyramid.query(level, start, stop)
+    return np.repeat(x, 2), interleave(mins, maxs), level
+
+class LineLog:
+    """
+    串口数据框的行日志：全部显示行追加写入磁盘文件
+    
+    内存中只保留稀疏的 array('Q') 索引：每 stride 行记录一次起始字节偏移（每行约 0.1 字节），
+    长时间高速运行内存也基本不增长。按行号读取任意一段行只需一次 seek 和一次 read，
+    最多多读 stride 行，与总行数无关
+    """
+    stride = 64
+
+    def __init__(self, path=None):
+        if path is None:
+            fd, path = tempfile.mkstemp(prefix='serial_console_', suffix='.log')
+            self._file = os.fdopen(fd, 'w+b')
+        else:
+            self._file = open(path, 'w+b')
+        self.path = path
+        self.offsets = array('Q')  # 第 k * stride 行的起始字节偏移
+        self.count = 0
+        self.end = 0  # 文件末尾的字节偏移
+
+    def __len__(self):
+        return self.count
+
+    def append(self, lines):
+        """追加多行（仅在主线程调用），行内的换行符替换为空格"""
+        chunks = [(line.replace('\n', ' ') + '\n').encode('utf-8', errors='replace') for line in lines]
+        if not chunks:
+            return
+        starts = accumulate(map(len, chunks[:-1]), initial=self.end)
+        self.offsets.extend(islice(starts, -self.count % self.stride, None, self.stride))
+        self._file.seek(self.end)
+        self._file.write(b''.join(chunks))
+        self.end += sum(map(len, chunks))
+        self.count += len(chunks)
+
+    def read(self, start, stop):
+        """读取行号 [start, stop) 的行"""
+        start = max(0, start)
+        stop = min(stop, self.count)
+        if start >= stop:
+            return []
+        first = start // self.stride
+        last = (stop - 1) // self.stride + 1
+        begin = self.offsets[first]
+        finish = self.offsets[last] if last < len(self.offsets) else self.end
+        self._file.seek(begin)
+        lines = self._file.read(finish - begin).split(b'\n')
+        skip = start - first * self.stride
+        return [line.decode('utf-8', errors='replace') for line in lines[skip:skip + stop - start]]
+
+    def clear(self):
+        self._file.seek(0)
+        self._file.truncate()
+        self.offsets = array('Q')
+        self.count = 0
+        self.end = 0
+
+    def close(self):
+        """关闭并删除日志文件"""
+        self._file.close()
+        try:
+            os.remove(self.path)
+        except OSError as e:
+            print(f"删除数据框日志失败: {e}")
+
+class PyramidLevel:
+    """
+    金字塔中的一级：固定容量的环形存储，每个桶保存 min/max/sum/count
+    
+    pending_* 保存尚未凑满一个桶的下级数据
+    """
+    def __init__(self, factor, capacity):
+        self.factor = factor
+        self.capacity = capacity
+        self.count = 0  # 已完成的桶总数（含已被环形覆盖的）
+        self.reserved = 0  # 正在写入的桶之后的序号，与 ChannelStore.reserved 相同
+        self.mins = np.empty(capacity)
+        self.maxs = np.empty(capacity)
+        self.sums = np.empty(capacity)
+        self.counts = np.empty(capacity)
+        self.pending_mins = np.empty(0)
+        self.pending_maxs = np.empty(0)
+        self.pending_sums = np.empty(0)
+        self.pending_counts = np.empty(0)
+
+    def push(self, mins, maxs, sums, counts):
+        """
+        追加下级数据，返回本级新完成的桶 (mins, maxs, sums, counts)
+        """
+        f = self.factor
+        mins = np.concatenate((self.pending_mins, mins))
+        maxs = np.concatenate((self.pending_maxs, maxs))
+        sums = np.concatenate((self.pending_sums, sums))
+        counts = np.concatenate((self.pending_counts, counts))
+        
+        full = len(mins) // f * f
+        self.pending_mins = mins[full:]
+        self.pending_maxs = maxs[full:]
+        self.pending_sums = sums[full:]
+        self.pending_counts = counts[full:]
+        if full == 0:
+            return None
+        
+        new_mins = mins[:full].reshape(-1, f).min(axis=1)
+        new_maxs = maxs[:full].reshape(-1, f).max(axis=1)
+        new_sums = sums[:full].reshape(-1, f).sum(axis=1)
+        new_counts = counts[:full].reshape(-1, f).sum(axis=1)
+        
+        # 写入环形存储，超出容量时只保留最新的部分
+        n = len(new_mins)
+        keep = min(n, self.capacity)
+        idx = (self.count + np.arange(n - keep, n)) % self.capacity
+        self.reserved = self.count + n
+        self.mins[idx] = new_mins[n - keep:]
+        self.maxs[idx] = new_maxs[n - keep:]
+        self.sums[idx] = new_sums[n - keep:]
+        self.counts[idx] = new_counts[n - keep:]
+        self.count += n
+        return new_mins, new_maxs, new_sums, new_counts
+
+class HistoryPyramid:
+    """
+    单通道的多分辨率历史数据金字塔
+    
+    第 L 级的每个桶聚合 factor**L 个原始数据点的 min/max/mean，
+    新数据按批次增量更新，每级容量固定，因此内存占用与运行时长无关。
+    缩放视图时按跨度选择合适的级别，使绘制点数大致恒定。
+    
+    每批数据处理完后把各级的桶数和未完成数据作为一个元组发布到 published，
+    covers/query 只使用发布的状态，绘图线程查询时不需要加锁
+    """
+    def __init__(self, factor=16, levels=6, capacity=8192):
+        self.factor = factor
+        self.levels = [PyramidLevel(factor, capacity) for _ in range(levels)]
+        self.count = 0  # 原始数据点总数
+        self._publish()
+
+    def _publish(self):
+        """发布 (原始点数, [(桶数, pending_mins, pending_maxs, pending_sums, pending_counts), ...])"""
+        self.published = (self.count, [
+            (lv.count, lv.pending_mins, lv.pending_maxs, lv.pending_sums, lv.pending_counts)
+            for lv in self.levels
+        ])
+
+    def extend(self, values):
+        """追加一批原始数据"""
+        values = np.asarray(values, dtype=np.float64)
+        if values.size == 0:
+            return
+        self.count += len(values)
+        
+        # 原始数据视为 count=1 的桶，逐级向上聚合
+        buckets = (values, values, values, np.ones(len(values)))
+        for level in self.levels:
+            buckets = level.push(*buckets)
+            if buckets is None:
+                break
+        self._publish()
+
+    def choose_level(self, span, target_points):
+        """
+        选择能以不超过 target_points 个桶显示 span 个原始点的最低级别
+        
+        返回0表示应直接使用原始数据
+        """
+        level = 0
+        while level < len(self.levels) and span / self.factor ** level > target_points:
+            level += 1
+        return level
+
+    def covers(self, level, start):
+        """第 level 级(>=1)的环形存储是否仍包含原始索引 start 处的数据"""
+        count = self.published[1][level - 1][0]
+        first = max(0, count - self.levels[level - 1].capacity)
+        return start >= first * self.factor ** level
+
+    def query(self, level, start, stop):
+        """
+        查询第 level 级(>=1)覆盖原始索引 [start, stop) 的桶
+        
+        返回 (x, mins, maxs, means)，x 为各桶中心对应的原始索引；
+        尾部未凑满的数据会合并为一个不完整的桶一并返回
+        """
+        total, published = self.published
+        lv = self.levels[level - 1]
+        lv_count = published[level - 1][0]
+        size = self.factor ** level
+        first = max(start // size, lv_count - lv.capacity, 0)
+        last = min(lv_count, -(-stop // size))
+        
+        buckets = np.arange(first, max(first, last))
+        idx = buckets % lv.capacity
+        mins = lv.mins[idx]
+        maxs = lv.maxs[idx]
+        means = lv.sums[idx] / lv.counts[idx]
+        # 读取期间写入方可能已覆盖最旧的几个桶，丢弃这部分
+        lost = min(len(buckets), lv.reserved - lv.capacity - first)
+        if lost > 0:
+            buckets, mins, maxs, means = buckets[lost:], mins[lost:], maxs[lost:], means[lost:]
+        x = buckets * size + size / 2.0
+        
+        # 合并各下级中尚未完成的数据作为尾部桶
+        tail_start = lv_count * size
+        if stop > tail_start and total > tail_start:
+            pending = published[:level]
+            pend_mins = [p[1] for p in pending if len(p[1])]
+            if pend_mins:
+                pend_maxs = [p[2] for p in pending if len(p[2])]
+                pend_sums = sum(p[3].sum() for p in pending)
+                pend_counts = sum(p[4].sum() for p in pending)
+                x = np.append(x, (tail_start + total) / 2.0)
+                mins = np.append(mins, min(m.min() for m in pend_mins))
+                maxs = np.append(maxs, max(m.max() for m in pend_maxs))
+                means = np.append(means, pend_sums / pend_counts)
+        return x, mins, maxs, means
+
+def plan_channel_memory(budget_bytes, channels, levels, block_size=65536, pyramid_capacity=8192,
+                        min_block_size=1024, min_pyramid_capacity=256):
+    """
+    把内存上限平分给各通道，计算每个通道的存储大小
+    
+    每个通道的份额中历史金字塔最多占四分之一，其余作为内存环形缓冲（至少两个数据块）；
+    份额不够时金字塔每级容量和数据块大小逐次减半，最小为 min_pyramid_capacity 和 min_block_size。
+    返回 (环形缓冲点数, 数据块大小, 金字塔每级容量, 是否满足上限)，
+    不满足时按最小值分配，实际占用会超过上限
+    """
+    share = max(0, budget_bytes) // max(1, channels)
+    bucket_bytes = levels * 4 * 8  # 每级一个桶的 min/max/sum/count
+    capacity = pyramid_capacity
+    while capacity > min_pyramid_capacity and capacity * bucket_bytes > share // 4:
+        capacity //= 2
+    ram_bytes = max(0, share - capacity * bucket_bytes)
+    block = block_size
+    while block > min_block_size and 2 * block * 8 > ram_bytes:
+        block //= 2
+    fits = capacity * bucket_bytes + 2 * block * 8 <= share
+    return ram_bytes // 8, block, capacity, fits
+
+class SourceOp:
+    """派生表达式节点：引用一个已有通道"""
+    def __init__(self, name):
+        self.name = name
+
+    def push(self, batch):
+        return batch.get(self.name, np.empty(0))
+
+class ConstOp:
+    """派生表达式节点：常数"""
+    def __init__(self, value):
+        self.value = float(value)
+
+class BinaryOp:
+    """
+    派生表达式节点：四则运算
+    
+    两侧都是数据流时按到达顺序逐点对齐，未配对的数据暂存等待另一侧
+    """
+    max_pending = 65536  # 一侧长期无数据时最多暂存的点数
+
+    def __init__(self, op, left, right):
+        self.op = op
+        self.left = left
+        self.right = right
+        self.pending_left = np.empty(0)
+        self.pending_right = np.empty(0)
+
+    def push(self, batch):
+        if isinstance(self.left, ConstOp):
+            return self.op(self.left.value, self.right.push(batch))
+        if isinstance(self.right, ConstOp):
+            return self.op(self.left.push(batch), self.right.value)
+        
+        left = np.concatenate((self.pending_left, self.left.push(batch)))
+        right = np.concatenate((self.pending_right, self.right.push(batch)))
+        n = min(len(left), len(right))
+        self.pending_left = left[n:][-self.max_pending:]
+        self.pending_right = right[n:][-self.max_pending:]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return self.op(left[:n], right[:n])
+
+class UnaryOp:
+    """派生表达式节点：逐点函数（取负、绝对值）"""
+    def __init__(self, func, arg):
+        self.func = func
+        self.arg = arg
+
+    def push(self, batch):
+        return self.func(self.arg.push(batch))
+
+class MovingAverageOp:
+    """
+    派生表达式节点：ma(x, n) 滑动平均
+    
+    只保留最近 n-1 个输入作为状态，窗口未满时对已有数据求平均
+    """
+    def __init__(self, arg, window):
+        self.arg = arg
+        self.window = window
+        self.tail = np.empty(0)
+
+    def push(self, batch):
+        x = self.arg.push(batch)
+        if len(x) == 0:
+            return x
+        ext = np.concatenate((self.tail, x))
+        csum = np.concatenate(([0.0], np.cumsum(ext)))
+        end = np.arange(len(self.tail), len(ext)) + 1
+        begin = np.maximum(0, end - self.window)
+        self.tail = ext[len(ext) - (self.window - 1):] if self.window > 1 else np.empty(0)
+        return (csum[end] - csum[begin]) / (end - begin)
+
+class EmaOp:
+    """
+    派生表达式节点：ema(x, alpha) 指数滑动平均
+    
+    y[k] = (1-alpha)*y[k-1] + alpha*x[k]，分段用闭式解向量化计算
+    """
+    def __init__(self, arg, alpha):
+        self.arg = arg
+        self.alpha = alpha
+        self.last = None
+        # 分段长度，保证 (1-alpha)**-k 不溢出
+        decay = 1.0 - alpha
+        if 0 < decay < 1:
+            self.chunk = max(1, min(64, int(300 / -np.log10(decay))))
+        else:
+            self.chunk = 64
+
+    def push(self, batch):
+        x = self.arg.push(batch)
+        if len(x) == 0:
+            return x
+        out = np.empty(len(x))
+        decay = 1.0 - self.alpha
+        prev = x[0] if self.last is None else self.last
+        for i in range(0, len(x), self.chunk):
+            seg = x[i:i + self.chunk]
+            powers = decay ** np.arange(1, len(seg) + 1)
+            if decay > 0:
+                acc = np.cumsum(seg * (decay ** -np.arange(len(seg))))
+                out[i:i + len(seg)] = powers * prev + self.alpha * powers / decay * acc
+            else:
+                out[i:i + len(seg)] = seg
+            prev = out[i + len(seg) - 1]
+        self.last = prev
+        return out
+
+class DiffOp:
+    """派生表达式节点：diff(x) 相邻两点之差，第一个点输出0"""
+    def __init__(self, arg):
+        self.arg = arg
+        self.last = None
+
+    def push(self, batch):
+        x = self.arg.push(batch)
+        if len(x) == 0:
+            return x
+        prev = x[0] if self.last is None else self.last
+        self.last = x[-1]
+        return np.diff(x, prepend=prev)
+
+class DerivedChannel:
+    """
+    派生通道：由已有参数的表达式定义，随每批新数据增量计算
+    
+    支持 + - * /、abs(x)、ma(x, n)、ema(x, alpha)、diff(x)，
+    例如 PhaseMA=ma(Phase, 20) 或 Ratio=Impendence/Phase
+    
+    known_channels 为 None 时（自动发现通道）不检查引用的参数名，参数出现前输出为空
+    """
+    binary_ops = {
+        ast.Add: operator.add,
+        ast.Sub: operator.sub,
+        ast.Mult: operator.mul,
+        ast.Div: operator.truediv,
+    }
+
+    def __init__(self, name, expression, known_channels):
+        self.name = name
+        self.expression = expression
+        self.known_channels = None if known_channels is None else set(known_channels)
+        try:
+            tree = ast.parse(expression, mode='eval')
+        except SyntaxError as e:
+            raise ValueError(f"派生通道 {name} 表达式语法错误: {e.msg}")
+        self.root = self._compile(tree.body)
+        if isinstance(self.root, ConstOp):
+            raise ValueError(f"派生通道 {name} 必须引用至少一个参数")
+
+    def _compile(self, node):
+        if isinstance(node, ast.Name):
+            if self.known_channels is not None and node.id not in self.known_channels:
+                raise ValueError(f"派生通道 {self.name} 引用了未知参数: {node.id}")
+            return SourceOp(node.id)
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+            return ConstOp(node.value)
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+            arg = self._compile(node.operand)
+            if isinstance(arg, ConstOp):
+                return ConstOp(-arg.value)
+            return UnaryOp(np.negative, arg)
+        if isinstance(node, ast.BinOp) and type(node.op) in self.binary_ops:
+            left = self._compile(node.left)
+            right = self._compile(node.right)
+            op = self.binary_ops[type(node.op)]
+            if isinstance(left, ConstOp) and isinstance(right, ConstOp):
+                return ConstOp(op(left.value, right.value))
+            return BinaryOp(op, left, right)
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and not node.keywords:
+            return self._compile_call(node.func.id, node.args)
+        raise ValueError(f"派生通道 {self.name} 包含不支持的表达式: {ast.unparse(node)}")
+
+    def _compile_call(self, func, args):
+        arity = {'abs': 1, 'diff': 1, 'ma': 2, 'ema': 2}
+        if func not in arity:
+            raise ValueError(f"派生通道 {self.name} 使用了未知函数: {func}")
+        if len(args) != arity[func]:
+            raise ValueError(f"派生通道 {self.name}: {func} 需要 {arity[func]} 个参数")
+        
+        arg = self._compile(args[0])
+        if isinstance(arg, ConstOp):
+            raise ValueError(f"派生通道 {self.name}: {func} 的第一个参数必须引用数据")
+        if func == 'abs':
+            return UnaryOp(np.abs, arg)
+        if func == 'diff':
+            return DiffOp(arg)
+        
+        param = self._compile(args[1])
+        if not isinstance(param, ConstOp):
+            raise ValueError(f"派生通道 {self.name}: {func} 的第二个参数必须是常数")
+        if func == 'ma':
+            if param.value < 1 or param.value != int(param.value):
+                raise ValueError(f"派生通道 {self.name}: ma 的窗口必须是正整数")
+            return MovingAverageOp(arg, int(param.value))
+        if not 0 < param.value <= 1:
+            raise ValueError(f"派生通道 {self.name}: ema 的系数必须在 (0, 1] 之间")
+        return EmaOp(arg, param.value)
+
+    def feed(self, batch):
+        """
+        输入一批新数据 {参数名: ndarray}，返回本通道新产生的数据
+        """
+        return np.asarray(self.root.push(batch), dtype=np.float64)
+
+def parse_derived_channels(text, params, strict=True):
+    """
+    解析派生通道定义，格式为 "名称=表达式"，多个定义用分号分隔
+    
+    后面的定义可以引用前面定义的派生通道；strict 为假时允许引用尚未出现的参数
+    """
+    channels = []
+    known = list(params)
+    for item in text.split(';'):
+        item = item.strip()
+        if not item:
+            continue
+        name, sep, expression = item.partition('=')
+        name = name.strip()
+        if not sep or not name.isidentifier():
+            raise ValueError(f"派生通道定义格式错误: {item}（应为 名称=表达式）")
+        if name in known:
+            raise ValueError(f"派生通道名称重复: {name}")
+        channels.append(DerivedChannel(name, expression.strip(), known if strict else None))
+        known.append(name)
+    return channels
+
+class SpectrumAnalyzer:
+    """
+    滑动窗口频谱分析
+    
+    - 最近 size 个数据点保存在预分配的环形缓冲中
+    - 每积累 hop 个新数据点才重新计算一次 rfft
+    - 窗函数系数、加窗后的数据帧和平均功率谱都预先分配并复用
+    - 最近 averages 次频谱按功率做指数平均
+    """
+    windows = {
+        'hann': np.hanning,
+        'hamming': np.hamming,
+        'blackman': np.blackman,
+        'rect': np.ones,
+    }
+
+    def __init__(self, size=4096, hop=1024, window='hann', averages=4):
+        if size < 16 or hop < 1:
+            raise ValueError("频谱窗口至少16点，跳步至少1点")
+        if window not in self.windows:
+            raise ValueError(f"未知的窗函数: {window}")
+        self.size = size
+        self.hop = hop
+        self.window = window
+        self.averages = max(1, averages)
+        
+        self.buffer = np.zeros(size)
+        self.coeffs = self.windows[window](size)
+        self.frame = np.empty(size)
+        self.power = np.zeros(size // 2 + 1)
+        # 单边幅度谱的归一化系数
+        self.scale = 2.0 / self.coeffs.sum()
+        
+        self.pos = 0        # 下一个写入位置
+        self.filled = 0     # 缓冲中的有效点数
+        self.pending = 0    # 上次计算后新到达的点数
+        self.avg_count = 0
+        self.total = 0      # 累计输入点数，用于估计采样率
+        self.sample_rate = None
+        self._rate_mark = None
+
+    def feed(self, values):
+        """写入新数据（在采集路径中调用，只做内存拷贝）"""
+        values = np.asarray(values, dtype=np.float64)[-self.size:]
+        n = len(values)
+        if n == 0:
+            return
+        first = min(n, self.size - self.pos)
+        self.buffer[self.pos:self.pos + first] = values[:first]
+        self.buffer[:n - first] = values[first:]
+        self.pos = (self.pos + n) % self.size
+        self.filled = min(self.size, self.filled + n)
+        self.pending += n
+        self.total += n
+
+    def ready(self):
+        return self.filled == self.size and self.pending >= self.hop
+
+    def take_frame(self):
+        """
+        把环形缓冲按时间顺序展开并加窗，写入预分配的数据帧
+        
+        只做拷贝，调用方可在持锁时调用，随后在锁外调用 compute()
+        """
+        tail = self.size - self.pos
+        np.multiply(self.buffer[self.pos:], self.coeffs[:tail], out=self.frame[:tail])
+        np.multiply(self.buffer[:self.pos], self.coeffs[tail:], out=self.frame[tail:])
+        self.pending = 0
+        
+        # 按两次取帧之间的数据量和时间估计采样率
+        now = time.perf_counter()
+        if self._rate_mark is not None:
+            last_time, last_total = self._rate_mark
+            if now > last_time and self.total > last_total:
+                rate = (self.total - last_total) / (now - last_time)
+                if self.sample_rate is None:
+                    self.sample_rate = rate
+                else:
+                    self.sample_rate += 0.2 * (rate - self.sample_rate)
+        self._rate_mark = (now, self.total)
+        return self.frame
+
+    def compute(self, frame):
+        """
+        计算频谱，返回 (频率, 幅度dB)
+        
+        采样率未知时频率以 周期/点 为单位
+        """
+        magnitude = np.abs(np.fft.rfft(frame))
+        magnitude *= self.scale
+        if self.avg_count < self.averages:
+            self.avg_count += 1
+        self.power += (magnitude * magnitude - self.power) / self.avg_count
+        
+        rate = self.sample_rate or 1.0
+        freqs = np.fft.rfftfreq(self.size, d=1.0 / rate)
+        return freqs, 10.0 * np.log10(self.power + 1e-20)
+
+class ChannelStats:
+    """
+    单通道在线统计：点数、速率、均值/标准差(Welford)、最小/最大值、最新值
+    
+    按批更新，每批用并行合并公式并入，单点开销为O(1)，
+    界面读取统计时不需要遍历数据
+    """
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = float('inf')
+        self.max = float('-inf')
+        self.last = float('nan')
+        self.rate = 0.0
+        self._rate_start = time.perf_counter()
+        self._rate_count = 0
+
+    def update(self, values):
+        """并入一批数据"""
+        n = len(values)
+        if n == 0:
+            return
+        batch_mean = float(values.mean())
+        batch_m2 = float(((values - batch_mean) ** 2).sum())
+        total = self.count + n
+        delta = batch_mean - self.mean
+        self.mean += delta * n / total
+        self.m2 += batch_m2 + delta * delta * self.count * n / total
+        self.count = total
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self.last = float(values[-1])
+        
+        # 每秒结算一次接收速率
+        self._rate_count += n
+        now = time.perf_counter()
+        elapsed = now - self._rate_start
+        if elapsed >= 1.0:
+            self.rate = self._rate_count / elapsed
+            self._rate_start = now
+            self._rate_count = 0
+
+    def snapshot(self):
+        """返回当前统计值的字典副本"""
+        now = time.perf_counter()
+        rate = self.rate
+        if now - self._rate_start >= 2.0:
+            # 长时间没有新数据时速率逐渐归零
+            rate = self._rate_count / (now - self._rate_start)
+        return {
+            'count': self.count,
+            'rate': rate,
+            'mean': self.mean if self.count else float('nan'),
+            'std': (self.m2 / self.count) ** 0.5 if self.count else float('nan'),
+            'min': self.min if self.count else float('nan'),
+            'max': self.max if self.count else float('nan'),
+            'last': self.last,
+        }
+
+class TriggerCapture:
+    """
+    示波器式触发捕获
+    
+    - 在每批新数据上向量化检测上升/下降沿越过阈值，可设迟滞和释抑
+    - 触发后等待 post 个数据点到齐，从通道存储中截取
+      触发前 pre 个点和触发后 post 个点冻结为一段
+    - 单次模式捕获一段后停止，连续模式自动重新布防
+    - 保留最近若干段用于叠加显示
+    """
+    def __init__(self, level, edge='rising', hysteresis=0.0, holdoff=0,
+                 pre=500, post=500, mode='normal', history=8):
+        if edge not in ('rising', 'falling'):
+            raise ValueError(f"未知的触发边沿: {edge}")
+        if mode not in ('normal', 'single'):
+            raise ValueError(f"未知的触发模式: {mode}")
+        if hysteresis < 0 or holdoff < 0 or pre < 0 or post < 1:
+            raise ValueError("迟滞、释抑和触发前点数不能为负，触发后点数至少为1")
+        self.level = level
+        self.edge = edge
+        self.hysteresis = hysteresis
+        self.holdoff = holdoff
+        self.pre = pre
+        self.post = post
+        self.mode = mode
+        self.segments = deque(maxlen=history)  # 已捕获的数据段
+        self.captured = 0        # 累计捕获段数
+        self.pending = []        # 等待触发后数据的触发位置
+        self.state = 1           # 施密特状态，初始视为未布防，避免开头误触发
+        self.last_trigger = None
+        self.stopped = False
+
+    def rearm(self):
+        """单次模式下重新布防"""
+        self.stopped = False
+        self.pending = []
+        self.state = 1
+
+    def clear(self):
+        """清空已捕获的数据段并重新布防（通道数据被清空时调用）"""
+        self.rearm()
+        self.segments.clear()
+        self.last_trigger = None
+
+    def detect(self, values, start_index):
+        """
+        检测一批数据中的触发点，返回绝对索引数组
+        
+        数据越过阈值记为高状态，回到 阈值-迟滞 以下记为低状态（布防），
+        两者之间保持原状态；低->高 的位置即为触发点
+        """
+        if self.edge == 'falling':
+            x, level = -values, -self.level
+        else:
+            x, level = values, self.level
+        n = len(x)
+        
+        states = np.full(n, -1, dtype=np.int8)
+        states[x <= level - self.hysteresis] = 0
+        states[x >= level] = 1
+        if self.hysteresis == 0:
+            states[x < level] = 0
+        
+        # 中间区域沿用前一个确定状态
+        idx = np.where(states >= 0, np.arange(n), -1)
+        np.maximum.accumulate(idx, out=idx)
+        filled = np.where(idx >= 0, states[np.maximum(idx, 0)], self.state)
+        
+        previous = np.empty(n, dtype=filled.dtype)
+        previous[0] = self.state
+        previous[1:] = filled[:-1]
+        self.state = int(filled[-1])
+        return np.flatnonzero((previous == 0) & (filled == 1)) + start_index
+
+    def process(self, values, store):
+        """
+        处理刚写入 store 的一批数据，完成的捕获加入 segments
+        
+        返回本批是否有新捕获完成
+        """
+        if len(values) == 0:
+            return False
+        start_index = len(store) - len(values)
+        
+        if not self.stopped:
+            for trigger in self.detect(values, start_index):
+                if self.last_trigger is not None and trigger - self.last_trigger < self.holdoff:
+                    continue
+                self.pending.append(int(trigger))
+                self.last_trigger = trigger
+                if self.mode == 'single':
+                    self.stopped = True
+                    break
+        
+        completed = False
+        while self.pending and len(store) >= self.pending[0] + self.post:
+            trigger = self.pending.pop(0)
+            segment = store.read(trigger - self.pre, trigger + self.post)
+            # 数据开头不足 pre 个点时前面补 nan
+            missing = self.pre + self.post - len(segment)
+            if missing > 0:
+                segment = np.concatenate((np.full(missing, np.nan), segment))
+            self.segments.append((trigger, segment))
+            self.captured += 1
+            completed = True
+        return completed
+
+class SessionExporter(threading.Thread):
+    """
+    后台导出会话数据
+    
+    构造时（持锁）对各通道做快照，之后在后台线程中分块读取并写入文件，
+    不阻塞界面也不暂停采集。支持 CSV、压缩 NPZ 以及 Parquet（需安装 pyarrow）。
+    """
+    chunk_size = 1 << 20
+
+    def __init__(self, filename, stores):
+        super().__init__(daemon=True)
+        self.filename = filename
+        self.format = os.path.splitext(filename)[1].lower().lstrip('.')
+        if self.format not in self.supported_formats():
+            raise ValueError(f"不支持的导出格式: {self.format}")
+        self.views = {param: store.export_view() for param, store in stores.items()}
+        self.total = max((spilled + len(tail) for _, spilled, tail in self.views.values()), default=0)
+        self.progress = 0.0
+        self.done = False
+        self.error = None
+
+    @staticmethod
+    def supported_formats():
+        formats = ['csv', 'npz']
+        try:
+            import pyarrow  # noqa: F401
+            formats.append('parquet')
+        except ImportError:
+            pass
+        return formats
+
+    def _read(self, param, start, stop):
+        """读取快照中 [start, stop) 的数据，已落盘部分通过独立的内存映射读取"""
+        path, spilled, tail = self.views[param]
+        parts = []
+        if start < spilled:
+            disk = np.memmap(path, dtype=np.float64, mode='r', shape=(spilled,))
+            parts.append(np.array(disk[start:min(stop, spilled)]))
+            del disk
+        if stop > spilled:
+            parts.append(tail[max(0, start - spilled):stop - spilled])
+        return np.concatenate(parts) if parts else np.empty(0)
+
+    def _chunks(self):
+        """按块生成 (start, {参数: 数据})，较短的通道在末尾缺数据"""
+        for start in range(0, self.total, self.chunk_size):
+            stop = min(start + self.chunk_size, self.total)
+            yield start, {param: self._read(param, start, stop) for param in self.views}
+            self.progress = stop / self.total
+
+    def run(self):
+        try:
+            getattr(self, f'_write_{self.format}')()
+            self.progress = 1.0
+        except Exception as e:
+            self.error = e
+            traceback.print_exc()
+        finally:
+            self.done = True
+
+    def _write_csv(self):
+        """
+        写出 CSV，缺失的数据为空单元格
+        
+        安装了 pyarrow 时由 pyarrow.csv 在 C++ 中格式化（数值为能精确还原的最短形式），
+        否则按列格式化为 %.10g 后拼接
+        """
+        params = list(self.views)
+        try:
+            import pyarrow as pa
+            import pyarrow.csv as pa_csv
+        except ImportError:
+            pa_csv = None
+        with open(self.filename, 'wb') as f:
+            f.write((','.join(['index'] + params) + '\n').encode('utf-8'))
+            if pa_csv is not None:
+                options = pa_csv.WriteOptions(include_header=False)
+                names = ['index'] + params
+                for start, chunk in self._chunks():
+                    index, columns = self._padded(start, chunk)
+                    # from_pandas 把 NaN 当作缺失值，输出为空单元格
+                    arrays = [pa.array(index)] + [pa.array(values, from_pandas=True) for values in columns]
+                    pa_csv.write_csv(pa.Table.from_arrays(arrays, names=names), f, options)
+                return
+            
+            # 每次格式化的行数随列数减少，字符串占用的内存不随通道数增长
+            block = max(1024, (1 << 20) // (len(params) + 1))
+            for start, chunk in self._chunks():
+                index, columns = self._padded(start, chunk)
+                for row in range(0, len(index), block):
+                    cells = [list(map(str, index[row:row + block].tolist()))]
+                    for values in columns:
+                        cells.append(['' if x != x else '%.10g' % x for x in values[row:row + block].tolist()])
+                    f.write(('\n'.join(map(','.join, zip(*cells))) + '\n').encode('utf-8'))
+
+    def _padded(self, start, chunk):
+        """把一块数据补齐为等长的列，返回 (行号, [各通道数据])，较短的通道末尾补 NaN"""
+        rows = max(len(values) for values in chunk.values())
+        columns = []
+        for values in chunk.values():
+            if len(values) < rows:
+                values = np.concatenate((values, np.full(rows - len(values), np.nan)))
+            columns.append(values)
+        return np.arange(start, start + rows, dtype=np.int64), columns
+
+    def _write_npz(self):
+        # 逐个通道把 .npy 数据流式写入 zip，np.load 可直接读取
+        with zipfile.ZipFile(self.filename, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+            for index, (param, (_, spilled, tail)) in enumerate(self.views.items()):
+                length = spilled + len(tail)
+                with archive.open(f'{param}.npy', 'w', force_zip64=True) as f:
+                    header = {'descr': '<f8', 'fortran_order': False, 'shape': (length,)}
+                    np.lib.format.write_array_header_1_0(f, header)
+                    for start in range(0, length, self.chunk_size):
+                        values = self._read(param, start, min(start + self.chunk_size, length))
+                        f.write(values.astype('<f8', copy=False).tobytes())
+                self.progress = (index + 1) / len(self.views)
+
+    def _write_parquet(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        
+        params = list(self.views)
+        fields = [pa.field('index', pa.int64())] + [pa.field(p, pa.float64()) for p in params]
+        schema = pa.schema(fields)
+        with pq.ParquetWriter(self.filename, schema) as writer:
+            for start, chunk in self._chunks():
+                rows = max(len(values) for values in chunk.values())
+                columns = [pa.array(np.arange(start, start + rows, dtype=np.int64))]
+                for param in params:
+                    values = np.full(rows, np.nan)
+                    values[:len(chunk[param])] = chunk[param]
+                    columns.append(pa.array(values, mask=np.arange(rows) >= len(chunk[param])))
+                writer.write_table(pa.Table.from_arrays(columns, schema=schema))
+
+def pixel_envelope(px, py):
+    """
+    把已换算为像素坐标的折线压缩为每个像素列一对 min/max 点
+    
+    px 须单调不减；同一列内的点画出来只是一条竖线，压缩后外观不变
+    """
+    columns = np.rint(px).astype(np.int64)
+    starts = np.flatnonzero(np.diff(columns, prepend=columns[0] - 1))
+    if len(starts) * 2 >= len(columns):
+        return columns, py
+    mins = np.minimum.reduceat(py, starts)
+    maxs = np.maximum.reduceat(py, starts)
+    return np.repeat(columns[starts], 2), interleave(mins, maxs)
+
+class RenderBackend(ABC):
+    """
+    时间曲线的绘图后端接口
+    
+    构造参数为 (master, params, on_scroll)：在 master 中创建绘图区，为 params 创建曲线，
+    主曲线区域内的滚轮事件调用 on_scroll(up, shift)。
+    SerialPlotter 只通过这些方法绘制主曲线：每帧调用 set_series/set_xlim/set_ylim 后
+    调用 draw()；帧定时也由后端提供。supports_aux 为真的后端还提供
+    fig/ax/canvas，可显示频谱和触发面板
+    """
+    supports_aux = False
+
+    @abstractmethod
+    def width(self):
+        """绘图区宽度(像素)，决定每条曲线需要的点数"""
+
+    @abstractmethod
+    def set_series(self, param, x, y):
+        """更新一条曲线的数据，未见过的通道（自动发现）在此时创建曲线"""
+
+    def set_visible(self, param, visible):
+        """显示或隐藏一条曲线，尚未创建的曲线忽略；默认不支持隐藏"""
+
+    @abstractmethod
+    def set_xlim(self, left, right):
+        pass
+
+    @abstractmethod
+    def set_ylim(self, bottom, top):
+        pass
+
+    def set_xlabel(self, text):
+        """默认不显示坐标轴标签"""
+
+    def add_marker(self, x):
+        """在 x 处画一条竖直虚线（断线间隙等）；默认不画"""
+
+    @abstractmethod
+    def clear(self):
+        """清空曲线和标记，恢复初始坐标范围"""
+
+    @abstractmethod
+    def draw(self):
+        pass
+
+    @abstractmethod
+    def start(self, callback, interval_ms):
+        """开始按间隔调用 callback(frame)"""
+
+    @abstractmethod
+    def set_interval(self, interval_ms):
+        pass
+
+    @abstractmethod
+    def close(self):
+        """停止定时并释放绘图资源"""
+
+class MatplotlibBackend(RenderBackend):
+    """Matplotlib/Agg 绘图，效果最好，支持鼠标悬停查看数值和辅助面板"""
+    supports_aux = True
+
+    def __init__(self, master, params, on_scroll):
+        load_matplotlib()
+        
+        # 设置绘图样式
+        plt.style.use('ggplot')
+        
+        # 设置中文字体
+        plt.rcParams['font.sans-serif'] = ['SimHei', 'Microsoft YaHei', 'WenQuanYi Micro Hei']
+        plt.rcParams['axes.unicode_minus'] = False
+        
+        # 创建图形和坐标轴
+        self.fig, self.ax = plt.subplots(figsize=(8, 4))
+        self.fig.subplots_adjust(left=0.1, right=0.95, top=0.9, bottom=0.1)
+        
+        # 设置标题和标签
+        self.ax.set_title('串口数据实时监测', fontsize=12, pad=10)
+        self.ax.set_xlabel('数据点索引', fontsize=10)
+        self.ax.set_ylabel('数值', fontsize=10)
+        
+        # 创建canvas并嵌入到Tkinter窗口
+        self.canvas = FigureCanvasTkAgg(self.fig, master=master)
+        self.canvas.draw()
+        self.canvas.get_tk_widget().pack(fill='both', expand=True)
+        
+        # 初始化数据线
+        self.lines = {}
+        colors = plt.cm.rainbow(np.linspace(0, 1, len(params)))
+        for param, color in zip(params, colors):
+            line, = self.ax.plot([], [], label=param, color=color, lw=1.5)
+            self.lines[param] = line
+        self.markers = []
+        
+        # 添加图例
+        self.ax.legend(loc='upper right', fontsize=8)
+        
+        # 设置网格
+        self.ax.grid(True, linestyle='--', alpha=0.6)
+        
+        # 设置初始范围
+        self.ax.set_xlim(0, 100)
+        self.ax.set_ylim(-1, 1)
+        
+        # 添加鼠标移动事件处理
+        self.annotation = self.ax.annotate("", xy=(0,0), xytext=(20,20), textcoords="offset points",
+                            bbox=dict(boxstyle="round", fc="w"),
+                            arrowprops=dict(arrowstyle="->"))
+        self.annotation.set_visible(False)
+        
+        # 用于存储高亮点
+        self.highlight_points = {param: None for param in params}
+        
+        def on_wheel(event):
+            # 只处理主曲线区域内的滚轮，辅助面板上的滚动忽略
+            if event.inaxes != self.ax:
+                return
+            on_scroll(event.button == 'up', event.key == 'shift')
+        
+        self.fig.canvas.mpl_connect("motion_notify_event", self.on_motion)
+        self.fig.canvas.mpl_connect("scroll_event", on_wheel)
+        self.ani = None
+        
+        # 禁用Matplotlib的默认工具栏
+        try:
+            self.canvas.toolbar.pack_forget()
+        except:
+            pass
+        
+        print(f"当前Matplotlib后端: {plt.get_backend()}")
+
+    def on_motion(self, event):
+        if event.inaxes == self.ax:
+            visible = False
+            for param, line in self.lines.items():
+                xdata, ydata = line.get_data()
+                if len(xdata) > 0 and line.get_visible():
+                    # 找到最近的点
+                    x_index = min(range(len(xdata)), key=lambda i: abs(xdata[i] - event.xdata))
+                    y_value = ydata[x_index]
+                    # 如果鼠标在点附近
+                    if abs(event.xdata - xdata[x_index]) < 0.1 and abs(event.ydata - y_value) < 0.1:
+                        # 显示注释
+                        self.annotation.xy = (xdata[x_index], y_value)
+                        self.annotation.set_text(f"{y_value:.2f}")
+                        self.annotation.set_visible(True)
+                        visible = True
+                        
+                        # 清除之前的高亮点
+                        if self.highlight_points[param]:
+                            self.highlight_points[param].remove()
+                        
+                        # 绘制新的高亮点
+                        self.highlight_points[param] = self.ax.plot(
+                            xdata[x_index], y_value, 'o', 
+                            color=line.get_color(),
+                            markersize=10,
+                            alpha=0.5
+                        )[0]
+                        break
+                    else:
+                        # 如果不在点附近，清除高亮点
+                        if self.highlight_points[param]:
+                            self.highlight_points[param].remove()
+                            self.highlight_points[param] = None
+            if not visible:
+                self.annotation.set_visible(False)
+            self.fig.canvas.draw_idle()
+
+    def width(self):
+        return self.canvas.get_tk_widget().winfo_width()
+
+    def _add_line(self, param):
+        """为新出现的通道创建曲线，颜色按 tab10 色表轮换"""
+        color = plt.cm.tab10(len(self.lines) % 10)
+        line, = self.ax.plot([], [], label=param, color=color, lw=1.5)
+        self.lines[param] = line
+        self.highlight_points[param] = None
+        self.ax.legend(loc='upper right', fontsize=8)
+        return line
+
+    def set_series(self, param, x, y):
+        line = self.lines.get(param)
+        if line is None:
+            line = self._add_line(param)
+        line.set_data(x, y)
+
+    def set_visible(self, param, visible):
+        line = self.lines.get(param)
+        if line is not None:
+            line.set_visible(visible)
+            self.canvas.draw_idle()
+
+    def set_xlim(self, left, right):
+        self.ax.set_xlim(left, right)
+
+    def set_ylim(self, bottom, top):
+        self.ax.set_ylim(bottom, top)
+
+    def set_xlabel(self, text):
+        self.ax.set_xlabel(text, fontsize=10)
+
+    def add_marker(self, x):
+        self.markers.append(self.ax.axvline(x, color='gray', linestyle='--', linewidth=1, alpha=0.7))
+
+    def clear(self):
+        for line in self.lines.values():
+            line.set_data([], [])
+        for marker in self.markers:
+            marker.remove()
+        self.markers = []
+        self.ax.set_xlim(0, 100)
+        self.ax.set_ylim(-1, 1)
+        self.canvas.draw_idle()
+
+    def draw(self):
+        # 高效更新画布
+        self.canvas.draw_idle()
+        self.canvas.flush_events()
+
+    def start(self, callback, interval_ms):
+        # 强制更新布局
+        self.fig.tight_layout()
+        self.canvas.draw()
+        self.ani = FuncAnimation(
+            self.fig,
+            callback,
+            interval=interval_ms,
+            blit=False,
+            cache_frame_data=False
+        )
+
+    def set_interval(self, interval_ms):
+        if self.ani is not None and self.ani.event_source is not None:
+            if self.ani.event_source.interval != interval_ms:
+                self.ani.event_source.interval = interval_ms
+
+    def close(self):
+        if self.ani is not None and self.ani.event_source is not None:
+            self.ani.event_source.stop()
+        plt.close(self.fig)
+
+class TkCanvasBackend(RenderBackend):
+    """
+    直接用 tk.Canvas 的折线对象绘图，适合多通道、高帧率显示
+    
+    每条曲线是一个固定的 line 对象，每帧只按像素列压缩后更新坐标，
+    不经过 Agg 光栅化和像素拷贝。不支持频谱、触发面板和悬停数值
+    """
+    margin_left = 64
+    margin_right = 12
+    margin_top = 24
+    margin_bottom = 36
+    ticks = 5
+
+    def __init__(self, master, params, on_scroll):
+        self.root = master.winfo_toplevel()
+        self.canvas = tk.Canvas(master, background='white', highlightthickness=0)
+        self.canvas.pack(fill='both', expand=True)
+        self.params = list(params)
+        self.series = {}
+        self.xlim = (0.0, 100.0)
+        self.ylim = (-1.0, 1.0)
+        self.marker_x = []
+        self.markers = []
+        self.job = None
+        self.frame = 0
+        self.interval_ms = 100
+        self.on_scroll = on_scroll
+        
+        canvas = self.canvas
+        self.frame_item = canvas.create_rectangle(0, 0, 0, 0, outline='#999999')
+        self.grid_items = [canvas.create_line(0, 0, 0, 0, fill='#e5e5e5', dash=(2, 2))
+                           for _ in range(self.ticks * 2)]
+        self.xtick_items = [canvas.create_text(0, 0, anchor='n', font=('Courier', 8))
+                            for _ in range(self.ticks)]
+        self.ytick_items = [canvas.create_text(0, 0, anchor='e', font=('Courier', 8))
+                            for _ in range(self.ticks)]
+        self.xlabel_item = canvas.create_text(0, 0, anchor='s', text='数据点索引')
+        self.title_item = canvas.create_text(0, 0, anchor='n', text='串口数据实时监测')
+        
+        self.line_items = {}
+        self.legend_items = []
+        self.hidden = set()
+        count = max(1, len(self.params) - 1)
+        for index, param in enumerate(self.params):
+            self._add_line(param, self._color(index / count))
+        
+        # Windows/macOS 使用 <MouseWheel>，X11 使用 Button-4/5
+        canvas.bind('<MouseWheel>', lambda e: self.on_scroll(e.delta > 0, bool(e.state & 0x1)))
+        canvas.bind('<Button-4>', lambda e: self.on_scroll(True, bool(e.state & 0x1)))
+        canvas.bind('<Button-5>', lambda e: self.on_scroll(False, bool(e.state & 0x1)))
+
+    @staticmethod
+    def _color(t):
+        """与 Matplotlib 的 rainbow 色图近似的颜色"""
+        r = min(1.0, max(0.0, abs(2 * t - 1)))
+        g = np.sin(np.pi * t)
+        b = np.cos(np.pi * t / 2)
+        return '#%02x%02x%02x' % (int(r * 255), int(g * 255), int(b * 255))
+
+    def _area(self):
+        """绘图区的像素范围 (x0, y0, x1, y1)"""
+        width = max(self.canvas.winfo_width(), self.margin_left + self.margin_right + 10)
+        height = max(self.canvas.winfo_height(), self.margin_top + self.margin_bottom + 10)
+        return (self.margin_left, self.margin_top,
+                width - self.margin_right, height - self.margin_bottom)
+
+    def width(self):
+        x0, _, x1, _ = self._area()
+        return x1 - x0
+
+    def _add_line(self, param, color):
+        self.line_items[param] = self.canvas.create_line(0, 0, 0, 0, fill=color, width=1, state='hidden')
+        self.legend_items.append(self.canvas.create_text(0, 0, anchor='ne', text=param, fill=color))
+
+    def set_series(self, param, x, y):
+        if param not in self.line_items:
+            # 自动发现的通道：按黄金分割取色，与已有颜色尽量错开
+            self._add_line(param, self._color(len(self.line_items) * 0.618 % 1.0))
+        self.series[param] = (x, y)
+
+    def set_visible(self, param, visible):
+        if visible:
+            self.hidden.discard(param)
+        else:
+            self.hidden.add(param)
+        self.draw()
+
+    def set_xlim(self, left, right):
+        self.xlim = (float(left), float(right))
+
+    def set_ylim(self, bottom, top):
+        self.ylim = (float(bottom), float(top))
+
+    def set_xlabel(self, text):
+        self.canvas.itemconfigure(self.xlabel_item, text=text)
+
+    def add_marker(self, x):
+        self.marker_x.append(x)
+        self.markers.append(self.canvas.create_line(0, 0, 0, 0, fill='gray', dash=(4, 2)))
+
+    def clear(self):
+        self.series = {}
+        for marker in self.markers:
+            self.canvas.delete(marker)
+        self.marker_x = []
+        self.markers = []
+        self.xlim = (0.0, 100.0)
+        self.ylim = (-1.0, 1.0)
+        self.draw()
+
+    def draw(self):
+        """按当前坐标范围更新坐标轴、曲线和标记的坐标（对象不重建）"""
+        canvas = self.canvas
+        x0, y0, x1, y1 = self._area()
+        left, right = self.xlim
+        bottom, top = self.ylim
+        sx = (x1 - x0) / ((right - left) or 1.0)
+        sy = (y1 - y0) / ((top - bottom) or 1.0)
+        
+        canvas.coords(self.frame_item, x0, y0, x1, y1)
+        for i in range(self.ticks):
+            fraction = i / (self.ticks - 1)
+            px = x0 + fraction * (x1 - x0)
+            py = y1 - fraction * (y1 - y0)
+            canvas.coords(self.grid_items[i], px, y0, px, y1)
+            canvas.coords(self.grid_items[self.ticks + i], x0, py, x1, py)
+            canvas.coords(self.xtick_items[i], px, y1 + 4)
+            canvas.itemconfigure(self.xtick_items[i], text=f"{left + fraction * (right - left):.6g}")
+            canvas.coords(self.ytick_items[i], x0 - 4, py)
+            canvas.itemconfigure(self.ytick_items[i], text=f"{bottom + fraction * (top - bottom):.4g}")
+        canvas.coords(self.xlabel_item, (x0 + x1) / 2, y1 + self.margin_bottom - 2)
+        canvas.coords(self.title_item, (x0 + x1) / 2, 4)
+        for index, item in enumerate(self.legend_items):
+            canvas.coords(item, x1 - 6, y0 + 4 + index * 14)
+        
+        for param, item in self.line_items.items():
+            x, y = self.series.get(param, ((), ()))
+            x = np.asarray(x, dtype=np.float64)
+            y = np.asarray(y, dtype=np.float64)
+            finite = np.isfinite(y)
+            if not finite.all():
+                x, y = x[finite], y[finite]
+            if len(x) < 2 or param in self.hidden:
+                canvas.itemconfigure(item, state='hidden')
+                continue
+            px, py = pixel_envelope(x0 + (x - left) * sx, y1 - (y - bottom) * sy)
+            coords = np.empty(len(px) * 2, dtype=np.int64)
+            coords[0::2] = px
+            coords[1::2] = np.clip(np.rint(py), -32000, 32000)
+            canvas.coords(item, coords.tolist())
+            canvas.itemconfigure(item, state='normal')
+        
+        for x, item in zip(self.marker_x, self.markers):
+            if left <= x <= right:
+                px = x0 + (x - left) * sx
+                canvas.coords(item, px, y0, px, y1)
+                canvas.itemconfigure(item, state='normal')
+            else:
+                canvas.itemconfigure(item, state='hidden')
+
+    def start(self, callback, interval_ms):
+        self.callback = callback
+        self.interval_ms = interval_ms
+        self.draw()
+        self.job = self.root.after(interval_ms, self._tick)
+
+    def _tick(self):
+        self.frame += 1
+        try:
+            self.callback(self.frame)
+        finally:
+            if self.job is not None:
+                self.job = self.root.after(self.interval_ms, self._tick)
+
+    def set_interval(self, interval_ms):
+        self.interval_ms = interval_ms
+
+    def close(self):
+        if self.job is not None:
+            self.root.after_cancel(self.job)
+            self.job = None
+
+class VirtualConsole:
+    """
+    只渲染可见行的串口数据框
+    
+    文本框中只放当前窗口内的几十行，内容按行号从 LineLog 读取，滚动条位置按总行数计算，
+    因此滚动浏览上百万行也不占额外内存。停在末尾时跟随新数据，向上滚动后窗口固定
+    """
+    def __init__(self, text, scrollbar, log):
+        self.text = text
+        self.scrollbar = scrollbar
+        self.log = log
+        self.top = 0        # 窗口第一行的行号
+        self.follow = True  # 是否跟随最新数据
+        self.linespace = tkfont.Font(font=text.cget('font')).metrics('linespace')
+        
+        # 滚动条和滚轮都改为按行号移动窗口
+        text.config(yscrollcommand='')
+        scrollbar.config(command=self.yview)
+        text.bind('<MouseWheel>', lambda e: self._wheel(-3 if e.delta > 0 else 3))
+        text.bind('<Button-4>', lambda e: self._wheel(-3))
+        text.bind('<Button-5>', lambda e: self._wheel(3))
+        text.bind('<Configure>', lambda e: self.refresh(force=True))
+
+    def _rows(self):
+        """可见行数，窗口尚未显示时按文本框设置的高度计算"""
+        height = self.text.winfo_height()
+        if height <= 1:
+            return int(self.text.cget('height'))
+        return max(1, height // self.linespace)
+
+    def _wheel(self, step):
+        self.scroll_to(self.top + step)
+        return 'break'
+
+    def yview(self, *args):
+        """滚动条回调：('moveto', 比例) 或 ('scroll', 数量, 'units'/'pages')"""
+        if args[0] == 'moveto':
+            self.scroll_to(int(float(args[1]) * len(self.log)))
+        elif args[0] == 'scroll':
+            step = int(args[1])
+            if args[2] == 'pages':
+                step *= self._rows()
+            self.scroll_to(self.top + step)
+
+    def scroll_to(self, top):
+        """把窗口移到第 top 行，移到末尾时恢复跟随"""
+        last = max(0, len(self.log) - self._rows())
+        self.top = max(0, min(top, last))
+        self.follow = self.top >= last
+        self.refresh(force=True)
+
+    def refresh(self, force=False):
+        """按窗口位置重新填充文本框；固定窗口时新数据只更新滚动条"""
+        total = len(self.log)
+        rows = self._rows()
+        if self.follow or force:
+            if self.follow:
+                self.top = max(0, total - rows)
+            text = self.text
+            text.config(state='normal')
+            text.delete('1.0', tk.END)
+            text.insert(tk.END, '\n'.join(self.log.read(self.top, self.top + rows)))
+            text.config(state='disabled')
+            if self.follow:
+                text.see(tk.END)
+        if total:
+            self.scrollbar.set(self.top / total, min(1.0, (self.top + rows) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
 
 class SerialPlotter:
     """
@@ -50,7 +2928,28 @@ class SerialPlotter:
     - 数据统计和速率计算
     - 响应式UI设计
     """
-    def __init__(self):
+    # 界面上的溢出策略名称 -> BoundedQueue 策略
+    overflow_policies = {
+        "丢弃最旧": 'drop_oldest',
+        "丢弃最新": 'drop_newest',
+        "抽取": 'decimate',
+    }
+
+    render_backends = {
+        "Matplotlib": MatplotlibBackend,
+        "Tk Canvas (高帧率)": TkCanvasBackend,
+    }
+    stream_formats = {
+        "二进制": 'binary',
+        "NDJSON": 'ndjson',
+    }
+    stream_policies = {
+        "丢弃最旧": 'drop_oldest',
+        "抽取": 'decimate',
+        "断开": 'disconnect',
+    }
+
+    def __init__(self, mainloop=True):
         """
         初始化串口绘图器
         
@@ -63,13 +2962,48 @@ class SerialPlotter:
         重要实例变量：
         - self.serial_port: 串口连接对象
         - self.data: 存储接收数据的字典
-        - self.fig, self.ax: Matplotlib图形和坐标轴
-        - self.lines: 各参数的绘图线对象
+        - self.plot_backend: 绘图后端（Matplotlib 或 Tk Canvas）
+        - self.fig, self.ax: Matplotlib图形和坐标轴（辅助面板使用）
         """
         self.ser = None
         self.running = False
         self.data_dict = {}
+        self.pyramids = {}
+        self.published_counts = {}  # 最近一批数据写完后各通道的点数，绘图按此快照读取
+        self.pyramid_factor = 16
+        self.pyramid_levels = 6
+        self.view_span = None  # None 表示按"保留数据点数量"显示
+        self.view_end = None   # None 表示跟随最新数据
+        self.max_decimate_span = 1 << 22  # 金字塔缺数据时最多现场聚合的原始点数
+        self.session_dir = None  # 本次会话落盘数据的目录
+        self.store_seq = 0
+        self.channel_plan = plan_channel_memory(256 * 1024 * 1024, 1, self.pyramid_levels)  # 见 _plan_memory
         self.selected_params = []
+        self.derived_text = ""
+        self.spectrum = None        # 频谱分析器，未启用时为None
+        self.spectrum_param = None
+        self.trigger = None         # 触发捕获器，未启用时为None
+        self.trigger_param = None
+        self.trigger_drawn = 0
+        self.trigger_level_line = None
+        self.aux_axes = {}          # 辅助面板的坐标轴
+        self.plot_backend = None    # 当前绘图后端，监测停止时为None
+        self.fig = None
+        self.exporter = None        # 正在进行或最近一次的数据导出
+        self.interactive = True     # 无人值守运行时为 False，错误不弹出对话框，见 notify
+        self.reported_errors = []   # 非交互运行中报告过的错误
+        self.counters = PipelineCounters()
+        self.max_line_length = 4096  # 超过此长度仍无换行时视为失步
+        self.raw_queue = BoundedQueue(1024)       # 读取线程 -> 解析线程（原始数据块）
+        self.console_queue = BoundedQueue(2000)   # 解析线程 -> 界面（显示行）
+        self.acq_process = None     # 独立采集进程
+        self.sample_ring = None
+        self.line_queue = None
+        self.derived_channels = []
+        self.plot_params = []  # 监测参数 + 派生通道
+        self.channel_registry = None  # 自动发现通道时的通道表，否则为None
+        self.channels_changed = False # 有新通道出现，界面需要更新通道下拉列表
+        self.hidden_params = set()    # 不绘制的通道，采集和统计照常进行
         self.lock = threading.Lock()
         
         # 初始化主窗口
@@ -83,47 +3017,133 @@ class SerialPlotter:
         # 初始化变量
         self.port_var = tk.StringVar()
         self.baud_var = tk.StringVar()
+        self.process_mode_var = tk.BooleanVar(value=False)
+        self.auto_channels_var = tk.BooleanVar(value=False)
+        self.max_channels_var = tk.IntVar(value=32)
+        self.overflow_policy_var = tk.StringVar(value="丢弃最旧")
         self.data_points_var = tk.IntVar(value=5)
+        self.memory_budget_var = tk.IntVar(value=256)
+        self.min_fps_var = tk.IntVar(value=5)
+        self.max_fps_var = tk.IntVar(value=60)
+        self.cpu_budget_var = tk.IntVar(value=50)
+        self.render_backend_var = tk.StringVar(value="Matplotlib")
+        self.spectrum_param_var = tk.StringVar(value="")
+        self.spectrum_size_var = tk.StringVar(value="4096")
+        self.spectrum_hop_var = tk.StringVar(value="1024")
+        self.spectrum_window_var = tk.StringVar(value="hann")
+        self.spectrum_avg_var = tk.IntVar(value=4)
+        self.trigger_param_var = tk.StringVar(value="")
+        self.trigger_edge_var = tk.StringVar(value="上升")
+        self.trigger_level_var = tk.StringVar(value="0")
+        self.trigger_hyst_var = tk.StringVar(value="0")
+        self.trigger_holdoff_var = tk.StringVar(value="0")
+        self.trigger_pre_var = tk.StringVar(value="200")
+        self.trigger_post_var = tk.StringVar(value="800")
+        self.trigger_mode_var = tk.StringVar(value="连续")
         self.paused = False
         self.pause_lock = threading.Lock()
         
         # 数据统计变量
+        self.channel_stats = {}
+        self.last_stats_time = 0.0
         self.data_count = 0
         self.last_count = 0
         self.last_count_time = time.time()
         
+        # 自适应帧率调度
+        self.frame_scheduler = FrameScheduler()
+        
+        # 各阶段运行指标
+        self.metrics = self._create_metrics()
+        self.metrics_server = None
+        self.metrics_port_var = tk.IntVar(value=9108)
+        self.metrics_http_var = tk.BooleanVar(value=False)
+        self.unrendered_since = None  # 最早一批尚未绘制的数据解析完成的时间
+        self.diagnostics_window = None
+        self.profiler = None          # 正在进行的调用栈采样
+        self.profile_path = None
+        self.profile_seconds_var = tk.IntVar(value=10)
+        
+        # 本机数据转发服务
+        self.broadcaster = None
+        self.stream_enabled_var = tk.BooleanVar(value=False)
+        self.stream_port_var = tk.IntVar(value=9200)
+        self.stream_format_var = tk.StringVar(value="二进制")
+        self.stream_policy_var = tk.StringVar(value="丢弃最旧")
+        
+        # 断线重连
+        self.serial_settings = None  # 本次监测的 (串口, 波特率)，重连时使用
+        self.link_state = None       # 断线时在状态栏显示的提示
+        self.reconnects = 0
+        self.gaps = []               # 断线间隙标记，见 _record_gap
+        self.pending_gaps = []       # 读取线程发现断线、尚未由解析线程记录的间隙（数据锁保护）
+        self.gaps_drawn = 0
+        
+        # 回放和录制
+        self.replay_speed_var = tk.StringVar(value="1x")
+        self.record_var = tk.BooleanVar(value=False)
+        self.capture_writer = None
+        
+        # 后台串口枚举
+        self.port_scan_thread = None
+        self.port_scan_result = None
+        
         # 创建UI组件
         self.create_widgets()
+        self.refresh_ports()
         
         # 确保窗口关闭时正确清理资源
         self.root.protocol("WM_DELETE_WINDOW", self.on_close)
         
         # 启动状态更新定时器
         self.update_status()
+        self._drain_console()
         
-        # 启动主循环
-        self.root.mainloop()
+        # 启动主循环（启动基准测试等场景下由调用方自行驱动）
+        if mainloop:
+            self.root.mainloop()
         
     def refresh_ports(self):
-        """刷新可用串口列表"""
+        """
+        刷新可用串口列表
+        
+        虚拟串口较多时枚举很慢，因此在后台线程中进行，完成后再更新下拉列表
+        """
+        if self.port_scan_thread is not None and self.port_scan_thread.is_alive():
+            return
+        self.port_scan_result = None
+        self.port_combo.config(values=["正在查找串口..."])
+        self.port_scan_thread = threading.Thread(target=self._scan_ports, daemon=True)
+        self.port_scan_thread.start()
+        self.root.after(50, self._poll_ports)
+
+    def _scan_ports(self):
+        """后台线程：枚举串口"""
         try:
-            # 获取当前选择的串口
-            current_port = self.port_var.get()
-            
-            # 获取可用串口列表
-            ports = [port.device for port in serial.tools.list_ports.comports()]
-            
-            # 更新下拉列表
-            self.port_combo['values'] = ports
-            
-            # 如果当前选择的串口仍然可用，保持选择
-            if current_port in ports:
-                self.port_var.set(current_port)
-            else:
-                # 否则选择第一个可用串口
-                self.port_var.set(ports[0] if ports else "")
+            self.port_scan_result = [port.device for port in serial.tools.list_ports.comports()]
         except Exception as e:
             print(f"刷新串口列表时出错: {e}")
+            self.port_scan_result = []
+
+    def _poll_ports(self):
+        """定时检查串口枚举是否完成，完成后在界面线程中更新下拉列表"""
+        ports = self.port_scan_result
+        if ports is None:
+            self.root.after(50, self._poll_ports)
+            return
+        
+        # 获取当前选择的串口
+        current_port = self.port_var.get()
+        
+        # 更新下拉列表
+        self.port_combo['values'] = ports
+        
+        # 如果当前选择的串口仍然可用，保持选择
+        if current_port in ports:
+            self.port_var.set(current_port)
+        else:
+            # 否则选择第一个可用串口
+            self.port_var.set(ports[0] if ports else "")
 
     def clear_data(self):
         """清除串口数据框文本内容(保留绘图数据)"""
@@ -132,17 +3152,13 @@ class SerialPlotter:
             # 调试输出所有属性
             print(f"对象属性: {dir(self)}")
             
+            # 清空行日志（磁盘文件截断为空）
+            self.console_log.clear()
+            
             # 清除文本显示框内容
             if hasattr(self, 'data_text'):
                 print("清除文本显示框")  # 调试输出
-                self.data_text.config(state='normal')
-                self.data_text.delete('1.0', tk.END)
-                self.data_text.config(state='disabled')
-                
-            # 重置数据缓冲区
-            if hasattr(self, 'data_buffer'):
-                print("清除数据缓冲区")  # 调试输出
-                self.data_buffer = []
+                self.console.scroll_to(0)
                 
             # 更新状态
             self.status_var.set("文本数据已清除")
@@ -174,17 +3190,284 @@ class SerialPlotter:
                 else:
                     status = "正在监测"
                     
-                # 添加数据点信息
-                total_points = sum(len(data) for data in self.data_dict.values())
-                status += f" - 共 {total_points} 个数据点"
+                # 添加数据点信息（来自在线统计快照，无需遍历数据）
+                stats, ram_bytes = self._stats_snapshot()
+                total_points = sum(item['count'] for item in stats.values())
+                status += f" - 共 {total_points} 个数据点, 内存缓冲 {ram_bytes / (1024 * 1024):.0f} MB"
+                
+                if current_time - self.last_stats_time >= 0.5:
+                    self._update_stats_panel(stats)
+                    self.last_stats_time = current_time
+                if self.channels_changed:
+                    self.channels_changed = False
+                    self._update_channel_choices()
                 
+                if isinstance(self.ser, ReplaySource):
+                    status += f", 回放进度 {self.ser.progress:.0%}"
+                if self.reconnects:
+                    status += f", 已重连 {self.reconnects} 次"
+                if self.link_state:
+                    status += f" - {self.link_state}"
                 self.status_var.set(status)
+                
+                # 显示丢失/错误计数，提示采集是否仍然无损
+                c = self.counters
+                loss = (f"丢行 {c.dropped_lines} | 丢点 {c.dropped_samples} | 丢字节 {c.dropped_bytes} | "
+                        f"解析错误 {c.parse_errors} | 重同步 {c.resyncs} | 驱动溢出 {c.overruns} | "
+                        f"超出通道上限 {c.rejected_channels}")
+                self.loss_var.set(loss if c.lossless() else f"数据有丢失: {loss}")
+                
+                # 显示实际帧率和单帧耗时
+                scheduler = self.frame_scheduler
+                self.fps_var.set(f"{scheduler.fps:.1f} FPS / {scheduler.frame_time * 1000:.1f} ms")
         except Exception as e:
             print(f"状态更新错误: {e}")
         
         # 每100ms更新一次状态
         self.root.after(100, self.update_status)
 
+    def _stats_snapshot(self):
+        """一次持锁读取各通道统计和内存缓冲占用"""
+        with self.lock:
+            stats = {param: item.snapshot() for param, item in self.channel_stats.items()}
+            ram_bytes = sum(store.ram_bytes for store in self.data_dict.values())
+        return stats, ram_bytes
+
+    def _create_metrics(self):
+        """注册各阶段的计数、队列深度和延迟直方图"""
+        metrics = MetricsRegistry()
+        metrics.counter('serial_bytes', '从串口读取的字节数')
+        metrics.counter('serial_lines', '接收到的数据行数')
+        metrics.counter('samples', '写入存储的数据点数')
+        metrics.gauge('raw_queue_depth', '原始数据队列中的数据块数', lambda: len(self.raw_queue))
+        metrics.gauge('console_queue_depth', '显示队列中的行数', lambda: len(self.console_queue))
+        metrics.gauge('ring_backlog', '共享内存数据环中待处理的数据点数', self._ring_backlog)
+        for key in PipelineCounters.fields:
+            metrics.gauge(key, f'采集管线计数 {key}', lambda key=key: getattr(self.counters, key))
+        metrics.gauge('stream_subscribers', '数据转发的订阅者数量',
+                      lambda: self.broadcaster.subscriber_count() if self.broadcaster else 0)
+        metrics.gauge('stream_dropped_batches', '因订阅者过慢丢弃的数据批数',
+                      lambda: self.broadcaster.dropped_batches if self.broadcaster else 0)
+        metrics.histogram('arrival_to_parsed_seconds', '数据块到达到解析完成的延迟')
+        metrics.histogram('parsed_to_rendered_seconds', '解析完成到绘制到屏幕的延迟')
+        metrics.histogram('parse_batch_seconds', '每批数据的解析耗时')
+        metrics.histogram('frame_seconds', '单帧绘图耗时')
+        metrics.histogram('lock_wait_ingest_seconds', '写入数据时等待锁的时间')
+        metrics.histogram('lock_wait_render_seconds', '绘图时等待锁的时间')
+        return metrics
+
+    def _ring_backlog(self):
+        ring = self.sample_ring
+        return ring.backlog if ring is not None else 0
+
+    def show_diagnostics(self):
+        """打开诊断窗口，每秒刷新一次各阶段指标"""
+        if self.diagnostics_window is not None and self.diagnostics_window.winfo_exists():
+            self.diagnostics_window.lift()
+            return
+        window = tk.Toplevel(self.root)
+        window.title("诊断")
+        window.geometry("560x420")
+        self.diagnostics_window = window
+        
+        http_frame = ttk.Frame(window)
+        http_frame.pack(fill='x', padx=5, pady=5)
+        ttk.Checkbutton(
+            http_frame,
+            text="开启 Prometheus 端点 http://127.0.0.1:",
+            variable=self.metrics_http_var,
+            command=self.toggle_metrics_server
+        ).pack(side='left')
+        ttk.Entry(http_frame, textvariable=self.metrics_port_var, width=6).pack(side='left')
+        ttk.Label(http_frame, text="/metrics").pack(side='left')
+        
+        # 采样界面线程和采集线程的调用栈，写出火焰图和热点函数
+        profile_frame = ttk.Frame(window)
+        profile_frame.pack(fill='x', padx=5)
+        ttk.Label(profile_frame, text="性能采样").pack(side='left')
+        ttk.Entry(profile_frame, textvariable=self.profile_seconds_var, width=4).pack(side='left', padx=2)
+        ttk.Label(profile_frame, text="秒").pack(side='left')
+        self.profile_btn = ttk.Button(profile_frame, text="开始采样", command=self.profile_dialog)
+        self.profile_btn.pack(side='left', padx=5)
+        if self.profiler is not None:
+            self.profile_btn.config(state='disabled')
+        
+        tree = ttk.Treeview(window, columns=('name', 'value'), show='headings')
+        tree.heading('name', text='指标')
+        tree.heading('value', text='数值')
+        tree.column('name', width=260)
+        tree.column('value', width=260)
+        tree.pack(fill='both', expand=True, padx=5, pady=5)
+        
+        last = {'time': time.perf_counter(), 'counters': self.metrics.counter_values()}
+        
+        def refresh():
+            if not window.winfo_exists():
+                return
+            now = time.perf_counter()
+            counters = self.metrics.counter_values()
+            elapsed = max(now - last['time'], 1e-6)
+            rows = []
+            for name, value in counters.items():
+                rate = (value - last['counters'].get(name, 0)) / elapsed
+                rows.append((f"{name} 速率", f"{rate:.1f} /秒 (累计 {value})"))
+            last['time'], last['counters'] = now, counters
+            for name, value in self.metrics.gauge_values().items():
+                rows.append((name, value))
+            for name, (_, hist) in self.metrics.histograms.items():
+                quantiles = [hist.quantile(q) for q in (0.5, 0.95, 0.99)]
+                if quantiles[0] is None:
+                    text = "无数据"
+                else:
+                    text = " / ".join(f"≤{q * 1000:g} ms" for q in quantiles)
+                rows.append((f"{name} p50/p95/p99", text))
+            tree.delete(*tree.get_children())
+            for row in rows:
+                tree.insert('', 'end', values=row)
+            window.after(1000, refresh)
+        
+        refresh()
+
+    def profile_dialog(self):
+        """选择输出文件后开始采样调用栈"""
+        try:
+            seconds = self.profile_seconds_var.get()
+        except tk.TclError:
+            seconds = 0
+        if seconds <= 0:
+            messagebox.showerror("性能采样", "采样时长必须是正整数（秒）")
+            return
+        path = filedialog.asksaveasfilename(
+            title="性能采样结果",
+            initialfile=time.strftime('profile_%Y%m%d_%H%M%S'),
+            defaultextension=".collapsed",
+            filetypes=[("折叠栈", "*.collapsed")]
+        )
+        if path:
+            self.start_profile(seconds, path)
+
+    def start_profile(self, seconds, path):
+        """
+        采样界面/绘图线程和采集线程 seconds 秒，结束后写出折叠栈文件 path 和同名 .txt 汇总
+        
+        独立进程采集时串口读取在子进程中，只能采样本进程的共享内存读取线程
+        """
+        if self.profiler is not None:
+            return
+        threads = [threading.main_thread()]
+        for name in ('thread', 'parse_thread'):
+            thread = getattr(self, name, None)
+            if thread is not None and thread.is_alive():
+                threads.append(thread)
+        self.profiler = SamplingProfiler(threads)
+        self.profile_path = path
+        self.profiler.start()
+        if self.diagnostics_window is not None and self.diagnostics_window.winfo_exists():
+            self.profile_btn.config(state='disabled')
+        self.root.after(int(seconds * 1000), self.finish_profile)
+        print(f"开始性能采样 {seconds} 秒: {', '.join(thread.name for thread in threads)}")
+
+    def finish_profile(self):
+        """停止采样并写出结果"""
+        profiler, self.profiler = self.profiler, None
+        if profiler is None:
+            return
+        profiler.stop()
+        try:
+            summary_path = profiler.write(self.profile_path)
+        except OSError as e:
+            print(f"性能采样结果写入失败: {e}")
+            self.status_var.set(f"性能采样结果写入失败: {e}")
+            return
+        finally:
+            if self.diagnostics_window is not None and self.diagnostics_window.winfo_exists():
+                self.profile_btn.config(state='normal')
+        print('\n'.join(profiler.summary(top=10)))
+        print(f"性能采样结果已保存: {self.profile_path}, {summary_path}")
+        self.status_var.set(f"性能采样结果已保存: {os.path.basename(summary_path)}")
+
+    def toggle_broadcaster(self):
+        """开启或关闭本机数据转发服务"""
+        if self.broadcaster is not None:
+            self.broadcaster.close()
+            self.broadcaster = None
+            print("数据转发已关闭")
+        if not self.stream_enabled_var.get():
+            return
+        try:
+            self.broadcaster = SampleBroadcaster(
+                self.stream_port_var.get(),
+                fmt=self.stream_formats[self.stream_format_var.get()],
+                policy=self.stream_policies[self.stream_policy_var.get()]
+            )
+            print(f"数据转发已开启: 127.0.0.1:{self.broadcaster.port}")
+        except (OSError, tk.TclError) as e:
+            self.stream_enabled_var.set(False)
+            messagebox.showerror("错误", f"无法开启数据转发: {str(e)}")
+
+    def toggle_metrics_server(self):
+        """开启或关闭本机 Prometheus 指标端点"""
+        if self.metrics_server is not None:
+            self.metrics_server.close()
+            self.metrics_server = None
+            print("指标端点已关闭")
+        if not self.metrics_http_var.get():
+            return
+        try:
+            port = self.metrics_port_var.get()
+            self.metrics_server = MetricsServer(self.metrics, port)
+            print(f"指标端点已开启: http://127.0.0.1:{self.metrics_server.port}/metrics")
+        except (OSError, tk.TclError) as e:
+            self.metrics_http_var.set(False)
+            messagebox.showerror("错误", f"无法开启指标端点: {str(e)}")
+
+    def _update_stats_panel(self, stats):
+        """刷新通道统计表格"""
+        existing = set(self.stats_tree.get_children())
+        for param, item in stats.items():
+            values = (
+                param,
+                "否" if param in self.hidden_params else "是",
+                item['count'],
+                f"{item['rate']:.1f}",
+                f"{item['mean']:.4g}",
+                f"{item['std']:.4g}",
+                f"{item['min']:.4g}",
+                f"{item['max']:.4g}",
+                f"{item['last']:.4g}",
+            )
+            if param in existing:
+                self.stats_tree.item(param, values=values)
+                existing.discard(param)
+            else:
+                self.stats_tree.insert('', 'end', iid=param, values=values)
+        for iid in existing:
+            self.stats_tree.delete(iid)
+
+    def toggle_channel(self, event):
+        """双击统计表中的通道：切换曲线显示/隐藏，采集和统计照常进行"""
+        param = self.stats_tree.identify_row(event.y)
+        if not param:
+            return
+        visible = param in self.hidden_params
+        if visible:
+            self.hidden_params.discard(param)
+        else:
+            self.hidden_params.add(param)
+        self.stats_tree.set(param, 'shown', "是" if visible else "否")
+        if self.plot_backend is not None:
+            self.plot_backend.set_visible(param, visible)
+
+    def _update_channel_choices(self):
+        """通道列表变化后更新频谱和触发的通道下拉列表"""
+        with self.lock:
+            params = list(self.plot_params)
+        for combo, var in ((self.spectrum_combo, self.spectrum_param_var),
+                           (self.trigger_combo, self.trigger_param_var)):
+            combo['values'] = [""] + params
+            if var.get() not in params:
+                var.set("")
+
     def create_widgets(self):
         # 设置整体样式
         style = ttk.Style()
@@ -201,6 +3484,12 @@ class SerialPlotter:
         # 添加刷新串口按钮
         refresh_btn = ttk.Button(toolbar_frame, text="刷新串口", command=self.refresh_ports)
         refresh_btn.pack(side='right', padx=5)
+        
+        # 回放录制的数据或日志文件
+        ttk.Button(toolbar_frame, text="回放文件", command=self.replay_file).pack(side='right', padx=5)
+        ttk.Combobox(toolbar_frame, textvariable=self.replay_speed_var, width=6,
+                     values=["1x", "2x", "5x", "10x", "100x", "最快"]).pack(side='right')
+        ttk.Label(toolbar_frame, text="回放速度:").pack(side='right', padx=(5, 2))
 
         # 创建左右布局框架
         content_frame = ttk.Frame(main_frame)
@@ -223,10 +3512,9 @@ class SerialPlotter:
         
         # 串口选择
         ttk.Label(port_frame, text="串口:").grid(row=0, column=0, sticky='e', padx=5)
-        ports = [port.device for port in serial.tools.list_ports.comports()]
-        self.port_combo = ttk.Combobox(port_frame, textvariable=self.port_var, values=ports, width=15)
+        # 串口列表在后台枚举，见 refresh_ports
+        self.port_combo = ttk.Combobox(port_frame, textvariable=self.port_var, width=15)
         self.port_combo.grid(row=0, column=1, sticky='ew', padx=5)
-        self.port_var.set(ports[0] if ports else "")
 
         # 波特率选择
         ttk.Label(port_frame, text="波特率:").grid(row=1, column=0, sticky='e', padx=5)
@@ -239,6 +3527,48 @@ class SerialPlotter:
         clear_btn = ttk.Button(port_frame, text="清除串口数据", command=self.clear_data)
         clear_btn.grid(row=2, column=0, columnspan=2, pady=(10,0), sticky='ew')
         
+        # 采集模式
+        ttk.Checkbutton(port_frame, text="独立进程采集", variable=self.process_mode_var).grid(
+            row=3, column=0, columnspan=2, pady=(5, 0), sticky='w')
+        
+        # 队列溢出策略
+        ttk.Label(port_frame, text="溢出策略:").grid(row=4, column=0, sticky='e', padx=5)
+        ttk.Combobox(port_frame, textvariable=self.overflow_policy_var, width=15, state='readonly',
+                     values=list(self.overflow_policies)).grid(row=4, column=1, sticky='ew', padx=5, pady=5)
+        
+        # 录制原始数据，可用"回放文件"按原时序回放
+        ttk.Checkbutton(port_frame, text="录制原始数据", variable=self.record_var).grid(
+            row=8, column=0, columnspan=2, pady=(0, 5), sticky='w')
+        
+        # 本机数据转发，供其他程序同时使用同一串口的数据
+        stream_frame = ttk.Frame(port_frame)
+        stream_frame.grid(row=5, column=0, columnspan=2, sticky='ew', padx=5)
+        ttk.Checkbutton(stream_frame, text="本机转发 端口", variable=self.stream_enabled_var,
+                        command=self.toggle_broadcaster).pack(side='left')
+        ttk.Entry(stream_frame, textvariable=self.stream_port_var, width=6).pack(side='left', padx=(2, 0))
+        ttk.Label(port_frame, text="转发格式:").grid(row=6, column=0, sticky='e', padx=5)
+        ttk.Combobox(port_frame, textvariable=self.stream_format_var, width=15, state='readonly',
+                     values=list(self.stream_formats)).grid(row=6, column=1, sticky='ew', padx=5, pady=2)
+        ttk.Label(port_frame, text="慢速订阅者:").grid(row=7, column=0, sticky='e', padx=5)
+        ttk.Combobox(port_frame, textvariable=self.stream_policy_var, width=15, state='readonly',
+                     values=list(self.stream_policies)).grid(row=7, column=1, sticky='ew', padx=5, pady=(2, 5))
+        
+        # 通道统计区域
+        stats_frame = ttk.LabelFrame(control_frame, text=" 通道统计 ")
+        stats_frame.pack(fill='both', expand=True, pady=5)
+        
+        columns = ('param', 'shown', 'count', 'rate', 'mean', 'std', 'min', 'max', 'last')
+        headings = ('通道', '显示', '点数', '点/秒', '均值', '标准差', '最小', '最大', '最新')
+        self.stats_tree = ttk.Treeview(stats_frame, columns=columns, show='headings', height=4)
+        for column, heading in zip(columns, headings):
+            self.stats_tree.heading(column, text=heading)
+            self.stats_tree.column(column, width=60, anchor='e', stretch=False)
+        self.stats_tree.column('param', width=80, anchor='w')
+        self.stats_tree.column('shown', width=40, anchor='center')
+        self.stats_tree.pack(fill='both', expand=True)
+        # 双击通道切换显示/隐藏，不中断采集
+        self.stats_tree.bind('<Double-1>', self.toggle_channel)
+        
         # 创建滚动条
         scrollbar = ttk.Scrollbar(data_frame)
         scrollbar.pack(side='right', fill='y')
@@ -254,11 +3584,11 @@ class SerialPlotter:
             font=('Courier', 9)
         )
         self.data_text.pack(fill='both', expand=True)
-        scrollbar.config(command=self.data_text.yview)
         
-        # 初始化数据缓冲区
-        self.data_buffer = []
-        self.max_buffer_lines = 1000
+        # 全部显示行写入磁盘行日志，文本框只显示可见的一屏
+        self.console_log = LineLog()
+        self.console = VirtualConsole(self.data_text, scrollbar, self.console_log)
+        self.max_console_batch = 1000  # 每次从显示队列取出的最大行数
         self.update_data_text("等待串口数据...")
 
         # 参数输入区域
@@ -268,6 +3598,18 @@ class SerialPlotter:
         ttk.Label(param_frame, text="参数(逗号分隔):").grid(row=0, column=0, padx=5)
         self.param_entry = ttk.Entry(param_frame)
         self.param_entry.grid(row=0, column=1, columnspan=3, sticky='ew', padx=5)
+        
+        ttk.Label(param_frame, text="派生通道(名称=表达式;...):").grid(row=1, column=0, padx=5)
+        self.derived_entry = ttk.Entry(param_frame)
+        self.derived_entry.grid(row=1, column=1, columnspan=3, sticky='ew', padx=5, pady=(5, 0))
+        
+        # 自动发现通道：数据中出现的每个 名称:数值 都作为一个通道，参数可不填
+        ttk.Checkbutton(param_frame, text="自动发现通道", variable=self.auto_channels_var).grid(
+            row=2, column=1, sticky='w', padx=5, pady=(5, 0))
+        ttk.Label(param_frame, text="通道上限:").grid(row=2, column=2, sticky='e', padx=5, pady=(5, 0))
+        ttk.Entry(param_frame, textvariable=self.max_channels_var, width=6).grid(
+            row=2, column=3, sticky='w', padx=5, pady=(5, 0))
+        param_frame.grid_columnconfigure(1, weight=1)
 
         # 显示设置区域
         settings_frame = ttk.LabelFrame(main_frame, text=" 显示设置 ")
@@ -277,6 +3619,69 @@ class SerialPlotter:
         self.data_points_entry = ttk.Entry(settings_frame, textvariable=self.data_points_var, width=5)
         self.data_points_entry.pack(side='left', padx=5)
         self.data_points_var.set(5)
+        
+        ttk.Label(settings_frame, text="内存上限(MB):").pack(side='left', padx=5)
+        ttk.Entry(settings_frame, textvariable=self.memory_budget_var, width=6).pack(side='left', padx=5)
+        
+        ttk.Label(settings_frame, text="帧率范围:").pack(side='left', padx=5)
+        ttk.Entry(settings_frame, textvariable=self.min_fps_var, width=4).pack(side='left')
+        ttk.Label(settings_frame, text="-").pack(side='left')
+        ttk.Entry(settings_frame, textvariable=self.max_fps_var, width=4).pack(side='left')
+        
+        ttk.Label(settings_frame, text="绘图CPU上限(%):").pack(side='left', padx=5)
+        ttk.Entry(settings_frame, textvariable=self.cpu_budget_var, width=4).pack(side='left', padx=5)
+        
+        # 绘图后端在开始监测时生效
+        ttk.Label(settings_frame, text="绘图后端:").pack(side='left', padx=5)
+        ttk.Combobox(settings_frame, textvariable=self.render_backend_var, width=16, state='readonly',
+                     values=list(self.render_backends)).pack(side='left', padx=5)
+
+        # 频谱分析区域
+        spectrum_frame = ttk.LabelFrame(main_frame, text=" 频谱分析 ")
+        spectrum_frame.pack(fill='x', pady=5)
+        
+        ttk.Label(spectrum_frame, text="通道:").pack(side='left', padx=5)
+        self.spectrum_combo = ttk.Combobox(spectrum_frame, textvariable=self.spectrum_param_var,
+                                           values=[""], width=12, state='readonly')
+        self.spectrum_combo.pack(side='left', padx=5)
+        
+        ttk.Label(spectrum_frame, text="窗口点数:").pack(side='left', padx=5)
+        ttk.Combobox(spectrum_frame, textvariable=self.spectrum_size_var, width=7,
+                     values=["1024", "4096", "16384", "65536"]).pack(side='left', padx=5)
+        
+        ttk.Label(spectrum_frame, text="跳步:").pack(side='left', padx=5)
+        ttk.Entry(spectrum_frame, textvariable=self.spectrum_hop_var, width=7).pack(side='left', padx=5)
+        
+        ttk.Label(spectrum_frame, text="窗函数:").pack(side='left', padx=5)
+        ttk.Combobox(spectrum_frame, textvariable=self.spectrum_window_var, width=8, state='readonly',
+                     values=list(SpectrumAnalyzer.windows)).pack(side='left', padx=5)
+        
+        ttk.Label(spectrum_frame, text="平均次数:").pack(side='left', padx=5)
+        ttk.Entry(spectrum_frame, textvariable=self.spectrum_avg_var, width=4).pack(side='left', padx=5)
+        
+        ttk.Button(spectrum_frame, text="应用", command=self.apply_spectrum_settings).pack(side='left', padx=5)
+
+        # 触发捕获区域
+        trigger_frame = ttk.LabelFrame(main_frame, text=" 触发捕获 ")
+        trigger_frame.pack(fill='x', pady=5)
+        
+        ttk.Label(trigger_frame, text="通道:").pack(side='left', padx=5)
+        self.trigger_combo = ttk.Combobox(trigger_frame, textvariable=self.trigger_param_var,
+                                          values=[""], width=12, state='readonly')
+        self.trigger_combo.pack(side='left', padx=5)
+        ttk.Combobox(trigger_frame, textvariable=self.trigger_edge_var, width=5, state='readonly',
+                     values=["上升", "下降"]).pack(side='left', padx=5)
+        
+        for label, var in (("阈值:", self.trigger_level_var), ("迟滞:", self.trigger_hyst_var),
+                           ("释抑(点):", self.trigger_holdoff_var), ("触发前(点):", self.trigger_pre_var),
+                           ("触发后(点):", self.trigger_post_var)):
+            ttk.Label(trigger_frame, text=label).pack(side='left', padx=(5, 0))
+            ttk.Entry(trigger_frame, textvariable=var, width=6).pack(side='left', padx=5)
+        
+        ttk.Combobox(trigger_frame, textvariable=self.trigger_mode_var, width=5, state='readonly',
+                     values=["连续", "单次"]).pack(side='left', padx=5)
+        ttk.Button(trigger_frame, text="应用", command=self.apply_trigger_settings).pack(side='left', padx=5)
+        ttk.Button(trigger_frame, text="重新触发", command=self.rearm_trigger).pack(side='left', padx=5)
 
         # 按钮区域
         btn_frame = ttk.Frame(main_frame)
@@ -324,6 +3729,23 @@ class SerialPlotter:
         )
         self.refresh_btn.pack(side='left', padx=5)
         
+        # 导出按钮 - 把本次会话数据导出到文件
+        # 停止监测后仍可导出，直到下次开始
+        self.export_btn = ttk.Button(
+            btn_frame,
+            text="导出数据",
+            command=self.export_data
+        )
+        self.export_btn.pack(side='left', padx=5)
+        
+        # 诊断按钮 - 查看各阶段的吞吐、队列深度和延迟
+        self.diagnostics_btn = ttk.Button(
+            btn_frame,
+            text="诊断",
+            command=self.show_diagnostics
+        )
+        self.diagnostics_btn.pack(side='left', padx=5)
+        
         # 添加状态栏
         status_frame = ttk.Frame(self.root)
         status_frame.pack(fill='x', side='bottom', padx=5, pady=5)
@@ -335,11 +3757,42 @@ class SerialPlotter:
         self.data_rate_var = tk.StringVar(value="0 点/秒")
         data_rate_label = ttk.Label(status_frame, textvariable=self.data_rate_var)
         data_rate_label.pack(side='right')
+        
+        self.loss_var = tk.StringVar(value="")
+        loss_label = ttk.Label(status_frame, textvariable=self.loss_var)
+        loss_label.pack(side='right', padx=10)
+        
+        self.export_var = tk.StringVar(value="")
+        export_label = ttk.Label(status_frame, textvariable=self.export_var)
+        export_label.pack(side='right', padx=10)
+        
+        self.fps_var = tk.StringVar(value="0.0 FPS / 0.0 ms")
+        fps_label = ttk.Label(status_frame, textvariable=self.fps_var)
+        fps_label.pack(side='right', padx=10)
 
-    def start(self):
+    def notify(self, kind, title, message):
+        """
+        向用户报告错误、警告或提示，kind 为 'error'/'warning'/'info'
+        
+        交互使用时弹出对话框；无人值守运行时没有人点击对话框，改为写到标准错误和状态栏，
+        错误记入 reported_errors，由 run_unattended 据此返回失败
+        """
+        if self.interactive:
+            show = {'error': messagebox.showerror, 'warning': messagebox.showwarning,
+                    'info': messagebox.showinfo}[kind]
+            show(title, message)
+            return
+        print(f"{title}: {message}", file=sys.stderr)
+        self.status_var.set(f"{title}: {message}")
+        if kind == 'error':
+            self.reported_errors.append(f"{title}: {message}")
+
+    def start(self, replay=None):
         """
         启动串口数据监测
         
+        replay 为 (文件名, 倍速) 时以回放文件代替串口，其余流程相同
+        
         功能：
         - 根据用户选择的端口和参数建立串口连接
         - 初始化数据存储结构
@@ -360,18 +3813,23 @@ class SerialPlotter:
         - 设置运行标志
         - 初始化数据统计
         """
-        port = self.port_var.get()
+        port = self.port_var.get() if replay is None else replay[0]
         baud = int(self.baud_var.get())
         params = self.param_entry.get().strip()
-        if not port or not params:
+        auto_channels = self.auto_channels_var.get()
+        if not port or not (params or auto_channels):
             self.status_var.set("错误：请填写串口和参数")
-            messagebox.showerror("错误", "请填写串口和参数")
+            self.notify('error', "错误", "请填写串口和参数")
+            return
+        if self.exporter is not None and not self.exporter.done:
+            self.notify('info', "提示", "数据导出尚未完成，请稍后再开始新的监测")
             return
             
         try:
             # 清除之前的图表
-            if hasattr(self, 'fig'):
-                plt.close(self.fig)
+            if self.plot_backend is not None:
+                self.plot_backend.close()
+                self.plot_backend = None
                 
                 # 移除之前的绘图框架
                 for widget in self.root.winfo_children():
@@ -380,36 +3838,78 @@ class SerialPlotter:
             
             # 初始化参数和数据
             self.selected_params = [p.strip() for p in params.split(",") if p.strip()]
-            self.data_dict = {p: [] for p in self.selected_params}
+            self.derived_text = self.derived_entry.get()
+            self.derived_channels = parse_derived_channels(
+                self.derived_text, self.selected_params, strict=not auto_channels)
+            self.plot_params = self.selected_params + [d.name for d in self.derived_channels]
+            self.channel_registry = None
+            if auto_channels:
+                # 填写的参数先登记，排在前面；其余通道按出现顺序登记
+                max_channels = max(self.max_channels_var.get(), len(self.selected_params), 1)
+                self.channel_registry = ChannelRegistry(
+                    max_channels, self.selected_params, [d.name for d in self.derived_channels])
+            self._update_channel_choices()
+            self._close_session()
+            self.session_dir = tempfile.mkdtemp(prefix='serial_plotter_')
+            self.channel_plan = self._plan_memory()
+            self.data_dict = {p: self._new_store() for p in self.plot_params}
+            self.pyramids = {p: self._new_pyramid() for p in self.plot_params}
+            self.channel_stats = {p: ChannelStats() for p in self.plot_params}
+            self.published_counts = {}
+            
+            # 每次监测使用新的数据框行日志
+            self.console_log.clear()
+            self.console.scroll_to(0)
+            self.view_span = None
+            self.view_end = None
             
             # 重置数据统计
             self.data_count = 0
             self.last_count = 0
             self.last_count_time = time.time()
             
-            # 检查窗口是否最大化，如果不是则最大化
+            # 检查窗口是否最大化，如果不是则最大化（X11 不支持 zoomed 状态，改用 -zoomed 属性）
             if self.root.state() != 'zoomed':
-                self.root.state('zoomed')
+                try:
+                    self.root.state('zoomed')
+                except tk.TclError:
+                    self.root.attributes('-zoomed', True)
                 print("窗口已最大化")
             
             # 更新状态栏
             self.status_var.set(f"正在连接串口 {port}...")
             self.root.update_idletasks()
             
-            # 打开串口并设置详细参数
-            print(f"正在打开串口: {port}, 波特率: {baud}")
-            self.ser = serial.Serial(
-                port=port,
-                baudrate=baud,
-                timeout=0.5,
-                bytesize=serial.EIGHTBITS,
-                parity=serial.PARITY_NONE,
-                stopbits=serial.STOPBITS_ONE
-            )
+            self.serial_settings = (port, baud)
+            self.link_state = None
+            self.reconnects = 0
+            self.gaps = []
+            self.pending_gaps = []
+            self.gaps_drawn = 0
             
-            # 清空输入缓冲区
-            self.ser.reset_input_buffer()
-            print("串口已打开，输入缓冲区已清空")
+            process_mode = self.process_mode_var.get() and replay is None
+            if replay is not None:
+                # 回放文件代替串口
+                self.ser = ReplaySource(port, speed=replay[1], baud=baud)
+                print(f"正在回放{self.ser.kind}: {port}, 倍速: {replay[1] or '最快'}, "
+                      f"大小 {self.ser.size / 1024 / 1024:.1f} MB")
+            elif not process_mode:
+                # 打开串口并设置详细参数，清空输入缓冲区
+                print(f"正在打开串口: {port}, 波特率: {baud}")
+                self.ser = open_serial_port(port, baud)
+                print("串口已打开，输入缓冲区已清空")
+            
+            # 录制原始数据（独立进程采集时原始字节不经过本进程，不支持录制）
+            self.capture_writer = None
+            if self.record_var.get() and replay is None and not process_mode:
+                filename = filedialog.asksaveasfilename(
+                    title="录制原始数据",
+                    defaultextension=".cap",
+                    filetypes=[("原始数据录制", "*.cap")]
+                )
+                if filename:
+                    self.capture_writer = CaptureWriter(filename)
+                    print(f"正在录制原始数据: {filename}")
             
             # 更新UI状态
             self.running = True
@@ -421,18 +3921,38 @@ class SerialPlotter:
             # 先显示绘图窗口
             self.show_plot()
             
-            # 启动串口读取线程
-            self.thread = threading.Thread(target=self.read_serial, daemon=True)
+            # 按溢出策略重建线程间队列
+            policy = self.overflow_policies[self.overflow_policy_var.get()]
+            self.raw_queue = BoundedQueue(1024, raw_queue_policy(policy))
+            self.console_queue = BoundedQueue(2000, policy)
+            self.counters = PipelineCounters()
+            
+            if process_mode:
+                # 在独立进程中读取和解析，本进程只从共享内存取数据
+                self.start_acquisition_process(port, baud)
+                self.thread = threading.Thread(target=self.drain_shared_ring, name='drain_shared_ring', daemon=True)
+            else:
+                # 启动串口读取线程和解析线程
+                self.thread = threading.Thread(target=self.read_serial, name='read_serial', daemon=True)
+                self.parse_thread = threading.Thread(target=self.parse_serial, name='parse_serial', daemon=True)
+                self.parse_thread.start()
             self.thread.start()
             print(f"串口读取线程已启动，线程状态: {'运行中' if self.thread.is_alive() else '未启动'}")
             
             # 更新状态栏
-            self.status_var.set(f"正在监测 - 串口:{port} 波特率:{baud}")
+            if replay is not None:
+                self.status_var.set(f"正在回放 - {os.path.basename(port)}")
+            else:
+                self.status_var.set(f"正在监测 - 串口:{port} 波特率:{baud}")
             self.data_rate_var.set("0.0 点/秒")
             
             # 添加调试信息
-            print(f"串口监测已启动 - 参数: {self.selected_params}")
-            print(f"串口状态: {'已打开' if self.ser.is_open else '未打开'}")
+            if auto_channels:
+                print(f"串口监测已启动 - 自动发现通道，上限 {self.channel_registry.max_channels}")
+            else:
+                print(f"串口监测已启动 - 参数: {self.selected_params}")
+            if not process_mode:
+                print(f"串口状态: {'已打开' if self.ser.is_open else '未打开'}")
             print(f"线程状态: {'运行中' if self.thread.is_alive() else '未启动'}")
             
             # 强制刷新窗口
@@ -440,7 +3960,8 @@ class SerialPlotter:
             
         except Exception as e:
             self.running = False
-            messagebox.showerror("启动错误", f"无法启动监测: {str(e)}")
+            self.stop_acquisition_process()
+            self.notify('error', "启动错误", f"无法启动监测: {str(e)}")
             print(f"启动失败: {traceback.format_exc()}")
             
             # 恢复UI状态
@@ -448,6 +3969,27 @@ class SerialPlotter:
             self.stop_btn.config(state="disabled")
             self.pause_btn.config(state="disabled")
 
+    def replay_file(self):
+        """选择录制文件或日志文件，按回放速度经完整的数据流程回放"""
+        if self.running:
+            messagebox.showinfo("提示", "请先停止当前监测")
+            return
+        text = self.replay_speed_var.get().strip().lower().rstrip('x')
+        if text == "最快":
+            speed = 0.0
+        else:
+            try:
+                speed = float(text)
+            except ValueError:
+                messagebox.showerror("错误", "回放速度应为倍数（如 1x、10x）或\"最快\"")
+                return
+        filename = filedialog.askopenfilename(
+            title="选择回放文件",
+            filetypes=[("录制或日志文件", "*.cap *.txt *.log"), ("所有文件", "*.*")]
+        )
+        if filename:
+            self.start(replay=(filename, speed))
+
     def stop(self):
         """
         停止串口数据监测
@@ -456,7 +3998,7 @@ class SerialPlotter:
         - 关闭串口连接
         - 停止数据读取线程
         - 清理绘图资源
-        - 重置数据存储
+        - 保留本次会话数据供导出，下次开始或关闭程序时清理
         
         清理过程：
         - 等待线程正常结束
@@ -474,6 +4016,17 @@ class SerialPlotter:
         # 等待串口线程结束
         if hasattr(self, 'thread') and self.thread.is_alive():
             self.thread.join(timeout=1.0)
+        if hasattr(self, 'parse_thread') and self.parse_thread.is_alive():
+            self.parse_thread.join(timeout=1.0)
+        
+        # 结束采集进程
+        self.stop_acquisition_process()
+        
+        # 结束录制
+        if self.capture_writer is not None:
+            self.capture_writer.close()
+            print(f"原始数据已录制到: {self.capture_writer.filename}")
+            self.capture_writer = None
             
         # 关闭串口
         if self.ser and self.ser.is_open:
@@ -482,17 +4035,10 @@ class SerialPlotter:
             except:
                 pass
             
-        # 停止动画
-        if hasattr(self, 'ani'):
-            self.ani.event_source.stop()
-            
-        # 清除图表数据
-        if hasattr(self, 'data_dict'):
-            self.data_dict = {}
-            
-        # 清除图表
-        if hasattr(self, 'fig'):
-            plt.close(self.fig)
+        # 停止动画，清除图表
+        if self.plot_backend is not None:
+            self.plot_backend.close()
+            self.plot_backend = None
             self.fig = None
             
         # 移除绘图框架
@@ -510,15 +4056,10 @@ class SerialPlotter:
         self.root.update_idletasks()
 
     def on_close(self):
+        # 采样尚未结束时先写出已采集的结果
+        self.finish_profile()
         self.stop()
         
-        # 清理Matplotlib资源
-        if hasattr(self, 'fig'):
-            try:
-                plt.close(self.fig)
-            except:
-                pass
-                
         # 清理文本框资源
         if hasattr(self, 'data_text'):
             try:
@@ -526,35 +4067,51 @@ class SerialPlotter:
             except:
                 pass
                 
-        # 清空数据缓冲区
-        if hasattr(self, 'data_buffer'):
-            self.data_buffer = []
+        # 删除数据框行日志
+        self.console_log.close()
+        
+        # 删除落盘数据
+        self._close_session()
+        
+        if self.metrics_server is not None:
+            self.metrics_server.close()
+            self.metrics_server = None
+        if self.broadcaster is not None:
+            self.broadcaster.close()
+            self.broadcaster = None
             
         self.root.destroy()
 
     def update_data_text(self, line):
         """更新数据文本框内容"""
         try:
-            print(f"DEBUG: 准备更新文本框内容: {line}")  # 调试输出
-            # 确保在主线程中操作缓冲区
+            # 其他线程的数据放入有界显示队列，由界面定时取出
             if threading.current_thread() is not threading.main_thread():
-                self.root.after(0, lambda: self._add_to_buffer(line))
+                self.counters.dropped_lines += self.console_queue.put(line)
             else:
-                self._add_to_buffer(line)
+                self._add_to_buffer([line])
         except Exception as e:
             print(f"更新文本框错误: {e}")
 
-    def _add_to_buffer(self, line):
-        """线程安全地添加数据到缓冲区"""
+    def _add_to_buffer(self, lines):
+        """添加多行数据到行日志（仅在主线程调用）"""
         try:
-            self.data_buffer.append(line)
-            if len(self.data_buffer) > self.max_buffer_lines:
-                self.data_buffer.pop(0)
+            self.console_log.append(lines)
             
             # 立即更新UI
             self._update_text_widget()
         except Exception as e:
-            print(f"缓冲区更新错误: {e}")
+            print(f"缓冲区更新错误: {e}")
+
+    def _drain_console(self):
+        """定时把显示队列中的数据批量刷新到文本框，每次只重绘一次"""
+        try:
+            lines = self.console_queue.get_batch(self.max_console_batch)
+            if lines:
+                self._add_to_buffer(lines)
+        except Exception as e:
+            print(f"显示队列错误: {e}")
+        self.root.after(50, self._drain_console)
 
     def _update_text_widget(self):
         """实际更新文本框内容"""
@@ -563,19 +4120,10 @@ class SerialPlotter:
                 print("WARNING: 文本框不存在，无法更新")
                 return
                 
-            # 获取要显示的内容（最多100行）
-            display_content = '\n'.join(self.data_buffer[-100:])
-            print(f"DEBUG: 更新文本框内容，缓冲区大小: {len(self.data_buffer)}")
-            
-            # 在主线程中更新UI
+            # 在主线程中更新UI（只重新读取可见的一屏）
             def update_ui():
                 try:
-                    self.data_text.config(state='normal')
-                    self.data_text.delete(1.0, tk.END)
-                    self.data_text.insert(tk.END, display_content)
-                    self.data_text.config(state='disabled')
-                    self.data_text.see(tk.END)
-                    print("DEBUG: 文本框更新成功")
+                    self.console.refresh()
                 except Exception as e:
                     print(f"UI更新错误: {e}")
             
@@ -588,12 +4136,14 @@ class SerialPlotter:
             print(f"更新文本框UI错误: {e}")
 
     def read_serial(self):
-        buffer = ""
-        data_count = 0
-        last_report_time = time.time()
+        """
+        读取线程：只负责从串口读取原始字节并放入有界的原始数据队列
         
+        解码和解析在 parse_serial 线程中进行，解析跟不上时按溢出策略丢弃数据块，
+        读取本身不会被阻塞
+        """
         print("串口读取线程已启动")
-        print(f"当前串口设置 - 端口: {self.port_var.get()}, 波特率: {self.baud_var.get()}")
+        print(f"当前串口设置 - 端口: {self.serial_settings[0]}, 波特率: {self.serial_settings[1]}")
         
         # 检查串口是否已打开
         if not hasattr(self, 'ser') or not self.ser or not self.ser.is_open:
@@ -601,10 +4151,6 @@ class SerialPlotter:
             print(error_msg)
             self.update_data_text(error_msg)
             return
-            
-        # 检查文本框是否已初始化
-        if not hasattr(self, 'data_text'):
-            print("警告: 文本框未初始化")
         
         # 初始清空缓冲区
         try:
@@ -613,108 +4159,396 @@ class SerialPlotter:
         except Exception as e:
             print(f"清空缓冲区错误: {e}")
         
-        while self.running and self.ser and self.ser.is_open:
+        overrun_monitor = DriverOverrunMonitor(self.ser)
+        overruns_before = 0  # 重连前各次连接累计的驱动溢出
+        last_overrun_check = time.time()
+        # 回放文件没有热插拔，也不必丢数据：队列较满时等待解析线程
+        replay = isinstance(self.ser, ReplaySource)
+        watcher = None if replay else PortWatcher(self.serial_settings[0])
+        capture = self.capture_writer
+        chunk_seq = 0
+        
+        while self.running:
             with self.pause_lock:
                 if self.paused:
                     time.sleep(0.1)
                     continue
             
             try:
+                # 设备被拔出时 read 可能不报错而是一直读不到数据，由监视线程发现
+                if watcher is not None and not watcher.present:
+                    raise serial.SerialException("设备已拔出")
+                if replay and len(self.raw_queue) >= self.raw_queue.maxsize // 2:
+                    time.sleep(0.001)
+                    continue
+                
+                # 定期检查驱动层溢出
+                now = time.time()
+                if now - last_overrun_check >= 1.0:
+                    self.counters.overruns = overruns_before + overrun_monitor.update()
+                    last_overrun_check = now
+                
                 # 检查可读数据量
-                bytes_to_read = self.ser.in_waiting
+                bytes_to_read = overrun_monitor.in_waiting()
                 if bytes_to_read == 0:
+                    if replay and self.ser.finished:
+                        self.link_state = "回放结束"
+                        self.update_data_text(f"回放结束: {os.path.basename(self.ser.filename)}")
+                        print("回放结束")
+                        break
                     time.sleep(0.01)
                     continue
-                    
-                print(f"准备读取 {bytes_to_read} 字节数据")
                 
-                # 读取串口数据
+                # 读取串口数据，交给解析线程
                 raw_data = self.ser.read(bytes_to_read)
-                print(f"实际读取 {len(raw_data)} 字节原始数据")
-                
-                try:
-                    # 尝试多种编码格式解码
-                    encodings = ['utf-8', 'gbk', 'ascii', 'latin1']
-                    data = None
-                    
-                    for encoding in encodings:
-                        try:
-                            data = raw_data.decode(encoding)
-                            print(f"使用 {encoding} 解码成功")
-                            break
-                        except UnicodeDecodeError:
-                            continue
-                    
-                    if data is None:
-                        # 所有编码尝试失败，使用替换策略
-                        data = raw_data.decode('utf-8', errors='replace')
-                        print("警告: 使用替换策略解码数据")
-                    
-                    print(f"原始数据(hex): {raw_data.hex()}")
-                    print(f"解码后数据: {data[:50]}...")  # 只打印前50个字符
-                    
-                    if data:
-                        buffer += data
-                        data_count += len(data)
-                        
-                        # 处理完整行
-                        while '\n' in buffer:
-                            line, buffer = buffer.split('\n', 1)
-                            line = line.strip()
-                            if not line:
-                                continue
-                                
-                            # 过滤非可打印字符
-                            line = ''.join(c for c in line if c.isprintable() or c in '\t\r\n')
-                            print(f"处理行数据: {line}")
-                            
-                            # 更新文本框显示
-                            try:
-                                timestamp = time.strftime('%H:%M:%S', time.localtime())
-                                self.update_data_text(f"[{timestamp}] {line}")
-                            except Exception as e:
-                                print(f"串口数据显示错误: {e}")
-                            
-                            # 解析数据
-                            for param in self.selected_params:
-                                if f"{param}:" in line:
-                                    try:
-                                        # 提取数值部分
-                                        value_part = line.split(f"{param}:")[1]
-                                        # 去除单位符号并提取数值
-                                        value_str = ''.join(c for c in value_part.split()[0] 
-                                                          if c.isdigit() or c in '.-')
-                                        value = float(value_str)
-                                        
-                                        with self.lock:
-                                            if param not in self.data_dict:
-                                                self.data_dict[param] = []
-                                            self.data_dict[param].append(value)
-                                        
-                                        # 更新数据统计
-                                        self.data_count += 1
-                                        data_count += 1
-                                        
-                                    except (ValueError, IndexError, AttributeError) as e:
-                                        print(f"数据解析错误: {line} - {e}")
-                                        continue
-                                
-                except UnicodeDecodeError as decode_error:
-                    print(f"解码错误: {decode_error}")
-                    print(f"原始数据: {raw_data.hex()}")
+                self.metrics.inc('serial_bytes', len(raw_data))
+                if capture is not None:
+                    capture.write(raw_data)
+                # 附带序号（解析线程据此发现被丢弃的数据块）和到达时间（统计 到达->解析 的延迟）
+                if self.raw_queue.put((chunk_seq, time.perf_counter(), raw_data)):
+                    self.counters.dropped_bytes += len(raw_data)
+                chunk_seq += 1
+                self.counters.overruns = overruns_before + overrun_monitor.count
                     
-            except serial.SerialException as se:
-                print(f"串口通信错误: {se}")
-                if not self.ser.is_open:
-                    print("串口已关闭，尝试重新连接...")
-                    self.stop()
+            except (serial.SerialException, OSError) as se:
+                # 断线后不停止监测：保留已有数据，等待设备重新出现后继续写入
+                print(f"串口通信错误: {se}，等待重新连接...")
+                self.update_data_text(f"串口断开，等待重新连接: {se}")
+                gap = {'start': time.time(), 'end': None, 'index': None}
+                self.link_state = "串口已断开，等待重新连接..."
+                try:
+                    self.ser.close()
+                except Exception:
+                    pass
+                # 间隙标记不经过原始数据队列（队列满时可能按溢出策略被丢弃），
+                # 由解析线程在断线前的数据之后记录
+                with self.lock:
+                    self.pending_gaps.append(gap)
+                
+                port, baud = self.serial_settings
+                ser = reconnect_serial(port, baud, watcher, lambda: not self.running)
+                if ser is None:
                     break
-                time.sleep(0.1)
+                self.ser = ser
+                overruns_before = self.counters.overruns
+                overrun_monitor = DriverOverrunMonitor(ser)
+                gap['end'] = time.time()
+                self.link_state = None
+                self.reconnects += 1
+                self.update_data_text(f"串口 {port} 已重新连接，断开 {gap['end'] - gap['start']:.1f} 秒")
+                print(f"串口 {port} 已重新连接")
                 
             except Exception as e:
                 print(f"未知错误: {e}")
                 traceback.print_exc()
                 time.sleep(0.1)
+        
+        if watcher is not None:
+            watcher.stop()
+
+    def parse_serial(self):
+        """
+        解析线程：解码原始数据、按行拆分并解析，数据按批写入存储，
+        原始行放入有界的显示队列
+        
+        原始数据块被丢弃后，残留的半行无法拼接，由 LineAssembler 在间隙处丢弃到下一个换行符为止（重同步）
+        """
+        print("数据解析线程已启动")
+        assembler = LineAssembler(self.max_line_length)
+        registry = self.channel_registry
+        
+        while self.running:
+            # 断线重连的间隙标记：先取标记再取数据，断线前放入队列的数据都在这一批中；
+            # 重连至少要等一个检查周期，这一批中也不会有重连后的数据
+            gaps = []
+            if self.pending_gaps:
+                with self.lock:
+                    gaps, self.pending_gaps = self.pending_gaps, []
+            chunks = self.raw_queue.get_batch(timeout=None if gaps else 0.1)
+            if not chunks and not gaps:
+                continue
+            
+            try:
+                parse_start = time.perf_counter()
+                # 有数据块被丢弃时在间隙处重新同步到行首
+                resyncs = assembler.resyncs
+                lines = assembler.feed([(seq, chunk) for seq, _, chunk in chunks])
+                self.counters.resyncs += assembler.resyncs - resyncs
+                
+                # 本次解析出的数据，按批写入存储
+                batch = {}
+                shown = []
+                timestamp = time.strftime('%H:%M:%S', time.localtime())
+                for line in lines:
+                    line = clean_line(line)
+                    if not line:
+                        continue
+                    shown.append(f"[{timestamp}] {line}")
+                    
+                    # 解析数据
+                    if registry is not None:
+                        names = registry.names
+                        for channel, value in parse_auto_line(line, registry):
+                            batch.setdefault(names[channel], []).append(value)
+                        continue
+                    values, errors = parse_line(line, self.selected_params)
+                    self.counters.parse_errors += errors
+                    for param, value in values:
+                        batch.setdefault(param, []).append(value)
+                
+                if registry is not None:
+                    self.counters.rejected_channels = registry.rejected
+                
+                if batch:
+                    self._ingest_batch(batch)
+                if shown:
+                    self.counters.dropped_lines += self.console_queue.put_many(shown)
+                
+                for gap in gaps:
+                    self._record_gap(gap)
+                    # 断线前的半行作废，重连后重新同步到行首
+                    assembler.discard_partial()
+                
+                parsed = time.perf_counter()
+                self.metrics.inc('serial_lines', len(lines))
+                self.metrics.observe('parse_batch_seconds', parsed - parse_start)
+                if chunks:
+                    self.metrics.observe('arrival_to_parsed_seconds', parsed - chunks[0][1])
+                    
+            except Exception as e:
+                print(f"数据解析线程错误: {e}")
+                traceback.print_exc()
+
+    def start_acquisition_process(self, port, baud):
+        """创建共享内存数据环并启动采集进程"""
+        self.sample_ring = SharedSampleRing()
+        self.line_queue = multiprocessing.Queue(maxsize=1000)
+        self.acq_stop_event = multiprocessing.Event()
+        self.acq_pause_event = multiprocessing.Event()
+        if self.paused:
+            self.acq_pause_event.set()
+        self.acq_process = multiprocessing.Process(
+            target=acquisition_process,
+            args=(port, baud, self.selected_params, self.sample_ring.name,
+                  self.line_queue, self.acq_stop_event, self.acq_pause_event,
+                  self.channel_registry.max_channels if self.channel_registry else 0,
+                  [d.name for d in self.derived_channels]),
+            daemon=True
+        )
+        self.acq_process.start()
+        print(f"采集进程已启动，PID: {self.acq_process.pid}")
+
+    def stop_acquisition_process(self):
+        """通知采集进程退出并释放共享内存"""
+        if self.acq_process is not None:
+            self.acq_stop_event.set()
+            self.acq_process.join(timeout=2.0)
+            if self.acq_process.is_alive():
+                print("采集进程未按时退出，强制结束")
+                self.acq_process.terminate()
+                self.acq_process.join(timeout=1.0)
+            self.acq_process = None
+        if self.line_queue is not None:
+            self.line_queue.cancel_join_thread()
+            self.line_queue.close()
+            self.line_queue = None
+        if self.sample_ring is not None:
+            self.sample_ring.close()
+            self.sample_ring = None
+
+    def drain_shared_ring(self):
+        """
+        从共享内存数据环取出采集进程解析好的数据并写入存储
+        
+        采集进程不受本进程界面和绘图卡顿的影响；本线程落后时数据暂存在数据环中
+        """
+        print("共享内存读取线程已启动")
+        ring = self.sample_ring
+        line_queue = self.line_queue
+        params = list(self.selected_params)
+        local_dropped_lines = 0
+        # 尚未记录的断线间隙 [(断线时数据环的写入位置, 间隙)]：断线前的数据可能还没取完，
+        # 与重连后的数据一起取出时要在这个位置拆开，间隙记在两者之间
+        pending_gaps = []
+        while self.running:
+            # 采集进程送来的原始行放入显示队列
+            for _ in range(100):
+                try:
+                    lines = line_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if isinstance(lines, dict):
+                    # 采集进程的新通道、断线/重连通知
+                    if 'channel' in lines:
+                        params.append(lines['channel'])
+                    elif 'gap_start' in lines:
+                        gap = {'start': lines['gap_start'], 'end': None, 'index': None}
+                        pending_gaps.append((lines['head'], gap))
+                        self.link_state = "串口已断开，等待重新连接..."
+                    else:
+                        # 断线和重连的通知可能在同一轮中取到，此时间隙尚未记录
+                        gap = pending_gaps[-1][1] if pending_gaps else (self.gaps[-1] if self.gaps else {})
+                        gap['end'] = lines['gap_end']
+                        self.link_state = None
+                        self.reconnects += 1
+                    continue
+                local_dropped_lines += self.console_queue.put_many(lines)
+                self.metrics.inc('serial_lines', len(lines))
+            
+            # 汇总采集进程的计数
+            self.counters.dropped_samples = ring.dropped
+            self.counters.dropped_lines = local_dropped_lines + ring.counter('dropped_lines')
+            self.counters.parse_errors = ring.counter('parse_errors')
+            self.counters.resyncs = ring.counter('resyncs')
+            self.counters.overruns = ring.counter('overruns')
+            self.counters.rejected_channels = ring.counter('rejected_channels')
+            
+            # 断线前的数据都已取走时记录间隙，之后才取重连后的数据
+            while pending_gaps and ring.tail >= pending_gaps[0][0]:
+                self._record_gap(pending_gaps.pop(0)[1])
+            
+            view = ring.peek(pending_gaps[0][0] if pending_gaps else None)
+            if view is None:
+                time.sleep(0.005)
+                continue
+            ids, values, head = view
+            if len(ids) and ids.max() >= len(params):
+                # 新通道的名称通知还在行队列中，取到之后再处理这批数据
+                del view, ids, values
+                time.sleep(0.001)
+                continue
+            batch = {}
+            for channel, param in enumerate(params):
+                selected = values[ids == channel]
+                if len(selected):
+                    batch[param] = selected
+            # 数据已复制出来，释放对共享内存的引用和数据环空间
+            del view, ids, values
+            ring.release(head)
+            self._ingest_batch(batch)
+        
+        for _, gap in pending_gaps:
+            self._record_gap(gap)
+
+    def _record_gap(self, gap):
+        """
+        在断线前已写入的数据之后记录一个间隙标记
+        
+        gap 为 {'start': 断线时间, 'end': 重连时间, 'index': 间隙位置的数据点索引}，
+        重连后由读取线程填写 end；绘图时在间隙位置画竖线
+        """
+        with self.lock:
+            gap['index'] = max((len(store) for store in self.data_dict.values()), default=0)
+            self.gaps.append(gap)
+        print(f"记录断线间隙，位置: {gap['index']}")
+
+    def _new_pyramid(self):
+        capacity = self.channel_plan[2]
+        return HistoryPyramid(factor=self.pyramid_factor, levels=self.pyramid_levels, capacity=capacity)
+
+    def _plan_memory(self):
+        """
+        按内存上限计算本次监测每个通道的存储大小
+        
+        会话内存上限在各监测参数间平分，历史金字塔和内存环形缓冲都计入上限，
+        更早的数据只保留在磁盘上。通道太多、上限太小而无法满足时提示实际需要的内存
+        """
+        try:
+            budget_mb = self.memory_budget_var.get()
+        except tk.TclError:
+            budget_mb = 256
+        channels = len(self.plot_params)
+        if self.channel_registry is not None:
+            # 自动发现的通道陆续出现，按通道上限预先平分，总占用不超过上限
+            channels = self.channel_registry.max_channels + len(self.derived_channels)
+        channels = max(1, channels)
+        plan = plan_channel_memory(budget_mb * 1024 * 1024, channels, self.pyramid_levels)
+        if not plan[3]:
+            _, block, capacity, _ = plan
+            need_mb = channels * (capacity * self.pyramid_levels * 4 * 8 + 2 * block * 8) / 1024 / 1024
+            message = (f"内存上限 {budget_mb} MB 不足以容纳 {channels} 个通道，"
+                       f"至少需要 {need_mb:.1f} MB，将按最小缓存运行")
+            print(f"警告: {message}")
+            self.notify('warning', "内存上限", message)
+        return plan
+
+    def _new_store(self):
+        """按本次监测的内存分配为一个通道创建数据存储"""
+        ram_points, block_size, _, _ = self.channel_plan
+        self.store_seq += 1
+        path = os.path.join(self.session_dir, f"ch{self.store_seq}.f64")
+        return ChannelStore(path, ram_points, block_size)
+
+    def _discard_store(self, store):
+        """关闭并删除一个通道的落盘数据"""
+        store.close()
+        try:
+            if os.path.exists(store.path):
+                os.remove(store.path)
+        except OSError as e:
+            print(f"删除数据文件失败: {e}")
+
+    def _close_session(self):
+        """释放全部通道存储并删除会话目录"""
+        with self.lock:
+            for store in self.data_dict.values():
+                store.close()
+            self.data_dict = {}
+            self.pyramids = {}
+            self.channel_stats = {}
+            self.published_counts = {}
+        if self.session_dir:
+            shutil.rmtree(self.session_dir, ignore_errors=True)
+            self.session_dir = None
+
+    def _ingest_batch(self, batch):
+        """
+        将一批解析好的数据写入各通道存储
+        
+        每批只获取一次锁，同时增量更新历史金字塔、派生通道和在线统计
+        """
+        input_count = sum(len(values) for values in batch.values())
+        batch = {param: np.asarray(values, dtype=np.float64) for param, values in batch.items()}
+        for derived in list(self.derived_channels):
+            values = derived.feed(batch)
+            if len(values):
+                batch[derived.name] = values
+        
+        wait_start = time.perf_counter()
+        with self.lock:
+            self.metrics.observe('lock_wait_ingest_seconds', time.perf_counter() - wait_start)
+            starts = {}
+            for param, values in batch.items():
+                if param not in self.data_dict:
+                    # 首次出现时分配存储；自动发现的新通道同时加入绘图列表
+                    self.data_dict[param] = self._new_store()
+                    self.pyramids[param] = self._new_pyramid()
+                    self.channel_stats[param] = ChannelStats()
+                    if param not in self.plot_params:
+                        self.plot_params.insert(len(self.selected_params), param)
+                        self.selected_params.append(param)
+                        self.channels_changed = True
+                starts[param] = len(self.data_dict[param])
+                self.data_dict[param].extend(values)
+                self.pyramids[param].extend(values)
+                self.channel_stats[param].update(values)
+            if self.spectrum is not None and self.spectrum_param in batch:
+                self.spectrum.feed(batch[self.spectrum_param])
+            if self.trigger is not None and self.trigger_param in batch:
+                self.trigger.process(batch[self.trigger_param], self.data_dict[self.trigger_param])
+            # 整批写完后一次性发布各通道点数，绘图线程据此取得一致的快照
+            self.published_counts = {param: len(store) for param, store in self.data_dict.items()}
+        
+        # 转发给本机的其他程序（编码和发送不占用数据锁）
+        broadcaster = self.broadcaster
+        if broadcaster is not None:
+            broadcaster.publish(batch, starts)
+        
+        # 更新数据统计
+        self.data_count += input_count
+        self.metrics.inc('samples', input_count)
+        if self.unrendered_since is None:
+            self.unrendered_since = time.perf_counter()
 
     # 图形样式优化
     def show_plot(self):
@@ -757,185 +4591,345 @@ class SerialPlotter:
             # 靠右侧摆放，允许垂直扩展
             self.data_text.pack(side='right', fill='both', expand=True)
             scrollbar.pack(side='right', fill='y')
-            scrollbar.config(command=self.data_text.yview)
             
-            # 初始化数据缓冲区
-            self.data_buffer = []
-            self.max_buffer_lines = 1000  # 最大保留行数
+            # 沿用已有的行日志
+            self.console = VirtualConsole(self.data_text, scrollbar, self.console_log)
             
             # 添加初始提示信息
             self._update_text_widget()  # 直接更新UI
             self.update_data_text("等待串口数据...")
             print("DEBUG: 文本框初始化完成")  # 调试输出
         
-        # 设置绘图样式
-        plt.style.use('ggplot')
+        # 按显示设置创建绘图后端
+        backend_class = self.render_backends.get(self.render_backend_var.get(), MatplotlibBackend)
+        self.plot_backend = backend_class(plot_frame, self.plot_params, self.on_scroll)
+        # 频谱、触发等辅助面板直接使用 Matplotlib 的图形和坐标轴
+        self.fig = getattr(self.plot_backend, 'fig', None)
+        self.ax = getattr(self.plot_backend, 'ax', None)
+        self.canvas = getattr(self.plot_backend, 'canvas', None)
         
-        # 设置中文字体
-        plt.rcParams['font.sans-serif'] = ['SimHei', 'Microsoft YaHei', 'WenQuanYi Micro Hei']
-        plt.rcParams['axes.unicode_minus'] = False
+        # 设置窗口缩放支持
+        self.root.columnconfigure(0, weight=1)
+        self.root.rowconfigure(0, weight=1)
         
-        # 创建图形和坐标轴
-        self.fig, self.ax = plt.subplots(figsize=(8, 4))
-        self.fig.subplots_adjust(left=0.1, right=0.95, top=0.9, bottom=0.1)
+        self.view_level = 0
+        self.gaps_drawn = 0  # 新图表需要重画全部间隙标记
         
-        # 设置标题和标签
-        self.ax.set_title('串口数据实时监测', fontsize=12, pad=10)
-        self.ax.set_xlabel('数据点索引', fontsize=10)
-        self.ax.set_ylabel('数值', fontsize=10)
+        # 按当前设置创建频谱和触发面板
+        self.aux_axes = {}
+        self.trigger_level_line = None
+        self.apply_spectrum_settings()
+        self.apply_trigger_settings()
         
-        # 创建canvas并嵌入到Tkinter窗口
-        self.canvas = FigureCanvasTkAgg(self.fig, master=plot_frame)
-        self.canvas.draw()
-        self.canvas.get_tk_widget().pack(fill='both', expand=True)
+        # 启动动画（间隔由帧率调度器动态调整）
+        self.frame_scheduler.reset()
+        self._apply_frame_settings()
+        self.plot_backend.start(self.update_plot, int(self.frame_scheduler.interval * 1000))
         
-        # 初始化数据线
-        self.lines = {}
-        colors = plt.cm.rainbow(np.linspace(0, 1, len(self.selected_params)))
-        for param, color in zip(self.selected_params, colors):
-            line, = self.ax.plot([], [], label=param, color=color, lw=1.5)
-            self.lines[param] = line
+        # 打印调试信息
+        print(f"创建图形窗口完成，绘图后端: {self.render_backend_var.get()}")
+        print(f"动画已启动，帧率范围: {self.frame_scheduler.min_fps}-{self.frame_scheduler.max_fps} FPS")
+
+    def _apply_frame_settings(self):
+        """从显示设置读取帧率范围和CPU预算"""
+        try:
+            self.frame_scheduler.configure(
+                self.min_fps_var.get(),
+                self.max_fps_var.get(),
+                self.cpu_budget_var.get() / 100.0
+            )
+        except tk.TclError:
+            # 输入框内容不是有效数字时沿用原设置
+            pass
+
+    def _schedule_next_frame(self, frame_start):
+        """结束一帧的计时并按调度器结果调整动画间隔"""
+        interval = self.frame_scheduler.end_frame(frame_start, self.data_count)
+        self.metrics.observe('frame_seconds', self.frame_scheduler.last_cost)
+        if self.plot_backend is not None:
+            self.plot_backend.set_interval(max(1, int(interval * 1000)))
+
+    def _set_aux_panel(self, name, enabled):
+        """
+        显示或隐藏时间曲线下方的辅助面板（频谱、触发），返回该面板的坐标轴
         
-        # 添加图例
-        self.ax.legend(loc='upper right', fontsize=8)
+        面板按固定顺序纵向排列，增删后重新分配各坐标轴的位置
+        """
+        ax = self.aux_axes.get(name)
+        if enabled and ax is None:
+            ax = self.aux_axes[name] = self.fig.add_subplot(2, 1, 2)
+            ax.grid(True, linestyle='--', alpha=0.6)
+        elif not enabled and ax is not None:
+            ax.remove()
+            del self.aux_axes[name]
+            ax = None
         
-        # 设置网格
-        self.ax.grid(True, linestyle='--', alpha=0.6)
+        panels = [panel for panel in ('spectrum', 'trigger') if panel in self.aux_axes]
+        grid = GridSpec(1 + len(panels), 1, figure=self.fig,
+                        height_ratios=[3] + [2] * len(panels), hspace=0.45)
+        self.ax.set_subplotspec(grid[0])
+        for row, panel in enumerate(panels, start=1):
+            self.aux_axes[panel].set_subplotspec(grid[row])
+        return ax
+
+    def apply_spectrum_settings(self):
+        """
+        按频谱设置重建频谱分析器，并显示或隐藏频谱面板
         
-        # 设置初始范围
-        self.ax.set_xlim(0, 100)
-        self.ax.set_ylim(-1, 1)
+        切换通道时用已有的最近数据预先填满分析窗口
+        """
+        if not getattr(self, 'fig', None):
+            return
+        param = self.spectrum_param_var.get()
+        analyzer = None
+        if param:
+            try:
+                analyzer = SpectrumAnalyzer(
+                    size=int(self.spectrum_size_var.get()),
+                    hop=int(self.spectrum_hop_var.get()),
+                    window=self.spectrum_window_var.get(),
+                    averages=self.spectrum_avg_var.get()
+                )
+            except (ValueError, tk.TclError) as e:
+                self.notify('error', "频谱设置错误", str(e))
+                return
         
-        # 设置窗口缩放支持
-        self.root.columnconfigure(0, weight=1)
-        self.root.rowconfigure(0, weight=1)
+        with self.lock:
+            store = self.data_dict.get(param)
+            if analyzer is not None and store:
+                analyzer.feed(store.read(len(store) - analyzer.size, len(store)))
+            self.spectrum = analyzer
+            self.spectrum_param = param or None
         
-        # 添加鼠标移动事件处理
-        self.annotation = self.ax.annotate("", xy=(0,0), xytext=(20,20), textcoords="offset points",
-                            bbox=dict(boxstyle="round", fc="w"),
-                            arrowprops=dict(arrowstyle="->"))
-        self.annotation.set_visible(False)
+        ax = self._set_aux_panel('spectrum', analyzer is not None)
+        if ax is not None:
+            if not ax.lines:
+                self.spec_line, = ax.plot([], [], color='tab:purple', lw=1)
+                ax.set_ylabel('幅度 (dB)', fontsize=10)
+            self.spec_line.set_data([], [])
+            ax.set_title(f'{param} 频谱 ({analyzer.size}点, {analyzer.window}窗)', fontsize=10)
+            ax.set_xlabel('频率 (周期/点)', fontsize=10)
+        self.canvas.draw_idle()
+
+    def _update_spectrum(self, frame_data):
+        """用新取出的数据帧更新频谱曲线"""
+        ax = self.aux_axes['spectrum']
+        freqs, levels = self.spectrum.compute(frame_data)
+        self.spec_line.set_data(freqs, levels)
+        if self.spectrum.sample_rate is not None:
+            ax.set_xlabel('频率 (Hz)', fontsize=10)
+        ax.set_xlim(0, freqs[-1])
+        top = levels.max()
+        bottom = max(levels.min(), top - 120)
+        ax.set_ylim(bottom - 5, top + 5)
+
+    def apply_trigger_settings(self):
+        """按触发设置重建触发捕获器，并显示或隐藏触发面板"""
+        if not getattr(self, 'fig', None):
+            return
+        param = self.trigger_param_var.get()
+        trigger = None
+        if param:
+            try:
+                trigger = TriggerCapture(
+                    level=float(self.trigger_level_var.get()),
+                    edge='rising' if self.trigger_edge_var.get() == '上升' else 'falling',
+                    hysteresis=float(self.trigger_hyst_var.get()),
+                    holdoff=int(self.trigger_holdoff_var.get()),
+                    pre=int(self.trigger_pre_var.get()),
+                    post=int(self.trigger_post_var.get()),
+                    mode='single' if self.trigger_mode_var.get() == '单次' else 'normal'
+                )
+            except ValueError as e:
+                self.notify('error', "触发设置错误", str(e))
+                return
         
-        # 用于存储高亮点
-        self.highlight_points = {param: None for param in self.selected_params}
-        
-        def on_motion(event):
-            if event.inaxes == self.ax:
-                visible = False
-                for param, line in self.lines.items():
-                    xdata, ydata = line.get_data()
-                    if len(xdata) > 0:
-                        # 找到最近的点
-                        x_index = min(range(len(xdata)), key=lambda i: abs(xdata[i] - event.xdata))
-                        y_value = ydata[x_index]
-                        # 如果鼠标在点附近
-                        if abs(event.xdata - xdata[x_index]) < 0.1 and abs(event.ydata - y_value) < 0.1:
-                            # 显示注释
-                            self.annotation.xy = (xdata[x_index], y_value)
-                            self.annotation.set_text(f"{y_value:.2f}")
-                            self.annotation.set_visible(True)
-                            visible = True
-                            
-                            # 清除之前的高亮点
-                            if self.highlight_points[param]:
-                                self.highlight_points[param].remove()
-                            
-                            # 绘制新的高亮点
-                            self.highlight_points[param] = self.ax.plot(
-                                xdata[x_index], y_value, 'o', 
-                                color=line.get_color(),
-                                markersize=10,
-                                alpha=0.5
-                            )[0]
-                            break
-                        else:
-                            # 如果不在点附近，清除高亮点
-                            if self.highlight_points[param]:
-                                self.highlight_points[param].remove()
-                                self.highlight_points[param] = None
-                if not visible:
-                    self.annotation.set_visible(False)
-                self.fig.canvas.draw_idle()
-        
-        self.fig.canvas.mpl_connect("motion_notify_event", on_motion)
-        
-        # 启动动画
-        self.ani = FuncAnimation(
-            self.fig,
-            self.update_plot,
-            interval=50,  # 20fps
-            blit=False,
-            cache_frame_data=False
-        )
+        with self.lock:
+            self.trigger = trigger
+            self.trigger_param = param or None
+        self.trigger_drawn = 0
         
-        # 禁用Matplotlib的默认工具栏
-        self.canvas.get_tk_widget().pack(fill='both', expand=True)
-        try:
-            self.canvas.toolbar.pack_forget()
-        except:
-            pass
+        ax = self._set_aux_panel('trigger', trigger is not None)
+        if ax is not None:
+            # 最新一段实线显示，较早的几段淡色叠加
+            if not ax.lines:
+                self.trigger_lines = [
+                    ax.plot([], [], color='tab:red', lw=1, alpha=0.15)[0]
+                    for _ in range(trigger.segments.maxlen - 1)
+                ]
+                self.trigger_lines.append(ax.plot([], [], color='tab:red', lw=1.5)[0])
+                ax.axvline(0, color='gray', lw=0.8, linestyle=':')
+                ax.set_xlabel('相对触发点的数据点', fontsize=10)
+            for line in self.trigger_lines:
+                line.set_data([], [])
+            if self.trigger_level_line is not None:
+                self.trigger_level_line.remove()
+            self.trigger_level_line = ax.axhline(trigger.level, color='gray', lw=0.8, linestyle='--')
+            ax.set_xlim(-trigger.pre, trigger.post)
+            edge = '上升沿' if trigger.edge == 'rising' else '下降沿'
+            ax.set_title(f'{param} 触发捕获 ({edge} {trigger.level:g}) - 等待触发', fontsize=10)
+        else:
+            self.trigger_level_line = None
+        self.canvas.draw_idle()
+
+    def rearm_trigger(self):
+        """单次模式下重新等待触发"""
+        with self.lock:
+            if self.trigger is not None:
+                self.trigger.rearm()
+
+    def _update_trigger_panel(self, segments, captured):
+        """把捕获到的数据段叠加显示在触发面板中"""
+        ax = self.aux_axes['trigger']
+        trigger = self.trigger
+        x = np.arange(-trigger.pre, trigger.post)
+        lines = self.trigger_lines[-len(segments):]
+        y_min, y_max = float('inf'), float('-inf')
+        for line, (_, segment) in zip(lines, segments):
+            line.set_data(x, segment)
+            if np.isfinite(segment).any():
+                y_min = min(y_min, np.nanmin(segment))
+                y_max = max(y_max, np.nanmax(segment))
+        if y_min != float('inf'):
+            margin = (y_max - y_min) * 0.1 or 0.5
+            ax.set_ylim(y_min - margin, y_max + margin)
+        edge = '上升沿' if trigger.edge == 'rising' else '下降沿'
+        state = '已停止' if trigger.stopped and not trigger.pending else '等待触发'
+        ax.set_title(f'{self.trigger_param} 触发捕获 ({edge} {trigger.level:g}) - '
+                     f'已捕获 {captured} 段, {state}', fontsize=10)
+
+    def _view_series(self, store, pyramid, start, stop, target_points):
+        return view_series(store, pyramid, start, stop, target_points, self.max_decimate_span)
+
+    def on_scroll(self, up, shift):
+        """
+        鼠标滚轮缩放显示跨度（向上放大，向下缩小）
         
-        # 打印调试信息
-        print("创建图形窗口完成")
-        print(f"当前Matplotlib后端: {plt.get_backend()}")
-        print(f"动画已启动，更新间隔: 50ms")
+        按住Shift滚动时在时间轴上平移，平移到最新数据时恢复跟随。
+        由绘图后端在滚轮事件落在主曲线区域时调用
+        """
+        span = self.view_span or self.data_points_var.get() * 100
         
-        # 强制更新布局
-        self.fig.tight_layout()
-        self.canvas.draw()
+        if shift:
+            with self.lock:
+                total = max((len(store) for store in self.data_dict.values()), default=0)
+            end = self.view_end if self.view_end is not None else total
+            step = max(1, span // 4)
+            end = end - step if up else end + step
+            if end >= total:
+                self.view_end = None
+                self.status_var.set("跟随最新数据")
+            else:
+                self.view_end = max(min(span, total), end)
+                self.status_var.set(f"查看历史数据: {self.view_end - span} - {self.view_end}")
+            return
+        
+        if up:
+            span = max(10, span // 2)
+        else:
+            span = min(span * 2, self.pyramid_factor ** (self.pyramid_levels + 3))
+        self.view_span = span
+        self.status_var.set(f"显示跨度: {span} 个数据点")
 
     def update_plot(self, frame):
+        with self.pause_lock:
+            if self.paused:
+                return []
+        
+        # 帧计时（刷新频率由帧率调度器控制）
+        self._apply_frame_settings()
+        frame_start = self.frame_scheduler.begin_frame()
         try:
-            with self.pause_lock:
-                if self.paused:
-                    return []
+            # 快照方式获取数据，减少锁持有时间
+            span = self.view_span or self.data_points_var.get() * 100
+            target_points = max(200, self.plot_backend.width())
             
-            # 更新频率控制
-            current_time = time.time()
-            if hasattr(self, 'last_update'):
-                if current_time - self.last_update < 0.05:  # 限制20fps
-                    return []
-            self.last_update = current_time
+            # 按写入线程发布的点数快照读取各通道，读取和聚合期间不持有数据锁
+            published = self.published_counts
+            x_max = max(published.values(), default=0)
+            stop = x_max if self.view_end is None else min(self.view_end, x_max)
+            start = max(0, stop - span)
             
-            # 快照方式获取数据，减少锁持有时间
+            data_snapshot = {}
+            view_level = 0
+            for param in list(self.plot_params):
+                count = published.get(param, 0)
+                store = self.data_dict.get(param)
+                if not count or store is None or param in self.hidden_params:
+                    continue
+                x_data, y_data, level = self._view_series(
+                    store, self.pyramids[param], start, min(stop, count), target_points)
+                data_snapshot[param] = (x_data, y_data)
+                view_level = max(view_level, level)
+            
+            # 频谱、触发和间隙标记仍与写入线程共享，只在取用时短暂加锁
+            wait_start = time.perf_counter()
             with self.lock:
-                data_snapshot = {}
-                max_points = self.data_points_var.get() * 100
-                for param in self.selected_params:
-                    data = self.data_dict.get(param, [])
-                    if len(data) > max_points:
-                        self.data_dict[param] = data[-max_points:]
-                    data_snapshot[param] = data[-max_points:]
+                self.metrics.observe('lock_wait_render_seconds', time.perf_counter() - wait_start)
+                # 积累了足够的新数据时取出一帧用于频谱计算
+                spectrum_frame = None
+                if self.spectrum is not None and 'spectrum' in self.aux_axes and self.spectrum.ready():
+                    spectrum_frame = self.spectrum.take_frame()
+                
+                # 有新的触发捕获时复制数据段引用（数据段本身不再修改）
+                trigger_segments = None
+                if self.trigger is not None and self.trigger.captured != self.trigger_drawn:
+                    trigger_segments = list(self.trigger.segments)
+                    self.trigger_drawn = self.trigger.captured
+                
+                new_gaps = self.gaps[self.gaps_drawn:]
+                self.gaps_drawn = len(self.gaps)
+            
+            # 断线间隙处画竖线
+            for gap in new_gaps:
+                self.plot_backend.add_marker(gap['index'])
+            
+            if spectrum_frame is not None:
+                self._update_spectrum(spectrum_frame)
+            if trigger_segments:
+                self._update_trigger_panel(trigger_segments, self.trigger_drawn)
             
             # 更新数据线
             has_new_data = False
             y_min, y_max = float('inf'), float('-inf')
             
-            for param, data in data_snapshot.items():
-                if data:
-                    x_data = list(range(len(data)))
-                    self.lines[param].set_data(x_data, data)
+            for param, (x_data, y_data) in data_snapshot.items():
+                if len(y_data):
+                    self.plot_backend.set_series(param, x_data, y_data)
                     has_new_data = True
                     
                     # 更新Y轴范围
-                    y_min = min(y_min, min(data))
-                    y_max = max(y_max, max(data))
+                    y_min = min(y_min, y_data.min())
+                    y_max = max(y_max, y_data.max())
             
             # 只在有新数据时更新视图
             if has_new_data:
                 # 设置X轴范围
-                x_max = max(100, max(len(data) for data in data_snapshot.values()))
-                self.ax.set_xlim(-5, x_max + 5)
+                x_right = max(stop, start + span)
+                self.plot_backend.set_xlim(x_right - span - 5, x_right + 5)
+                
+                # 标注当前使用的聚合级别
+                if view_level != self.view_level:
+                    self.view_level = view_level
+                    if view_level:
+                        ratio = self.pyramid_factor ** view_level
+                        self.plot_backend.set_xlabel(f'数据点索引 (1:{ratio} 聚合)')
+                    else:
+                        self.plot_backend.set_xlabel('数据点索引')
                 
                 # 设置Y轴范围（添加边距）
                 if y_min != float('inf'):
                     y_range = y_max - y_min
                     margin = y_range * 0.1 if y_range != 0 else 0.5
-                    self.ax.set_ylim(y_min - margin, y_max + margin)
+                    self.plot_backend.set_ylim(y_min - margin, y_max + margin)
                     
-                # 高效更新画布
-                self.canvas.draw_idle()
-                self.canvas.flush_events()
+                self.plot_backend.draw()
+                
+                # 解析完成 -> 画到屏幕 的延迟
+                parsed_at = self.unrendered_since
+                if parsed_at is not None:
+                    self.unrendered_since = None
+                    self.metrics.observe('parsed_to_rendered_seconds', time.perf_counter() - parsed_at)
                 
                 # 打印调试信息（每100帧打印一次）
                 if frame % 100 == 0:
@@ -947,6 +4941,8 @@ class SerialPlotter:
             print(f"更新错误: {e}")
             traceback.print_exc()
             return []
+        finally:
+            self._schedule_next_frame(frame_start)
 
     def run(self):
         self.root.mainloop()
@@ -955,25 +4951,38 @@ class SerialPlotter:
         """刷新数据，清空图表并重新开始计数"""
         if not self.running:
             return
-            
+        # 后台导出仍在读取这些通道的落盘文件，刷新会删除它们
+        if self.exporter is not None and not self.exporter.done:
+            messagebox.showinfo("提示", "数据导出尚未完成，请稍后再刷新")
+            return
+
         with self.lock:
             # 清空数据字典
-            for param in self.selected_params:
-                self.data_dict[param] = []
+            # 派生通道的窗口状态随数据一起清空
+            self.derived_channels = parse_derived_channels(
+                self.derived_text, self.selected_params, strict=self.channel_registry is None)
+            for param in self.plot_params:
+                old_store = self.data_dict.get(param)
+                if old_store is not None:
+                    self._discard_store(old_store)
+                self.data_dict[param] = self._new_store()
+                self.pyramids[param] = self._new_pyramid()
+                self.channel_stats[param] = ChannelStats()
+            self.published_counts = {}
+            if self.trigger is not None:
+                self.trigger.clear()
+            self.view_span = None
+            self.view_end = None
+            self.gaps = []
+            self.gaps_drawn = 0
                 
             # 重置计数器
             self.data_count = 0
             self.last_count = 0
             self.last_count_time = time.time()
             
-            # 重置图表
-            for line in self.lines.values():
-                line.set_data([], [])
-                
-            # 重置坐标轴范围
-            self.ax.set_xlim(0, 100)
-            self.ax.set_ylim(-1, 1)
-            self.canvas.draw_idle()
+            # 重置图表和坐标轴范围
+            self.plot_backend.clear()
             
             # 更新状态
             self.status_var.set("数据已刷新 - 正在监测")
@@ -981,6 +4990,45 @@ class SerialPlotter:
             
         print("数据已刷新，重新开始计数")
 
+    def export_data(self):
+        """把本次会话的全部数据导出到文件，在后台线程中执行"""
+        if self.exporter is not None and not self.exporter.done:
+            messagebox.showinfo("导出数据", "上一次导出尚未完成")
+            return
+        if not any(len(store) for store in self.data_dict.values()):
+            messagebox.showinfo("导出数据", "没有可导出的数据")
+            return
+        
+        names = {'csv': "CSV 文件", 'npz': "NumPy 压缩文件", 'parquet': "Parquet 文件"}
+        filetypes = [(names[fmt], f"*.{fmt}") for fmt in SessionExporter.supported_formats()]
+        filename = filedialog.asksaveasfilename(
+            title="导出数据", defaultextension=".csv", filetypes=filetypes)
+        if not filename:
+            return
+        
+        try:
+            with self.lock:
+                self.exporter = SessionExporter(filename, self.data_dict)
+        except ValueError as e:
+            messagebox.showerror("导出数据", str(e))
+            return
+        self.exporter.start()
+        print(f"开始导出 {self.exporter.total} 行数据到 {filename}")
+        self._poll_export()
+
+    def _poll_export(self):
+        """定时检查后台导出进度"""
+        exporter = self.exporter
+        if not exporter.done:
+            self.export_var.set(f"正在导出 {exporter.progress:.0%}")
+            self.root.after(200, self._poll_export)
+            return
+        if exporter.error is not None:
+            self.export_var.set("导出失败")
+            messagebox.showerror("导出数据", f"导出失败: {exporter.error}")
+        else:
+            self.export_var.set(f"已导出: {os.path.basename(exporter.filename)}")
+
     def toggle_pause(self):
         """
         切换暂停/继续数据监测状态
@@ -1008,9 +5056,453 @@ class SerialPlotter:
             self.paused = not self.paused
             new_text = "继续" if self.paused else "暂停"
             self.pause_btn.config(text=new_text)
+            
+            # 回放时暂停回放时钟
+            if isinstance(self.ser, ReplaySource):
+                if self.paused:
+                    self.ser.pause()
+                else:
+                    self.ser.resume()
+            
+            # 独立进程采集时同步暂停状态
+            if self.acq_process is not None:
+                if self.paused:
+                    self.acq_pause_event.set()
+                else:
+                    self.acq_pause_event.clear()
         
         # 强制刷新GUI
         self.root.update_idletasks()
 
+STARTUP_PROBE = """
+import sys, time
+t0 = time.perf_counter()
+sys.path.insert(0, {path!r})
+import main
+t1 = time.perf_counter()
+try:
+    plotter = main.SerialPlotter(mainloop=False)
+    plotter.root.update()
+    t2 = time.perf_counter()
+    plotter.root.destroy()
+except Exception as e:
+    print('window-error', repr(e), file=sys.stderr)
+    t2 = float('nan')
+t3 = time.perf_counter()
+main.load_matplotlib()
+t4 = time.perf_counter()
+print(t1 - t0, t2 - t1, t4 - t3)
+"""
+
+def benchmark_startup(repeat=5):
+    """
+    启动基准测试：在新的解释器中分别测量导入 main、显示窗口和首次导入 Matplotlib 的耗时
+    
+    每次都启动新进程，避免模块缓存影响结果，输出各项的中位数(毫秒)
+    """
+    probe = STARTUP_PROBE.format(path=os.path.dirname(os.path.abspath(__file__)))
+    results = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-c', probe], capture_output=True, text=True)
+        if output.returncode != 0:
+            print(output.stderr)
+            return None
+        if output.stderr:
+            print(output.stderr.strip())
+        results.append([float(item) for item in output.stdout.split()])
+    names = ('导入 main', '显示窗口', '首次导入 Matplotlib')
+    summary = {}
+    for name, values in zip(names, zip(*results)):
+        summary[name] = statistics.median(values) * 1000
+        print(f"{name}: {summary[name]:.1f} ms")
+    return summary
+
+def benchmark_render(backend_name, channels=16, points=100000, frames=200):
+    """
+    绘图后端基准测试：channels 条各 points 点的曲线，每帧滚动一段后重绘，输出平均帧率
+    
+    曲线先按绘图区宽度聚合为 min/max 包络（与金字塔提供给 update_plot 的数据量相同）
+    """
+    backend_class = SerialPlotter.render_backends[backend_name]
+    root = tk.Tk()
+    root.geometry("1280x720")
+    frame = ttk.Frame(root)
+    frame.pack(fill='both', expand=True)
+    params = [f"ch{i}" for i in range(channels)]
+    backend = backend_class(frame, params, lambda up, shift: None)
+    root.update()
+    
+    rng = np.random.default_rng(0)
+    data = np.cumsum(rng.standard_normal((channels, points * 2)), axis=1)
+    step = max(1, points // frames)
+    start_time = time.perf_counter()
+    for i in range(frames):
+        start = i * step
+        size = max(1, points // max(200, backend.width()))
+        y_min, y_max = float('inf'), float('-inf')
+        for param, values in zip(params, data):
+            x, mins, maxs = min_max_buckets(values[start:start + points], start, size)
+            backend.set_series(param, np.repeat(x, 2), interleave(mins, maxs))
+            y_min = min(y_min, mins.min())
+            y_max = max(y_max, maxs.max())
+        backend.set_xlim(start, start + points)
+        backend.set_ylim(y_min, y_max)
+        backend.draw()
+        root.update()
+    elapsed = time.perf_counter() - start_time
+    backend.close()
+    root.destroy()
+    fps = frames / elapsed
+    print(f"{backend_name}: {channels} 通道 x {points} 点, {fps:.1f} FPS ({elapsed / frames * 1000:.1f} ms/帧)")
+    return fps
+
+def benchmark_contention(channels=8, seconds=3.0, batch=1000, fps=60, span=100000, target_points=1280):
+    """
+    锁竞争基准测试：写入线程不停写入数据，界面线程同时按 fps 生成各通道的绘图序列
+    
+    比较写入线程在 不绘制 / 绘制时持有数据锁（原方式）/ 按发布的快照无锁绘制 三种情况下的吞吐，
+    输出每秒写入的数据点数、实际帧率和单帧取数耗时
+    """
+    rng = np.random.default_rng(0)
+    blocks = [np.cumsum(rng.standard_normal(batch)) for _ in range(16)]
+    params = [f"ch{i}" for i in range(channels)]
+    results = {}
+    for mode in ('不绘制', '持锁绘制', '快照绘制'):
+        session_dir = tempfile.mkdtemp(prefix='serial_plotter_bench_')
+        stores = {p: ChannelStore(os.path.join(session_dir, f"{p}.f64"), 1 << 20) for p in params}
+        pyramids = {p: HistoryPyramid() for p in params}
+        lock = threading.Lock()
+        state = {'published': {}, 'running': True, 'samples': 0}
+        
+        def produce():
+            i = 0
+            while state['running']:
+                values = blocks[i % len(blocks)]
+                i += 1
+                with lock:
+                    for p in params:
+                        stores[p].extend(values)
+                        pyramids[p].extend(values)
+                    state['published'] = {p: len(store) for p, store in stores.items()}
+                state['samples'] += len(values) * channels
+        
+        def render(published):
+            x_max = max(published.values(), default=0)
+            start = max(0, x_max - span)
+            for p in params:
+                view_series(stores[p], pyramids[p], start, min(x_max, published.get(p, 0)),
+                            target_points, 1 << 22)
+        
+        writer = threading.Thread(target=produce, daemon=True)
+        writer.start()
+        frames = []
+        begin = time.perf_counter()
+        next_frame = begin
+        while time.perf_counter() - begin < seconds:
+            if mode != '不绘制':
+                frame_start = time.perf_counter()
+                if mode == '持锁绘制':
+                    with lock:
+                        render({p: len(store) for p, store in stores.items()})
+                else:
+                    render(state['published'])
+                frames.append(time.perf_counter() - frame_start)
+            next_frame += 1.0 / fps
+            time.sleep(max(0.0, next_frame - time.perf_counter()))
+        elapsed = time.perf_counter() - begin
+        state['running'] = False
+        writer.join()
+        for store in stores.values():
+            store.close()
+        shutil.rmtree(session_dir, ignore_errors=True)
+        
+        rate = state['samples'] / elapsed
+        results[mode] = rate
+        line = f"{mode}: 写入 {rate / 1e6:.2f} M点/秒"
+        if frames:
+            line += (f", {len(frames) / elapsed:.1f} FPS, 取数 中位数 {statistics.median(frames) * 1000:.2f} ms"
+                     f" / 最大 {max(frames) * 1000:.2f} ms")
+        print(line)
+    return results
+
+def check_overflow_policies(lines=200000, queue_size=16, seed=0):
+    """
+    溢出策略回归检查：模拟的读取线程把按随机位置切分的数据块依次编号放入小容量的原始数据队列，
+    解析端取数较慢、队列经常溢出；每种策略下解析出的行都必须完整，
+    即行内的序号与校验值一致且序号严格递增（间隙两侧的半行没有被拼成一行）
+    
+    返回 True 表示全部通过
+    """
+    rng = np.random.default_rng(seed)
+    text = ''.join(f"v:{n} c:{n * 7919 % 100003}\n" for n in range(lines)).encode()
+    cuts = np.sort(rng.choice(np.arange(1, len(text)), len(text) // 40, replace=False))
+    chunks = [text[a:b] for a, b in zip(np.r_[0, cuts], np.r_[cuts, len(text)])]
+    pattern = re.compile(r'v:(\d+) c:(\d+)')
+    passed = True
+    for name, policy in SerialPlotter.overflow_policies.items():
+        raw_queue = BoundedQueue(queue_size, raw_queue_policy(policy))
+        assembler = LineAssembler()
+        previous = -1
+        good = bad = 0
+        
+        def consume():
+            nonlocal previous, good, bad
+            batch = raw_queue.get_batch()
+            for line in assembler.feed([(seq, chunk) for seq, _, chunk in batch]):
+                match = pattern.fullmatch(line)
+                n = int(match.group(1)) if match else -1
+                if match and int(match.group(2)) == n * 7919 % 100003 and n > previous:
+                    previous = n
+                    good += 1
+                else:
+                    bad += 1
+        
+        # decode_serial_data 每次调用都会打印所用编码
+        with contextlib.redirect_stdout(io.StringIO()):
+            for seq, chunk in enumerate(chunks):
+                raw_queue.put((seq, 0.0, chunk))
+                if rng.random() < 0.2:
+                    consume()
+            consume()
+        ok = bad == 0 and good > 0 and raw_queue.dropped > 0
+        passed = passed and ok
+        print(f"{name}: 丢弃 {raw_queue.dropped} 块, 重同步 {assembler.resyncs} 次, "
+              f"完整行 {good}, 损坏行 {bad} - {'通过' if ok else '失败'}")
+    return passed
+
+def run_unattended(args):
+    """
+    无人值守采集：按命令行参数直接开始监测，运行 --duration 秒后自动退出
+    
+    与界面操作走同一条采集和绘图路径，所以仍会创建主窗口，需要图形界面环境
+    （Linux 服务器上可用 xvfb-run）。指定 --profile 时在窗口和图表创建完成、
+    开始监测后才采样调用栈，退出前写出折叠栈文件和热点函数汇总，
+    便于现场复现卡顿后把结果附在问题报告中
+    
+    运行中不弹出任何对话框：错误写到标准错误，启动失败或运行中报告过错误时返回 False
+    """
+    plotter = SerialPlotter(mainloop=False)
+    plotter.interactive = False
+    plotter.baud_var.set(str(args.baud))
+    plotter.param_entry.insert(0, args.params)
+    plotter.auto_channels_var.set(args.auto_channels)
+    plotter.process_mode_var.set(args.process_mode)
+    if args.replay:
+        plotter.start(replay=(args.replay, args.replay_speed))
+    else:
+        plotter.port_var.set(args.capture)
+        plotter.start()
+    if not plotter.running:
+        plotter.on_close()
+        return False
+    
+    if args.profile:
+        path = args.profile_output or time.strftime('profile_%Y%m%d_%H%M%S.collapsed')
+        plotter.start_profile(args.profile, path)
+    plotter.root.after(int(args.duration * 1000), plotter.on_close)
+    plotter.run()
+    return not plotter.reported_errors
+
+def current_rss():
+    """当前进程的常驻内存(字节)：优先使用 psutil，没有安装时读取 /proc，都不可用时返回 None"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def count_artists():
+    """存活的 Matplotlib 图形对象数和打开的图形数，未加载 Matplotlib 时为 (0, 0)"""
+    if plt is None:
+        return 0, 0
+    from matplotlib.artist import Artist
+    gc.collect()
+    return sum(1 for obj in gc.get_objects() if isinstance(obj, Artist)), len(plt.get_fignums())
+
+def write_simulated_log(path, line_rate, seconds, channels=4):
+    """
+    生成模拟设备的文本日志供回放：每秒 line_rate 行，每行 channels 个 chN:数值（正弦加噪声）
+    
+    返回通道名列表
+    """
+    rng = np.random.default_rng(0)
+    names = [f"ch{i}" for i in range(channels)]
+    freqs = np.arange(1, channels + 1)
+    with open(path, 'w', encoding='utf-8') as f:
+        for second in range(int(seconds)):
+            stamp = time.strftime('[%H:%M:%S] ', time.gmtime(second))
+            t = second + np.arange(line_rate) / line_rate
+            values = np.sin(2 * np.pi * t[:, None] * freqs) + 0.1 * rng.standard_normal((line_rate, channels))
+            f.write(''.join(stamp + ' '.join(f"{name}:{value:.4f}" for name, value in zip(names, row)) + '\n'
+                            for row in values))
+    return names
+
+def run_soak(args):
+    """
+    长时间稳定性测试：用模拟设备的高速数据反复 开始/暂停/继续/刷新/停止
+    
+    每轮结束后检查常驻内存、tracemalloc 统计的 Python 内存、存活的 Matplotlib 图形对象和图形数、
+    Tk 待执行的 after 回调数和线程数，与预热后的基线相比增长超过阈值即判定失败，
+    并列出新增内存最多的代码位置。返回 True 表示通过
+    """
+    mb = 1024 * 1024
+    limits = {
+        'rss': args.soak_max_rss_mb * mb,
+        'traced': args.soak_max_traced_mb * mb,
+        'artists': args.soak_max_artists,
+        'figures': 0,
+        'callbacks': args.soak_max_callbacks,
+        'threads': 2,
+    }
+    units = {'rss': mb, 'traced': mb}
+    
+    tracemalloc.start()
+    work_dir = tempfile.mkdtemp(prefix='serial_plotter_soak_')
+    log_path = os.path.join(work_dir, 'device.log')
+    names = write_simulated_log(log_path, args.soak_rate, args.soak_cycle + 5)
+    print(f"模拟设备: {len(names)} 通道, {args.soak_rate} 行/秒, 每轮 {args.soak_cycle:g} 秒")
+    
+    plotter = SerialPlotter(mainloop=False)
+    plotter.param_entry.insert(0, ','.join(names))
+    plotter.render_backend_var.set(args.soak_backend)
+    
+    def pump(seconds):
+        # 代替 mainloop 处理界面事件和定时回调
+        end = time.perf_counter() + seconds
+        while time.perf_counter() < end:
+            plotter.root.update()
+            time.sleep(0.002)
+    
+    def cycle():
+        plotter.start(replay=(log_path, 1.0))
+        if not plotter.running:
+            raise RuntimeError("无法开始监测")
+        pump(args.soak_cycle * 0.4)
+        plotter.toggle_pause()
+        pump(1.0)
+        plotter.toggle_pause()
+        pump(args.soak_cycle * 0.3)
+        plotter.refresh_data()
+        pump(args.soak_cycle * 0.3)
+        plotter.stop()
+        pump(0.5)
+    
+    def measure():
+        artists, figures = count_artists()
+        return {
+            'rss': current_rss(),
+            'traced': tracemalloc.get_traced_memory()[0],
+            'artists': artists,
+            'figures': figures,
+            'callbacks': len(plotter.root.tk.splitlist(plotter.root.tk.call('after', 'info'))),
+            'threads': threading.active_count(),
+        }
+    
+    passed = True
+    try:
+        for _ in range(args.soak_warmup):
+            cycle()
+        baseline = measure()
+        baseline_snapshot = tracemalloc.take_snapshot()
+        if baseline['rss'] is None:
+            print("无法获取常驻内存（可安装 psutil），跳过 RSS 检查")
+        print("基线: " + ", ".join(f"{key} {value / units.get(key, 1):.1f}" for key, value in baseline.items()
+                                   if value is not None))
+        
+        deadline = time.time() + args.soak * 3600
+        rounds = 0
+        while True:
+            cycle()
+            rounds += 1
+            current = measure()
+            growth = {key: current[key] - baseline[key] for key in limits
+                      if current[key] is not None and baseline[key] is not None}
+            print(f"第 {rounds} 轮: " + ", ".join(
+                f"{key} {value / units.get(key, 1):+.1f}" for key, value in growth.items()))
+            failed = [key for key, value in growth.items() if value > limits[key]]
+            if failed:
+                passed = False
+                print("失败: " + ", ".join(
+                    f"{key} 增长 {growth[key] / units.get(key, 1):.1f} 超过阈值 {limits[key] / units.get(key, 1):g}"
+                    for key in failed))
+                break
+            if time.time() >= deadline:
+                break
+        
+        print("相对基线新增内存最多的位置:")
+        snapshot = tracemalloc.take_snapshot().filter_traces((tracemalloc.Filter(False, tracemalloc.__file__),))
+        for stat in snapshot.compare_to(baseline_snapshot, 'lineno')[:10]:
+            print(f"  {stat}")
+        print(f"稳定性测试{'通过' if passed else '失败'}，共 {rounds} 轮")
+    finally:
+        plotter.on_close()
+        shutil.rmtree(work_dir, ignore_errors=True)
+        tracemalloc.stop()
+    return passed
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="串口数据实时绘图")
+    parser.add_argument('--startup-benchmark', type=int, nargs='?', const=5, metavar='N',
+                        help="运行 N 次启动基准测试后退出（默认 5 次）")
+    parser.add_argument('--render-benchmark', action='store_true',
+                        help="对各绘图后端运行绘图基准测试（16 通道 x 10 万点）后退出")
+    parser.add_argument('--contention-benchmark', action='store_true',
+                        help="测量绘图取数对写入线程吞吐的影响（持锁与无锁快照对比）后退出")
+    parser.add_argument('--overflow-check', action='store_true',
+                        help="检查各溢出策略下丢弃数据块后解析出的行是否完整，失败时返回码为 1")
+    
+    soak = parser.add_argument_group("稳定性测试")
+    soak.add_argument('--soak', type=float, metavar='HOURS',
+                      help="用模拟设备反复开始/暂停/刷新/停止 HOURS 小时，检查内存和资源是否持续增长")
+    soak.add_argument('--soak-cycle', type=float, default=30.0, help="每轮秒数（默认 30）")
+    soak.add_argument('--soak-rate', type=int, default=5000, help="模拟设备每秒行数（默认 5000）")
+    soak.add_argument('--soak-warmup', type=int, default=2, help="记录基线前的预热轮数（默认 2）")
+    soak.add_argument('--soak-backend', default="Matplotlib", choices=list(SerialPlotter.render_backends),
+                      help="绘图后端（默认 Matplotlib）")
+    soak.add_argument('--soak-max-rss-mb', type=float, default=100.0, help="常驻内存增长上限 MB（默认 100）")
+    soak.add_argument('--soak-max-traced-mb', type=float, default=50.0,
+                      help="tracemalloc 统计的 Python 内存增长上限 MB（默认 50）")
+    soak.add_argument('--soak-max-artists', type=int, default=500,
+                      help="存活的 Matplotlib 图形对象增长上限（默认 500）")
+    soak.add_argument('--soak-max-callbacks', type=int, default=10,
+                      help="Tk 待执行 after 回调增长上限（默认 10）")
+    
+    capture = parser.add_argument_group("无人值守采集")
+    source = capture.add_mutually_exclusive_group()
+    source.add_argument('--capture', metavar='PORT', help="直接开始监测串口 PORT，无需操作界面（仍需图形界面环境）")
+    source.add_argument('--replay', metavar='FILE', help="直接开始回放录制文件或日志文件")
+    capture.add_argument('--params', default="", help="监测参数，逗号分隔")
+    capture.add_argument('--auto-channels', action='store_true', help="自动发现通道")
+    capture.add_argument('--baud', type=int, default=115200, help="波特率（默认 115200）")
+    capture.add_argument('--process-mode', action='store_true', help="独立进程采集")
+    capture.add_argument('--replay-speed', type=float, default=1.0, help="回放倍速，0 为最快（默认 1）")
+    capture.add_argument('--duration', type=float, default=60.0, help="运行秒数，到时自动退出（默认 60）")
+    capture.add_argument('--profile', type=float, metavar='SECONDS',
+                         help="开始后采样调用栈 SECONDS 秒，写出折叠栈文件和热点函数汇总")
+    capture.add_argument('--profile-output', metavar='FILE',
+                         help="折叠栈文件名（默认 profile_日期_时间.collapsed），汇总写入同名 .txt")
+    return parser.parse_args(argv)
+
 if __name__ == "__main__":
-    SerialPlotter().run()
\ No newline at end of file
+    multiprocessing.freeze_support()
+    args = parse_args()
+    if args.startup_benchmark:
+        benchmark_startup(args.startup_benchmark)
+    elif args.render_benchmark:
+        for name in SerialPlotter.render_backends:
+            benchmark_render(name)
+    elif args.contention_benchmark:
+        benchmark_contention()
+    elif args.overflow_check:
+        sys.exit(0 if check_overflow_policies() else 1)
+    elif args.soak:
+        sys.exit(0 if run_soak(args) else 1)
+    elif args.capture or args.replay:
+        sys.exit(0 if run_unattended(args) else 1)
+    else:
+        SerialPlotter().run()